@@ -0,0 +1,409 @@
+"""
+Catalog of the food web, set, batch and sequence directories under DATA_HOME
+
+Finding a set directory by number used to mean walking all of DATA_HOME. The
+catalog is an SQLite database (CATALOG_FILE under DATA_HOME) recording the
+path of each directory, relative to DATA_HOME, so lookups take a query. The
+functions that create directories (util.create_set_dir(),
+util.create_batch_dir() and the create_sequence_dir() functions of the
+process modules) record them in the same transaction in which their numbers
+are allocated.
+
+The directories on disk are the source of truth: the catalog is built from
+them the first time it is opened, and can be rebuilt at any time with
+rebuild() (or atn-catalog.py rebuild), e.g. after directories are moved or
+created by other means. A set directory that is not in the catalog, or whose
+catalogued path no longer exists, is looked for in the food web directories
+(<N>-species/<food web ID>/set-N) and, failing that, by rebuilding the
+catalog, at most once per process (see find_set_dir()).
+
+Numbers are allocated safely by concurrent processes: allocation runs in a
+transaction holding the catalog's write lock (see transaction()), and the
+directory is created with an atomic mkdir, moving on to the next number if
+it already exists (see make_numbered_dir()), which also covers directories
+the catalog doesn't know about. Set numbers are global while set
+directories are spread over the food web directories, so a set number is
+also skipped if any food web directory has a directory for it (see
+set_number_taken()). A set number is catalogued only once: recording a
+second directory for it raises sqlite3.IntegrityError. If several
+directories on disk have the same set number, rebuild() catalogues the
+first by path, records the others in the set_conflicts table (see
+list_set_conflicts()) and warns about them.
+"""
+
+import os
+import re
+import glob
+import sqlite3
+import warnings
+import contextlib
+
+from atntools import settings
+
+CATALOG_FILE = 'catalog.sqlite'
+
+# Seconds to wait for another process's write transaction to finish
+TIMEOUT = 60
+
+# Kinds of sequences, and the names of their directories in DATA_HOME/sequences
+SEQUENCE_DIR_PREFIXES = {
+    'search': 'sequence-',
+    'convergence': 'cvg-sequence-',
+}
+
+# Directories not searched for sets when rebuilding
+_skip_dir_names = {'biomass-data', 'biomass-plots', 'sequences'}
+
+_food_web_parent_dir_pattern = re.compile(r'^(\d+)-species$')
+_food_web_dir_pattern = re.compile(r'^\d+(-\d+)*$')
+_set_dir_pattern = re.compile(r'^set-(\d+)$')
+_batch_dir_pattern = re.compile(r'^batch-(\d+)$')
+
+_schema = """
+CREATE TABLE IF NOT EXISTS food_webs (
+    food_web_id TEXT PRIMARY KEY,
+    num_species INTEGER NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sets (
+    set_num INTEGER PRIMARY KEY,
+    food_web_id TEXT,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS set_conflicts (
+    set_num INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (set_num, path)
+);
+CREATE TABLE IF NOT EXISTS batches (
+    set_num INTEGER NOT NULL,
+    batch_num INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (set_num, batch_num)
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    kind TEXT NOT NULL,
+    sequence_num INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (kind, sequence_num)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def get_catalog_filename():
+    return os.path.join(settings.DATA_HOME, CATALOG_FILE)
+
+
+def _relpath(path):
+    return os.path.relpath(path, settings.DATA_HOME)
+
+
+def _abspath(path):
+    return os.path.join(settings.DATA_HOME, path)
+
+
+@contextlib.contextmanager
+def connect():
+    """ Open the catalog, creating and building it if it doesn't exist.
+
+    The connection is in autocommit mode; use transaction() to group
+    statements.
+
+    Yields
+    ------
+    sqlite3.Connection
+    """
+    conn = sqlite3.connect(get_catalog_filename(), timeout=TIMEOUT, isolation_level=None)
+    try:
+        conn.executescript(_schema)
+        built = conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        if built is None:
+            rebuild(conn)
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextlib.contextmanager
+def transaction(conn):
+    """ Run the statements in the block in one transaction, committed if the
+    block succeeds and rolled back otherwise.
+
+    The transaction takes the catalog's write lock when it begins (BEGIN
+    IMMEDIATE), so transactions of concurrent processes run one at a time:
+    a number read in a transaction can't be allocated by another process
+    before the transaction ends.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def scan_data_home():
+    """ Find the food web, set, batch and sequence directories under DATA_HOME.
+
+    Set and batch directories, and directories of simulation data, are not
+    descended into except to list the batches of a set.
+
+    Returns
+    -------
+    dict
+        Lists of rows for each table of the catalog, with paths relative to
+        DATA_HOME
+    """
+    rows = {'food_webs': [], 'sets': [], 'batches': [], 'sequences': []}
+    for root, dirs, files in os.walk(settings.DATA_HOME):
+        if root == settings.DATA_HOME:
+            sequences_dir = os.path.join(root, 'sequences')
+            if os.path.isdir(sequences_dir):
+                for d in os.listdir(sequences_dir):
+                    for kind, prefix in SEQUENCE_DIR_PREFIXES.items():
+                        match = re.match(r'^{}(\d+)$'.format(re.escape(prefix)), d)
+                        if match and os.path.isdir(os.path.join(sequences_dir, d)):
+                            rows['sequences'].append(
+                                (kind, int(match.group(1)), _relpath(os.path.join(sequences_dir, d))))
+
+        parent = os.path.basename(root)
+        parent_match = _food_web_parent_dir_pattern.match(parent)
+        keep_dirs = []
+        for d in dirs:
+            path = os.path.join(root, d)
+            set_match = _set_dir_pattern.match(d)
+            if set_match:
+                set_num = int(set_match.group(1))
+                food_web_id = parent if _food_web_dir_pattern.match(parent) else None
+                rows['sets'].append((set_num, food_web_id, _relpath(path)))
+                for batch_dir in os.listdir(path):
+                    batch_match = _batch_dir_pattern.match(batch_dir)
+                    if batch_match and os.path.isdir(os.path.join(path, batch_dir)):
+                        rows['batches'].append(
+                            (set_num, int(batch_match.group(1)), _relpath(os.path.join(path, batch_dir))))
+            elif d in _skip_dir_names or _batch_dir_pattern.match(d):
+                pass
+            else:
+                if (parent_match and _food_web_dir_pattern.match(d) and
+                        len(d.split('-')) == int(parent_match.group(1))):
+                    rows['food_webs'].append((d, len(d.split('-')), _relpath(path)))
+                keep_dirs.append(d)
+        # Prune the walk
+        dirs[:] = keep_dirs
+    return rows
+
+
+def rebuild(conn=None):
+    """ Rebuild the catalog from the directories under DATA_HOME.
+
+    If several directories have the same set number, the first by path is
+    catalogued (with its batches) and the others are recorded as conflicts
+    (see list_set_conflicts()), with a warning.
+    """
+    if conn is None:
+        with connect() as conn:
+            return rebuild(conn)
+    rows = scan_data_home()
+    sets = []
+    conflicts = []
+    set_dirs = {}
+    for set_num, food_web_id, path in sorted(rows['sets'], key=lambda row: (row[0], row[2])):
+        if set_num in set_dirs:
+            conflicts.append((set_num, path))
+            warnings.warn("Set {} has more than one directory; using {}, not {}".format(
+                set_num, _abspath(set_dirs[set_num]), _abspath(path)))
+        else:
+            set_dirs[set_num] = path
+            sets.append((set_num, food_web_id, path))
+    batches = [row for row in rows['batches'] if os.path.dirname(row[2]) == set_dirs[row[0]]]
+    with transaction(conn):
+        for table in list(rows) + ['set_conflicts']:
+            conn.execute('DELETE FROM {}'.format(table))
+        conn.executemany('INSERT OR REPLACE INTO food_webs VALUES (?, ?, ?)', rows['food_webs'])
+        conn.executemany('INSERT INTO sets VALUES (?, ?, ?)', sets)
+        conn.executemany('INSERT INTO set_conflicts VALUES (?, ?)', conflicts)
+        conn.executemany('INSERT OR REPLACE INTO batches VALUES (?, ?, ?)', batches)
+        conn.executemany('INSERT OR REPLACE INTO sequences VALUES (?, ?, ?)', rows['sequences'])
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('built', datetime('now'))")
+
+
+def add_food_web(conn, food_web_dir):
+    """ Record a food web directory (named for its food web ID). """
+    food_web_id = os.path.basename(os.path.normpath(food_web_dir))
+    conn.execute('INSERT OR REPLACE INTO food_webs VALUES (?, ?, ?)',
+                 (food_web_id, len(food_web_id.split('-')), _relpath(food_web_dir)))
+
+
+def add_set(conn, set_num, set_dir):
+    """ Record a new set directory, and its food web directory if it is in
+    one. Raises sqlite3.IntegrityError if the set number is already
+    catalogued. """
+    parent_dir = os.path.dirname(os.path.normpath(set_dir))
+    food_web_id = os.path.basename(parent_dir)
+    if _food_web_dir_pattern.match(food_web_id):
+        add_food_web(conn, parent_dir)
+    else:
+        food_web_id = None
+    conn.execute('INSERT INTO sets VALUES (?, ?, ?)',
+                 (set_num, food_web_id, _relpath(set_dir)))
+
+
+def add_batch(conn, set_num, batch_num, batch_dir):
+    conn.execute('INSERT OR REPLACE INTO batches VALUES (?, ?, ?)',
+                 (set_num, batch_num, _relpath(batch_dir)))
+
+
+def add_sequence(conn, kind, sequence_num, sequence_dir):
+    conn.execute('INSERT OR REPLACE INTO sequences VALUES (?, ?, ?)',
+                 (kind, sequence_num, _relpath(sequence_dir)))
+
+
+def set_number_taken(conn, set_num):
+    """ Return whether a set number is catalogued or has a directory (set-N)
+    in any food web directory (<N>-species/<food web ID>/) under DATA_HOME. """
+    if conn.execute('SELECT 1 FROM sets WHERE set_num = ?', (set_num,)).fetchone() is not None:
+        return True
+    return bool(_food_web_set_dirs(set_num))
+
+
+def make_numbered_dir(first_num, dir_for_num, makedirs=False, taken=None):
+    """ Create the first directory of a numbered series that doesn't exist yet.
+
+    Directory creation is atomic, so if the directory for a number exists
+    (e.g. because it was created by a process not using the catalog, or
+    while the catalog was being rebuilt), the next number is tried.
+
+    Parameters
+    ----------
+    first_num : int
+        First number to try
+    dir_for_num : callable
+        Function returning the path of the directory for a number
+    makedirs : bool, optional
+        Create missing parent directories
+    taken : callable, optional
+        Function returning whether a number is taken even though its
+        directory doesn't exist (e.g. set_number_taken())
+
+    Returns
+    -------
+    num : int, directory : str
+        Number and path of the created directory
+    """
+    num = first_num
+    while True:
+        if taken is not None and taken(num):
+            num += 1
+            continue
+        directory = dir_for_num(num)
+        try:
+            if makedirs:
+                os.makedirs(directory)
+            else:
+                os.mkdir(directory)
+            return num, directory
+        except FileExistsError:
+            num += 1
+
+
+# Catalog files rebuilt by find_set_dir() in this process
+_rebuilt_catalogs = set()
+
+
+def _food_web_set_dirs(set_num):
+    """ Return the directories for a set number in the food web directories
+    (<N>-species/<food web ID>/set-N), in order of path. """
+    pattern = os.path.join(glob.escape(settings.DATA_HOME), '*-species', '*', 'set-{}'.format(set_num))
+    return sorted(path for path in glob.iglob(pattern) if os.path.isdir(path))
+
+
+def find_set_dir(set_num):
+    """ Look up a set directory.
+
+    A set that is not in the catalog, or whose catalogued directory no longer
+    exists, is looked for in the food web directories and recorded if found.
+    Otherwise the catalog is rebuilt, but only once per process, since this
+    walks all of DATA_HOME.
+
+    Returns
+    -------
+    str or None
+        Path to the set directory, or None if it doesn't exist
+    """
+    with connect() as conn:
+        row = conn.execute('SELECT path FROM sets WHERE set_num = ?', (set_num,)).fetchone()
+        if row is not None and os.path.isdir(_abspath(row[0])):
+            return _abspath(row[0])
+        set_dirs = _food_web_set_dirs(set_num)
+        if set_dirs:
+            with transaction(conn):
+                conn.execute('DELETE FROM sets WHERE set_num = ?', (set_num,))
+                conn.execute('DELETE FROM batches WHERE set_num = ?', (set_num,))
+                add_set(conn, set_num, set_dirs[0])
+                for batch_dir in os.listdir(set_dirs[0]):
+                    batch_match = _batch_dir_pattern.match(batch_dir)
+                    if batch_match and os.path.isdir(os.path.join(set_dirs[0], batch_dir)):
+                        add_batch(conn, set_num, int(batch_match.group(1)),
+                                  os.path.join(set_dirs[0], batch_dir))
+            return set_dirs[0]
+        catalog_file = os.path.abspath(get_catalog_filename())
+        if catalog_file not in _rebuilt_catalogs:
+            _rebuilt_catalogs.add(catalog_file)
+            rebuild(conn)
+            row = conn.execute('SELECT path FROM sets WHERE set_num = ?', (set_num,)).fetchone()
+            if row is not None and os.path.isdir(_abspath(row[0])):
+                return _abspath(row[0])
+    return None
+
+
+def list_sets():
+    """ List the catalogued sets.
+
+    Returns
+    -------
+    list of (int, str, str)
+        Set number, food web ID (or None) and set directory of each set, in
+        order of set number
+    """
+    with connect() as conn:
+        return [(set_num, food_web_id, _abspath(path)) for set_num, food_web_id, path in
+                conn.execute('SELECT set_num, food_web_id, path FROM sets ORDER BY set_num')]
+
+
+def list_set_conflicts():
+    """ List the set directories left out of the catalog because another
+    directory has the same set number, as (set number, set directory). """
+    with connect() as conn:
+        return [(set_num, _abspath(path)) for set_num, path in
+                conn.execute('SELECT set_num, path FROM set_conflicts ORDER BY set_num, path')]
+
+
+def list_food_webs():
+    """ List the catalogued food webs as (food web ID, food web directory). """
+    with connect() as conn:
+        return [(food_web_id, _abspath(path)) for food_web_id, path in
+                conn.execute('SELECT food_web_id, path FROM food_webs ORDER BY num_species, food_web_id')]
+
+
+def get_max_set_number(conn=None):
+    """ Return the maximum catalogued set number, or None if there are no sets. """
+    if conn is None:
+        with connect() as conn:
+            return get_max_set_number(conn)
+    return conn.execute('SELECT MAX(set_num) FROM sets').fetchone()[0]
+
+
+def get_max_sequence_number(kind, conn=None):
+    """ Return the maximum catalogued sequence number of the given kind (a key
+    of SEQUENCE_DIR_PREFIXES), or -1 if there are none. """
+    if conn is None:
+        with connect() as conn:
+            return get_max_sequence_number(kind, conn)
+    max_sequence_num = conn.execute('SELECT MAX(sequence_num) FROM sequences WHERE kind = ?',
+                                    (kind,)).fetchone()[0]
+    return -1 if max_sequence_num is None else max_sequence_num
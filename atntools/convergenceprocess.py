@@ -4,16 +4,13 @@ Automation for generating simulations for Convergence
 
 import os
 import glob
-import re
 import logging
 import copy
 from collections import OrderedDict, Counter
 import json
 import pprint
 
-import matplotlib.pyplot as plt
-
-from atntools import settings, util, simulation, nodeconfigs, foodwebs, plotting
+from atntools import settings, util, catalog, simulation, nodeconfigs, foodwebs, plotting
 
 MAX_TIMESTEPS = 100000
 
@@ -53,7 +50,8 @@ def run_sequence(food_web, initial_metaparameter_template, cvg_metaparameter_tem
         'args': {
             'input_dir': os.path.join(
                 util.find_batch_dir(initial_set_dir, initial_batch),
-                'biomass-data')
+                'biomass-data'),
+            'processes': None
         }
     }
     sustaining_set, sustaining_set_dir = util.create_set_dir(
@@ -71,6 +69,7 @@ def run_sequence(food_web, initial_metaparameter_template, cvg_metaparameter_tem
     cvg_metaparameter_template = copy.deepcopy(cvg_metaparameter_template)
     cvg_metaparameter_template['args']['input_set'] = sustaining_set
     cvg_metaparameter_template['args']['input_batch'] = sustaining_batch
+    cvg_metaparameter_template['args'].setdefault('processes', None)
     cvg_set, cvg_set_dir = util.create_set_dir(food_web, cvg_metaparameter_template)
     logging.info("Created convergence set {}".format(cvg_set))
 
@@ -132,56 +131,54 @@ def compile_data(sequence_numbers, output_dir):
         batch_num = sequence_info['cvg_batch']
         batch_dir = util.find_batch_dir(set_num, batch_num)
 
-        # Open the node configs
-        with open(os.path.join(batch_dir, 'node-configs.txt')) as f:
-            node_configs = f.readlines()
-
-        for original_sim_number, node_config in enumerate(node_configs):
-            node_config = node_config.strip()
-
-            # Identify the food web formed by the surviving species
-            node_ids = node_ids_from_node_config(node_config)
-            num_species = len(node_ids)
-            food_web_id = '-'.join(map(str, node_ids))
-
-            # Determine the new sim number
-            # by counting the number of simulations found for this food web
-            new_sim_number = sim_count_by_food_web[food_web_id]
-            sim_count_by_food_web[food_web_id] += 1
-            sim_count_by_food_web_size[len(node_ids)] += 1
-
-            # Initialize the food web directory, if it hasn't been
-            cvg_food_web_dir = os.path.join(
-                output_dir,
-                '{}-species'.format(num_species),
-                food_web_id)
-            if not os.path.isdir(cvg_food_web_dir):
-                init_food_web_dir(cvg_food_web_dir, node_ids)
-
-            # Append the current node config to the new node config file
-            with open(os.path.join(cvg_food_web_dir, 'node-configs.txt'), 'a') as f:
-                print(node_config, file=f)
-
-            # Make a symbolic link pointing to the data file
-            original_datafile = os.path.join(
-                batch_dir, 'biomass-data',
-                simdata_filename(original_sim_number))
-            new_datafile = os.path.join(
-                cvg_food_web_dir, 'biomass-data',
-                simdata_filename(new_sim_number))
-            os.symlink(original_datafile, new_datafile)
-
-            # Generate a plot
-            plotting.plot_biomass_data(
-                new_datafile,
-                None,
-                title='{} #{}'.format(food_web_id, new_sim_number),
-                ylim=(0, None),
-                show_legend=True,
-                output_file=os.path.join(
-                    cvg_food_web_dir, 'biomass-plots',
-                    plot_filename(new_sim_number)),
-                output_dpi=80)
+        # Stream the node configs (read once, in order, so no index is needed)
+        with open(os.path.join(batch_dir, 'node-configs.txt')) as node_configs:
+            for original_sim_number, node_config in enumerate(node_configs):
+                node_config = node_config.strip()
+
+                # Identify the food web formed by the surviving species
+                node_ids = node_ids_from_node_config(node_config)
+                num_species = len(node_ids)
+                food_web_id = '-'.join(map(str, node_ids))
+
+                # Determine the new sim number
+                # by counting the number of simulations found for this food web
+                new_sim_number = sim_count_by_food_web[food_web_id]
+                sim_count_by_food_web[food_web_id] += 1
+                sim_count_by_food_web_size[len(node_ids)] += 1
+
+                # Initialize the food web directory, if it hasn't been
+                cvg_food_web_dir = os.path.join(
+                    output_dir,
+                    '{}-species'.format(num_species),
+                    food_web_id)
+                if not os.path.isdir(cvg_food_web_dir):
+                    init_food_web_dir(cvg_food_web_dir, node_ids)
+
+                # Append the current node config to the new node config file
+                with open(os.path.join(cvg_food_web_dir, 'node-configs.txt'), 'a') as f:
+                    print(node_config, file=f)
+
+                # Make a symbolic link pointing to the data file
+                original_datafile = os.path.join(
+                    batch_dir, 'biomass-data',
+                    simdata_filename(original_sim_number))
+                new_datafile = os.path.join(
+                    cvg_food_web_dir, 'biomass-data',
+                    simdata_filename(new_sim_number))
+                os.symlink(original_datafile, new_datafile)
+
+                # Generate a plot
+                plotting.plot_biomass_data(
+                    new_datafile,
+                    None,
+                    title='{} #{}'.format(food_web_id, new_sim_number),
+                    ylim=(0, None),
+                    show_legend=True,
+                    output_file=os.path.join(
+                        cvg_food_web_dir, 'biomass-plots',
+                        plot_filename(new_sim_number)),
+                    output_dpi=80)
 
     logging.info("\nSimulation count by food web:")
     logging.info('\n' + pprint.pformat(dict(sim_count_by_food_web)))
@@ -192,22 +189,15 @@ def compile_data(sequence_numbers, output_dir):
 
 
 def create_sequence_dir():
-    sequence_num = get_max_sequence_number() + 1
-    sequence_dir = get_sequence_dir(sequence_num)
-    os.makedirs(sequence_dir)
+    with catalog.connect() as conn, catalog.transaction(conn):
+        sequence_num, sequence_dir = catalog.make_numbered_dir(
+            catalog.get_max_sequence_number('convergence', conn) + 1, get_sequence_dir, makedirs=True)
+        catalog.add_sequence(conn, 'convergence', sequence_num, sequence_dir)
     return sequence_num, sequence_dir
 
 
 def get_max_sequence_number():
-    max_sequence_number = -1
-    for sequence_dir in list_sequence_dirs():
-        match = re.match(r'.+?/cvg-sequence-(\d+)', sequence_dir)
-        if match is None:
-            continue
-        sequence_num = int(match.group(1))
-        if sequence_num > max_sequence_number:
-            max_sequence_number = sequence_num
-    return max_sequence_number
+    return catalog.get_max_sequence_number('convergence')
 
 
 def get_sequence_dir(sequence_number):
@@ -240,16 +230,7 @@ def init_food_web_dir(food_web_dir, node_ids):
     open(os.path.join(food_web_dir, 'node-configs.txt'), 'w').close()
 
     serengeti = foodwebs.get_serengeti()
-    subweb = serengeti.subgraph(node_ids)
-    food_web_id = '-'.join(map(str, node_ids))
-    plt.figure()
-    foodwebs.draw_food_web(
-        subweb,
-        show_legend=True,
-        output_file=os.path.join(food_web_dir, 'foodweb.{}.png'.format(food_web_id)))
-
-    with open(os.path.join(food_web_dir, 'foodweb.{}.json'.format(food_web_id)), 'w') as f:
-        print(foodwebs.food_web_json(subweb), file=f)
+    foodwebs.write_food_web_files(serengeti.subgraph(node_ids), food_web_dir)
 
 
 def simdata_filename(sim_number):
@@ -0,0 +1,225 @@
+"""
+Streaming export of labeled feature data
+
+Labeled summaries are exported for learners either as ARFF (for Weka; dense,
+or sparse with only the nonzero values of each row) or as a compact binary
+feature matrix (HDF5 with a float32 matrix X of features and an int8 vector y
+of class codes) for in-process learners. The writers take DataFrame chunks,
+such as those of summaryfiles.iter_summary_chunks() reading only the columns
+needed, so the export runs in memory proportional to the chunk size rather
+than the number of rows.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+import h5py
+
+# Summary columns used as features by default: X and K of each node
+FEATURE_COLUMN_PATTERN = re.compile(r'^(X|K)\d+$')
+
+
+def feature_columns(columns, pattern=FEATURE_COLUMN_PATTERN):
+    """ Return the columns whose names match `pattern`, in order. """
+    return [column for column in columns if pattern.match(column)]
+
+
+def _class_strings(values):
+    """ Return class labels as strings, with '?' for missing labels. """
+    return ['?' if pd.isnull(value) else str(value) for value in values]
+
+
+class ArffWriter(object):
+    """ Incrementally writes an ARFF file.
+
+    All columns except the class column are written as NUMERIC attributes,
+    and the class column as a nominal attribute named 'class'. Missing values
+    are written as '?'.
+
+    Parameters
+    ----------
+    filename : str
+        ARFF file to create
+    relation_name : str
+        Name of the relation
+    columns : list of str
+        Columns to write, in order, including the class column
+    class_column : str
+        Name of the column with class labels
+    class_values : list of str
+        Possible class labels
+    sparse : bool, optional
+        Write sparse ARFF, in which each row lists only its nonzero values
+        (the class value is always listed)
+    """
+
+    def __init__(self, filename, relation_name, columns, class_column, class_values, sparse=False):
+        self.columns = list(columns)
+        self.class_column = class_column
+        self.sparse = sparse
+        self.row_count = 0
+        self._file = open(filename, 'w')
+        f = self._file
+        f.write('@RELATION {}\n\n'.format(relation_name))
+        for column in self.columns:
+            if column == class_column:
+                f.write('@ATTRIBUTE class {{{}}}\n'.format(','.join(class_values)))
+            else:
+                f.write('@ATTRIBUTE {} NUMERIC\n'.format(column))
+        f.write('\n@DATA\n')
+
+    def _write_sparse(self, chunk):
+        class_index = self.columns.index(self.class_column)
+        numeric_columns = [c for c in self.columns if c != self.class_column]
+        values = chunk[numeric_columns].values.astype(np.float64)
+        column_indices = np.array([i for i, c in enumerate(self.columns) if c != self.class_column])
+        class_strings = _class_strings(chunk[self.class_column].values)
+        lines = []
+        for row, class_string in zip(values, class_strings):
+            nonzero = np.flatnonzero(row != 0)  # includes NaN
+            entries = ['{} {}'.format(column_indices[i], '?' if np.isnan(row[i]) else repr(float(row[i])))
+                       for i in nonzero]
+            entries.insert(int(np.searchsorted(column_indices[nonzero], class_index)),
+                           '{} {}'.format(class_index, class_string))
+            lines.append('{' + ','.join(entries) + '}\n')
+        self._file.writelines(lines)
+
+    def append(self, chunk):
+        """ Append the rows of the DataFrame `chunk`, which must have all of
+        the columns. """
+        if len(chunk) == 0:
+            return
+        if self.sparse:
+            self._write_sparse(chunk)
+        else:
+            chunk = chunk[self.columns].copy()
+            chunk[self.class_column] = _class_strings(chunk[self.class_column].values)
+            chunk.to_csv(self._file, header=False, index=False, na_rep='?')
+        self.row_count += len(chunk)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class FeatureMatrixWriter(object):
+    """ Incrementally writes a binary feature matrix file.
+
+    The file is HDF5 with a float32 dataset 'X' (rows by features) and an int8
+    dataset 'y' of class codes (indices into the class values, or -1 for
+    missing labels), with the feature names and class values as attributes.
+    See read_feature_matrix().
+
+    Parameters
+    ----------
+    filename : str
+        Name of the HDF5 file to create (overwritten if it exists)
+    feature_columns : list of str
+        Feature columns, in order
+    class_column : str
+        Name of the column with class labels
+    class_values : list of str
+        Possible class labels
+    """
+
+    def __init__(self, filename, feature_columns, class_column, class_values):
+        self.feature_columns = list(feature_columns)
+        self.class_column = class_column
+        self.class_values = list(class_values)
+        self.row_count = 0
+        self._file = h5py.File(filename, 'w')
+        string_dtype = h5py.special_dtype(vlen=str)
+        self._file.attrs['feature_names'] = np.array(self.feature_columns, dtype=string_dtype)
+        self._file.attrs['class_values'] = np.array(self.class_values, dtype=string_dtype)
+        num_features = len(self.feature_columns)
+        self._file.create_dataset('X', shape=(0, num_features), maxshape=(None, num_features),
+                                  dtype=np.float32, chunks=(max(1, 2 ** 16 // max(1, num_features)),
+                                                            num_features))
+        self._file.create_dataset('y', shape=(0,), maxshape=(None,), dtype=np.int8, chunks=True)
+
+    def append(self, chunk):
+        """ Append the rows of the DataFrame `chunk`, which must have the
+        feature and class columns. """
+        n = len(chunk)
+        if n == 0:
+            return
+        X = chunk[self.feature_columns].values.astype(np.float32)
+        y = pd.Categorical(chunk[self.class_column].astype(object),
+                           categories=self.class_values).codes.astype(np.int8)
+        for name, values in (('X', X), ('y', y)):
+            dataset = self._file[name]
+            dataset.resize(self.row_count + n, axis=0)
+            dataset[self.row_count:] = values
+        self.row_count += n
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_feature_matrix(filename):
+    """ Read a feature matrix file written by FeatureMatrixWriter.
+
+    Returns
+    -------
+    X : numpy.ndarray, y : numpy.ndarray, feature_names : list of str,
+    class_values : list of str
+    """
+    with h5py.File(filename, 'r') as f:
+        decode = lambda values: [v.decode('utf-8') if isinstance(v, bytes) else v for v in values]
+        return (f['X'][:], f['y'][:], decode(f.attrs['feature_names']),
+                decode(f.attrs['class_values']))
+
+
+def export_features(chunks, filename, feature_columns, class_column, class_values,
+                    file_format='arff', relation_name='features', drop_unlabeled=True):
+    """ Export labeled DataFrame chunks as ARFF or a feature matrix.
+
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrame
+        Chunks with (at least) the feature and class columns
+    filename : str
+        Output file
+    feature_columns : list of str
+        Feature columns, in order
+    class_column : str
+        Name of the column with class labels, written after the features
+    class_values : list of str
+        Possible class labels
+    file_format : {'arff', 'sparse-arff', 'matrix'}, optional
+        Output format
+    relation_name : str, optional
+        Name of the ARFF relation
+    drop_unlabeled : bool, optional
+        Leave out rows without a class label
+
+    Returns
+    -------
+    int
+        Number of rows written
+    """
+    if file_format == 'matrix':
+        writer = FeatureMatrixWriter(filename, feature_columns, class_column, class_values)
+    elif file_format in ('arff', 'sparse-arff'):
+        writer = ArffWriter(filename, relation_name, list(feature_columns) + [class_column],
+                            class_column, class_values, sparse=(file_format == 'sparse-arff'))
+    else:
+        raise ValueError("Unknown export format '{}'".format(file_format))
+    with writer:
+        for chunk in chunks:
+            if drop_unlabeled:
+                chunk = chunk[chunk[class_column].notnull()]
+            writer.append(chunk)
+    return writer.row_count
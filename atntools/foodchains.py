@@ -0,0 +1,191 @@
+"""
+Food chain metrics
+
+A food chain is a simple path in a food web from a source node (a species
+with no prey other than itself; see foodwebs.get_source_nodes()) to another
+node, and its length is its number of links. foodwebs.get_food_chains()
+enumerates all food chains, which takes time exponential in the size of the
+food web. The functions here compute per-species metrics of the chains
+ending at each species without enumerating them.
+
+Cannibalism (self-loops) never lengthens a chain, since a chain is a simple
+path, and a species whose only prey is itself counts as a source.
+
+Other cycles (e.g. two species that eat each other) form strongly connected
+components (SCCs) of the food web. The longest chain is found by dynamic
+programming over the DAG of SCCs, in topological order. Within an SCC, the
+longest chain is found either exactly, by searching the simple paths inside
+the SCC from each point of entry (exponential only in the size of the SCC,
+which is at most 2 in the Serengeti food web), or approximately, by treating
+the SCC as a single trophic position.
+"""
+
+import networkx as nx
+
+from . import foodwebs
+
+
+def _condensation_order(graph):
+    """ Return the SCCs of `graph` in topological order and a map of node to
+    index of its SCC in that order. """
+    sccs = list(nx.strongly_connected_components(graph))
+    condensed = nx.condensation(graph, sccs)
+    sccs = [sccs[c] for c in nx.topological_sort(condensed)]
+    component = {node: i for i, scc in enumerate(sccs) for node in scc}
+    return sccs, component
+
+
+def _longest_paths_within(graph, members, start, start_length, lengths):
+    """ Update `lengths` with the longest simple paths within `members`
+    starting at `start`. """
+    stack = [(start, start_length, frozenset([start]))]
+    while stack:
+        node, length, visited = stack.pop()
+        if lengths[node] is None or length > lengths[node]:
+            lengths[node] = length
+        for successor in graph.successors(node):
+            if successor in members and successor not in visited:
+                stack.append((successor, length + 1, visited | {successor}))
+
+
+def longest_chain_lengths(graph, exact_cycles=True):
+    """
+    Compute the length of the longest food chain ending at each node.
+
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        Food web, with edges from prey to predator
+    exact_cycles : bool, optional
+        If True, compute the exact longest simple path within cycles;
+        otherwise, give all species in a cycle the length of the longest
+        chain entering the cycle (see module docstring)
+
+    Returns
+    -------
+    dict
+        Longest chain length by node ID. Source nodes, and nodes that can't
+        be reached from any source, have length 0.
+    """
+    sources = set(foodwebs.get_source_nodes(graph))
+    sccs, component = _condensation_order(graph)
+
+    # None: not (yet) reached from a source
+    lengths = {node: None for node in graph.nodes()}
+
+    for c, members in enumerate(sccs):
+        # Longest chain reaching each member from outside its SCC
+        entry_lengths = {}
+        for node in members:
+            entry_length = 0 if node in sources else None
+            for predecessor in graph.predecessors(node):
+                if component[predecessor] != c and lengths[predecessor] is not None:
+                    if entry_length is None or lengths[predecessor] + 1 > entry_length:
+                        entry_length = lengths[predecessor] + 1
+            entry_lengths[node] = entry_length
+
+        if len(members) == 1 or not exact_cycles:
+            reached = [length for length in entry_lengths.values() if length is not None]
+            for node in members:
+                if len(members) == 1:
+                    lengths[node] = entry_lengths[node]
+                elif reached:
+                    lengths[node] = max(reached)
+        else:
+            for node, entry_length in entry_lengths.items():
+                if entry_length is not None:
+                    _longest_paths_within(graph, members, node, entry_length, lengths)
+
+    return {node: 0 if length is None else length for node, length in lengths.items()}
+
+
+def shortest_chain_lengths(graph):
+    """
+    Compute the length of the shortest food chain ending at each node.
+
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        Food web, with edges from prey to predator
+
+    Returns
+    -------
+    dict
+        Shortest chain length by node ID: 0 for source nodes, and None for
+        nodes that can't be reached from any source
+    """
+    lengths = {node: None for node in graph.nodes()}
+    frontier = foodwebs.get_source_nodes(graph)
+    for node in frontier:
+        lengths[node] = 0
+    while frontier:
+        next_frontier = []
+        for node in frontier:
+            for successor in graph.successors(node):
+                if lengths[successor] is None:
+                    lengths[successor] = lengths[node] + 1
+                    next_frontier.append(successor)
+        frontier = next_frontier
+    return lengths
+
+
+def chain_counts(graph):
+    """
+    Count the food chains ending at each node.
+
+    Counting simple paths is only tractable in general when the food web has
+    no cycles other than self-loops, which is required here.
+
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        Food web, with edges from prey to predator
+
+    Returns
+    -------
+    dict
+        Number of food chains (of at least one link) by node ID
+
+    Raises
+    ------
+    ValueError
+        If the food web has a cycle of more than one species
+    """
+    sources = set(foodwebs.get_source_nodes(graph))
+    sccs, _ = _condensation_order(graph)
+    if any(len(members) > 1 for members in sccs):
+        raise ValueError("Can't count food chains in a food web with cycles")
+
+    counts = {}
+    for (node,) in map(tuple, sccs):
+        counts[node] = sum(
+            counts[predecessor] + (1 if predecessor in sources else 0)
+            for predecessor in graph.predecessors(node) if predecessor != node)
+    return counts
+
+
+def chain_metrics(graph, exact_cycles=True):
+    """
+    Compute longest and shortest food chain lengths and, if the food web has
+    no cycles other than self-loops, food chain counts for each node.
+
+    Returns
+    -------
+    dict
+        Dict by node ID of dicts with keys 'longest_chain', 'shortest_chain'
+        and 'chain_count' (None if not computed)
+    """
+    longest = longest_chain_lengths(graph, exact_cycles)
+    shortest = shortest_chain_lengths(graph)
+    try:
+        counts = chain_counts(graph)
+    except ValueError:
+        counts = {}
+    return {
+        node: {
+            'longest_chain': longest[node],
+            'shortest_chain': shortest[node],
+            'chain_count': counts.get(node),
+        }
+        for node in graph.nodes()
+    }
@@ -0,0 +1,184 @@
+"""
+Food web property index
+
+Structural properties of every food web directory under DATA_HOME (see
+util.list_food_web_dirs()) are stored in one table, INDEX_FILE under
+DATA_HOME, as CSV with one row per food web. Since the properties only depend
+on the food web ID (the node IDs of the food web in the Serengeti food web),
+updating the index only computes the properties of food web directories that
+are not yet indexed, and drops the rows of directories that no longer exist.
+
+The index can be queried with pandas query expressions, e.g.
+
+    query_food_webs('num_species == 5 and num_basal == 2 and max_chain_length == 3')
+"""
+
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from atntools import settings
+from atntools import util
+from atntools import foodwebs
+from atntools import foodchains
+
+INDEX_FILE = 'food-web-index.csv'
+
+COLUMNS = [
+    'food_web_id',
+    'num_species',
+    'num_links',
+    'connectance',
+    'num_basal',
+    'num_top',
+    'num_cannibals',
+    'num_lonely_plant_eaters',
+    'num_components',
+    'max_chain_length',
+    'mean_max_chain_length',
+    'min_trophic_level',
+    'mean_trophic_level',
+    'max_trophic_level',
+    'std_trophic_level',
+]
+
+
+def get_index_filename():
+    return os.path.join(settings.DATA_HOME, INDEX_FILE)
+
+
+def food_web_properties(node_ids):
+    """ Compute the structural properties of a Serengeti sub-web.
+
+    Parameters
+    ----------
+    node_ids : list of int
+        Node IDs of the food web
+
+    Returns
+    -------
+    OrderedDict
+        Properties by column name (see COLUMNS). Connectance is links / species
+        squared, counting cannibal self-loops as links. Top species have no
+        predators other than themselves. Lonely plant eaters eat a source node
+        and have predators in the Serengeti food web, but none in this one.
+        Trophic levels are those of the species in the WoB database.
+    """
+    node_ids = sorted(node_ids)
+    serengeti = foodwebs.get_serengeti()
+    subweb = serengeti.subgraph(node_ids)
+    num_species = len(node_ids)
+    num_links = subweb.number_of_edges()
+
+    num_top = 0
+    num_lonely_plant_eaters = 0
+    plant_eaters = foodwebs.get_plant_eaters(subweb)
+    for node in node_ids:
+        predators = set(subweb.successors(node)) - {node}
+        if not predators:
+            num_top += 1
+            if node in plant_eaters and set(serengeti.successors(node)) - {node}:
+                num_lonely_plant_eaters += 1
+
+    chain_lengths = np.array(list(foodchains.longest_chain_lengths(subweb).values()))
+    trophic_levels = np.array([float(subweb.node[node]['trophic_level']) for node in node_ids])
+
+    return OrderedDict([
+        ('food_web_id', '-'.join(map(str, node_ids))),
+        ('num_species', num_species),
+        ('num_links', num_links),
+        ('connectance', num_links / num_species ** 2),
+        ('num_basal', len(foodwebs.get_basal_species(subweb))),
+        ('num_top', num_top),
+        ('num_cannibals', len(subweb.nodes_with_selfloops())),
+        ('num_lonely_plant_eaters', num_lonely_plant_eaters),
+        ('num_components', nx.number_weakly_connected_components(subweb)),
+        ('max_chain_length', int(chain_lengths.max())),
+        ('mean_max_chain_length', chain_lengths.mean()),
+        ('min_trophic_level', trophic_levels.min()),
+        ('mean_trophic_level', trophic_levels.mean()),
+        ('max_trophic_level', trophic_levels.max()),
+        ('std_trophic_level', trophic_levels.std()),
+    ])
+
+
+def read_index(filename=None):
+    """ Read the food web index, or return an empty one if it doesn't exist. """
+    if filename is None:
+        filename = get_index_filename()
+    if not os.path.isfile(filename):
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.read_csv(filename, dtype={'food_web_id': str})
+
+
+def write_index(index, filename=None):
+    """ Write the food web index, atomically replacing the existing one. """
+    if filename is None:
+        filename = get_index_filename()
+    fd, temp_filename = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            index.to_csv(f, index=False)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        os.remove(temp_filename)
+        raise
+
+
+def update_index(rebuild=False, filename=None):
+    """ Bring the food web index up to date with the food web directories.
+
+    Parameters
+    ----------
+    rebuild : bool, optional
+        Recompute the properties of all food webs, e.g. after a change to the
+        Serengeti data or to the properties computed
+    filename : str, optional
+        Index file (default: INDEX_FILE under DATA_HOME)
+
+    Returns
+    -------
+    pandas.DataFrame
+        The updated index, sorted by number of species and food web ID
+    """
+    index = pd.DataFrame(columns=COLUMNS) if rebuild else read_index(filename)
+    food_web_ids = [food_web_id for food_web_id, _ in util.list_food_web_dirs()]
+
+    indexed = set(index['food_web_id'])
+    new_rows = [food_web_properties([int(x) for x in food_web_id.split('-')])
+                for food_web_id in food_web_ids if food_web_id not in indexed]
+    existing = set(food_web_ids)
+    stale = ~index['food_web_id'].isin(existing)
+
+    if new_rows or stale.any() or rebuild or list(index.columns) != COLUMNS:
+        index = pd.concat([index[~stale], pd.DataFrame(new_rows, columns=COLUMNS)],
+                          ignore_index=True)
+        index = index.reindex(columns=COLUMNS)
+        for column in COLUMNS[1:]:
+            index[column] = pd.to_numeric(index[column])
+        index = index.sort_values(['num_species', 'food_web_id']).reset_index(drop=True)
+        write_index(index, filename)
+    return index
+
+
+def query_food_webs(expr, update=True):
+    """ Select rows of the food web index with a pandas query expression.
+
+    Parameters
+    ----------
+    expr : str
+        Query expression on the index columns (see COLUMNS)
+    update : bool, optional
+        Update the index first (see update_index())
+
+    Returns
+    -------
+    pandas.DataFrame
+        Matching rows of the index
+    """
+    index = update_index() if update else read_index()
+    return index.query(expr)
@@ -3,14 +3,21 @@ import json
 import os
 import csv
 import random
+import hashlib
+import tempfile
+import multiprocessing
 
 import matplotlib
 matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.patches import Rectangle
 import matplotlib.pyplot as plt
 import networkx as nx
 
 from atntools.util import WOB_DB_DIR
+from atntools import wobdata
+from atntools import subwebs
 
 ORGANISM_TYPE_ANIMAL = 0
 ORGANISM_TYPE_PLANT = 1
@@ -72,47 +79,126 @@ _serengeti = None
 
 
 def get_serengeti():
+    """ Return the Serengeti food web graph, built from the compiled WoB data
+    (see wobdata) the first time. """
     global _serengeti
     if _serengeti is None:
-        _serengeti = read_serengeti_from_csv()
+        _serengeti = wobdata.get_wob_data().graph()
     return _serengeti
 
 
-def draw_food_web(graph, show_names=False, show_legend=False, output_file=None, figsize=None, dpi=100):
+def get_layout(graph, prog='dot', cache_dir=None, use_cache=True):
+    """ Return the graphviz layout of a food web, using a cached layout if
+    there is one.
 
-    plt.figure(figsize=figsize)
+    Layouts are cached in `cache_dir` (default: 'layouts' in wobdata.CACHE_DIR,
+    looked up at call time), one JSON file per food web, named for
+    the number of nodes and a hash of the food web ID, the edges and `prog`,
+    so a layout is recomputed if the food web changes. If the cache can't be
+    written, the layout is returned anyway.
 
-    # pos = nx.spring_layout(graph)
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        The food web
+    prog : str, optional
+        graphviz program to compute the layout with
+    cache_dir : str, optional
+        Directory of cached layouts
+    use_cache : bool, optional
+        Whether to use the cache
+
+    Returns
+    -------
+    dict
+        Position (x, y) by node ID
+    """
+    def compute_layout():
+        return nx.drawing.nx_agraph.graphviz_layout(graph, prog=prog, args='-Grankdir=BT')
+
+    if not use_cache:
+        return compute_layout()
+    if cache_dir is None:
+        cache_dir = os.path.join(wobdata.CACHE_DIR, 'layouts')
+
+    food_web_id = '-'.join(map(str, sorted(graph.nodes())))
+    key = json.dumps([food_web_id, sorted(graph.edges()), prog])
+    filename = os.path.join(cache_dir, '{}-species-{}.json'.format(
+        graph.number_of_nodes(), hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]))
+
+    try:
+        with open(filename) as f:
+            cached = json.load(f)
+        # Compare node lists to guard against hash collisions
+        if cached['food_web_id'] == food_web_id:
+            return {node: (x, y) for node, x, y in cached['positions']}
+    except (OSError, ValueError, KeyError):
+        pass
+
+    pos = compute_layout()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_filename = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'food_web_id': food_web_id,
+                'positions': [[node, x, y] for node, (x, y) in sorted(pos.items())],
+            }, f)
+        os.replace(temp_filename, filename)
+    except OSError:
+        pass
+    return pos
+
+
+def draw_food_web(graph, show_names=False, show_legend=False, output_file=None, figsize=None, dpi=100,
+                  ax=None, pos=None):
+    """ Draw a food web, with nodes colored by trophic level.
+
+    Unless `ax` is given, the food web is drawn on a new pyplot figure.
 
-    graphviz_prog = 'dot'
-    # graphviz_prog = 'neato'
-    pos = nx.drawing.nx_agraph.graphviz_layout(graph, prog=graphviz_prog, args='-Grankdir=BT')
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        The food web
+    show_names : bool, optional
+        Label nodes with species names as well as node IDs
+    show_legend : bool, optional
+        Show a legend of node IDs and species names
+    output_file : str, optional
+        Save the figure to this file
+    figsize : (float, float), optional
+        Figure size in inches (if `ax` is not given)
+    dpi : int, optional
+        Resolution of the saved figure
+    ax : matplotlib.axes.Axes, optional
+        Axes to draw on (e.g. of a Figure with its own Agg canvas, which
+        needs no pyplot state, as draw_food_web_dirs() does)
+    pos : dict, optional
+        Node positions (default: get_layout(graph))
 
-    # Attempt at layout by trophic level. Doesn't work too well. Labels and edges overlap a lot.
-    # pos = {}
-    # count_by_trophic_level = {}
-    # for node, data in graph.nodes_iter(data=True):
-    #    trophic_level = float(data['trophic_level'])
-    #    rounded_trophic_level = round(trophic_level)
-    #    if rounded_trophic_level not in count_by_trophic_level:
-    #        count_by_trophic_level[rounded_trophic_level] = 1
-    #    else:
-    #        count_by_trophic_level[rounded_trophic_level] += 1
-    #    pos[node] = (count_by_trophic_level[rounded_trophic_level], trophic_level)
-    # Using the positions calculated above as initial positions for spring_layout destroys the trophic-level-y
-    # pos = nx.spring_layout(graph, pos=pos)
+    Returns
+    -------
+    matplotlib.axes.Axes
+        The axes drawn on
+    """
+    if ax is None:
+        plt.figure(figsize=figsize)
+        ax = plt.gca()
+    fig = ax.figure
 
-    # Instead, color nodes by trophic level.
+    if pos is None:
+        pos = get_layout(graph)
 
+    # Color nodes by trophic level.
+    # (Layout by trophic level was tried, but labels and edges overlapped a lot.)
     colors = [float(data['trophic_level']) * -1 + 5 for node, data in graph.nodes_iter(data=True)]
 
     # True vmin and vmax defining the color range are 1 and 4, but setting vmax to 4.5 to avoid the green getting too dark
-    nx.draw_networkx_nodes(graph, pos, node_color=colors, cmap='RdYlGn', vmin=1, vmax=4.5)
+    nx.draw_networkx_nodes(graph, pos, node_color=colors, cmap='RdYlGn', vmin=1, vmax=4.5, ax=ax)
 
-    # nx.draw_networkx_nodes(graph, pos, node_size=colors)
-    nx.draw_networkx_edges(graph, pos)
+    nx.draw_networkx_edges(graph, pos, ax=ax)
 
-    plt.gca().set_axis_bgcolor('white')
+    ax.set_facecolor('white')
 
     if show_names:
         labels = {node[0]: '  ' + str(node[0]) + ' ' + node[1]['name']
@@ -126,21 +212,14 @@ def draw_food_web(graph, show_names=False, show_legend=False, output_file=None,
     for node in graph.nodes_with_selfloops():
         labels[node] = 'C{}  '.format(node)
 
-    nx.draw_networkx_labels(graph, pos, labels)
-
-    # Draw images
-    # Not working yet; try http://stackoverflow.com/questions/4860417/placing-custom-images-in-a-plot-window-as-custom-data-markers-or-to-annotate-t
-    # img = mpimg.imread('images/Aardvark.png')
-
-    cur_axes = plt.gca()
-    cur_axes.axes.get_xaxis().set_visible(False)
-    cur_axes.axes.get_yaxis().set_visible(False)
+    nx.draw_networkx_labels(graph, pos, labels, ax=ax)
 
-    # plt.axis('off')
+    ax.get_xaxis().set_visible(False)
+    ax.get_yaxis().set_visible(False)
 
     if show_legend:
         invisible_handle = Rectangle((0, 0), 0, 0, alpha=0.0)
-        lgd = plt.legend(
+        lgd = ax.legend(
             [invisible_handle] * graph.number_of_nodes(),
             ['[{}] {}'.format(node_id, graph.node[node_id]['name'])
              for node_id in sorted(graph.nodes())],
@@ -149,13 +228,83 @@ def draw_food_web(graph, show_names=False, show_legend=False, output_file=None,
 
     if output_file:
         if show_legend:
-            plt.savefig(output_file, bbox_extra_artists=(lgd,),
+            fig.savefig(output_file, bbox_extra_artists=(lgd,),
                         bbox_inches='tight', dpi=dpi)
         else:
-            plt.savefig(output_file, dpi=dpi)
-    #else:
-    #    plt.show()
-    return cur_axes
+            fig.savefig(output_file, dpi=dpi)
+    return ax
+
+
+def food_web_plot_filename(food_web_dir):
+    """ Return the name of the food web plot in a food web directory. """
+    food_web_id = os.path.basename(os.path.normpath(food_web_dir))
+    return os.path.join(food_web_dir, 'foodweb.{}.png'.format(food_web_id))
+
+
+def food_web_json_filename(food_web_dir):
+    """ Return the name of the food web JSON file in a food web directory. """
+    food_web_id = os.path.basename(os.path.normpath(food_web_dir))
+    return os.path.join(food_web_dir, 'foodweb.{}.json'.format(food_web_id))
+
+
+def write_food_web_files(graph, food_web_dir, draw=True, **kwargs):
+    """ Write the JSON file (see food_web_json()) and, if `draw` is True, the
+    plot (with a legend) of a food web to its directory, which is named for
+    its food web ID.
+
+    Other keyword arguments are passed to draw_food_web().
+    """
+    with open(food_web_json_filename(food_web_dir), 'w') as f:
+        print(food_web_json(graph), file=f)
+    if draw:
+        kwargs.setdefault('show_legend', True)
+        ax = draw_food_web(graph, output_file=food_web_plot_filename(food_web_dir), **kwargs)
+        plt.close(ax.figure)
+
+
+def _draw_food_web_dir(args):
+    food_web_dir, kwargs = args
+    food_web_id = os.path.basename(os.path.normpath(food_web_dir))
+    subweb = get_serengeti().subgraph([int(x) for x in food_web_id.split('-')])
+    output_file = food_web_plot_filename(food_web_dir)
+    # A Figure of its own rather than pyplot's, which isn't meant for use
+    # by many workers
+    kwargs = dict(kwargs)
+    fig = Figure(figsize=kwargs.pop('figsize', None))
+    FigureCanvasAgg(fig)
+    draw_food_web(subweb, output_file=output_file, ax=fig.add_subplot(111), **kwargs)
+    return output_file
+
+
+def draw_food_web_dirs(food_web_dirs, processes=None, show_legend=True, **kwargs):
+    """ Draw the food web plots of many food web directories in parallel.
+
+    Each plot is saved as foodweb.<food web ID>.png in its directory (see
+    food_web_plot_filename()), with layouts taken from the layout cache
+    (see get_layout()) where possible.
+
+    Parameters
+    ----------
+    food_web_dirs : list of str
+        Food web directories, each named for its food web ID
+    processes : int, optional
+        Number of worker processes (default: number of CPUs)
+    show_legend : bool, optional
+        Show a legend of node IDs and species names
+    **kwargs
+        Other arguments to draw_food_web()
+
+    Returns
+    -------
+    list of str
+        The plot files, in the order of `food_web_dirs`
+    """
+    kwargs['show_legend'] = show_legend
+    tasks = [(food_web_dir, kwargs) for food_web_dir in food_web_dirs]
+    if processes == 1 or len(tasks) <= 1:
+        return [_draw_food_web_dir(task) for task in tasks]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(_draw_food_web_dir, tasks)
 
 
 def random_subgraph(graph, N):
@@ -217,6 +366,9 @@ def get_food_chains(graph):
     A food chain is defined here as a simple path from a source node
     (a node with no predecessors) to another node.
 
+    This enumerates every food chain, which takes exponential time; see the
+    foodchains module for per-species chain metrics that don't.
+
     Parameters
     ----------
     graph : nx.DiGraph
@@ -252,108 +404,77 @@ def get_plant_eaters(graph):
     return plant_eaters
 
 
-# This is a hack
-_predator_complete_subweb_retry_count = 0
-
 def predator_complete_subweb(G, N, seed_nodes=None, seed_size=1, retry=1):
     """
     A version of random_successor_subgraph with the following addition: Each
     iteration, before choosing a random neighbor, choose a neighbor of a plant
     eater which does not currently have a predator ("lonely plant eater") in the
     subgraph (if any).
-    
+
     The goal is to produce a sub-web in which everything that eats plants has a
     predator, but this is not guaranteed, because:
     - Some plant eaters have no predators in the full graph
       (e.g. African Elephant, Hippopotamus)
-    - N might be too small to ensure all plant eaters have predators 
-    
+    - N might be too small to ensure all plant eaters have predators
+
     seed_nodes: list of nodes from which to randomly choose seed_size starting
     nodes
-    """
-    global _predator_complete_subweb_retry_count
-
-    if seed_nodes is None:
-        seed_nodes = G.nodes()
-    nodes = set(random.sample(seed_nodes, seed_size))
-
-    plant_eaters = get_plant_eaters(G)
-
-    for i in range(N - seed_size):
-
-        # Identify any plant eaters without predators
-        lonely_plant_eaters = {}  # key: plant eater node; value: list of predator nodes
-        # For each plant eater in the current subgraph
-        for node in plant_eaters & nodes:
-            predators = G.successors(node)
-            if node in predators:
-                predators.remove(node)  # don't count self as predator (cannibals)
-            if len(predators) == 0:
-                pass
-                # print("Lonely plant eater {} has no predators in full graph".format(node))
-            # If the current subgraph does not contain any of the plant eater's successors
-            elif len(nodes & set(predators)) == 0:
-                lonely_plant_eaters[node] = predators
-
-        # If there are any lonely plant eaters, add a random predator of of any of them
-        # and skip to the next iteration of the loop.
-        if len(lonely_plant_eaters) > 0:
-            candidate_predators = []
-            for node, predators in lonely_plant_eaters.items():
-                candidate_predators.extend(predators)
-            if len(candidate_predators) > 0:
-                nodes.add(random.choice(candidate_predators))
-                continue
-
-        # Find the neighbor nodes of the subgraph nodes
-        neighbors = set()
-        for node in nodes:
-            neighbors = neighbors | set(G.successors(node))
-        neighbors = neighbors - nodes  # Exclude nodes already in the subgraph
-
-        if len(neighbors) == 0:
-            #print("predator_complete_subweb: no candidate neighbors found. ", end='')
-            if (retry > 0):
-                #print("Retrying.")
-                _predator_complete_subweb_retry_count += 1
-                return predator_complete_subweb(G, N, seed_nodes, seed_size=seed_size,
-                                                retry=retry - 1)
-            else:
-                #print("Giving up.")
-                return None
-
-        # Add a random neighbor to the subgraph
-        nodes.add(random.choice(list(neighbors)))
-
-    subgraph = G.subgraph(list(nodes))
-    num_components = nx.number_connected_components(subgraph.to_undirected())
-    if num_components > 1:
-        #print("random_successor_subgraph: {} connected components. ".format(num_components),
-        #     end='')
-        if (retry > 0):
-        #   print("Retrying.")
-            _predator_complete_subweb_retry_count += 1
-            return predator_complete_subweb(G, N, seed_nodes, seed_size=seed_size,
-                                            retry=retry - 1)
-        else:
-        #   print("Giving up.")
-            return None
-
-    return subgraph
 
+    If the subgraph can't be grown to N nodes or is disconnected, up to
+    `retry` more attempts are made before giving up and returning None.
+    See subwebs.PredatorCompleteSampler, which does the sampling.
+    """
+    sampler = subwebs.PredatorCompleteSampler(G, seed_nodes)
+    nodes = sampler.sample(N, seed_size, max_attempts=retry + 1)
+    if nodes is None:
+        return None
+    return G.subgraph(nodes)
 
-def serengeti_predator_complete_subweb(size, num_basal_species, retry=10):
-    serengeti = get_serengeti()
 
-    # For the seed nodes, use the basal species excluding Decaying Material
+def serengeti_seed_nodes(serengeti):
+    """ Return the nodes from which Serengeti sub-webs are grown: the basal
+    species excluding Decaying Material. """
     seed_nodes = get_basal_species(serengeti)
     if 1 in seed_nodes:
         seed_nodes.remove(1)
+    return seed_nodes
+
 
-    return predator_complete_subweb(serengeti, size, seed_nodes=seed_nodes,
+def serengeti_predator_complete_subweb(size, num_basal_species, retry=10):
+    serengeti = get_serengeti()
+    return predator_complete_subweb(serengeti, size, seed_nodes=serengeti_seed_nodes(serengeti),
                                     seed_size=num_basal_species, retry=retry)
 
 
+def serengeti_predator_complete_subwebs(size, num_basal_species, count, unique=True,
+                                        max_attempts=None):
+    """ Generate many Serengeti sub-webs as in serengeti_predator_complete_subweb().
+
+    Parameters
+    ----------
+    size : int
+        Number of species in each sub-web
+    num_basal_species : int
+        Number of basal species each sub-web is started from
+    count : int
+        Number of sub-webs to generate
+    unique : bool, optional
+        If True, don't generate the same sub-web twice
+    max_attempts : int, optional
+        Maximum number of attempts (see subwebs.PredatorCompleteSampler.sample_many())
+
+    Yields
+    ------
+    list
+        Sorted node IDs of each sub-web
+    """
+    serengeti = get_serengeti()
+    sampler = subwebs.PredatorCompleteSampler(serengeti, serengeti_seed_nodes(serengeti))
+    for node_ids in sampler.sample_many(size, count, seed_size=num_basal_species, unique=unique,
+                                        max_attempts=max_attempts):
+        yield node_ids
+
+
 def species_node_id_map(graph):
     """ Build a map of species IDs to node IDs.
 
@@ -4,21 +4,30 @@ import sys
 
 import pandas as pd
 
+from . import summaryfiles
+from .quantiles import QuantileSketch
+
 # Used to identify instances of misbehaving ATNEngine
 MAX_REASONABLE_BIOMASS = 100000
 MAX_REASONABLE_LAST_NONZERO_BIOMASS = 100
 
 
-def remove_ugly_instances(df):
-    """ Return a new DataFrame with "ugly" instances removed (misbehaving
+def well_behaved(df):
+    """ Return a boolean Series that is False for "ugly" instances (misbehaving
     ATNEngine causing biomass to explode and/or crash to zero) """
-    df2 = df[(
+    return ((
                 # Final timestep is nonzero,
                 # or final nonzero value is small enough that it wasn't a crash
                 (df.lastNonzeroTimestep == df.timesteps - 1) |
                 (df.lastNonzeroBiomass <= MAX_REASONABLE_LAST_NONZERO_BIOMASS)
             ) &
-            (df.maxBiomass <= MAX_REASONABLE_BIOMASS)]
+            (df.maxBiomass <= MAX_REASONABLE_BIOMASS))
+
+
+def remove_ugly_instances(df):
+    """ Return a new DataFrame with "ugly" instances removed (misbehaving
+    ATNEngine causing biomass to explode and/or crash to zero) """
+    df2 = df[well_behaved(df)]
     total = len(df)
     ugly = total - len(df2)
     print("Removed {} badly behaved instances out of {} total ({:.2f}%)".format(
@@ -26,9 +35,100 @@ def remove_ugly_instances(df):
     return df2
 
 
-def assign_labels(df, col):
-    q1 = df[col].quantile(0.25)
-    q2 = df[col].quantile(0.75)
+def assign_labels(df, col, q1=None, q2=None):
+    """ Add a 'label_<col>' column to `df`: 'bad' for values at or below the
+    first quartile of `col` and 'good' for values at or above the third
+    quartile. The quartiles may be given (e.g. computed over more data than
+    `df`). """
+    if q1 is None:
+        q1 = df[col].quantile(0.25)
+    if q2 is None:
+        q2 = df[col].quantile(0.75)
     df.loc[df[col] <= q1, 'label_' + col] = 'bad'
     df.loc[df[col] >= q2, 'label_' + col] = 'good'
 
+
+def assign_labels_streaming(input_files, output_file, label_prefix='environmentScoreSlope',
+                            remove_ugly=True, chunk_size=summaryfiles.READ_CHUNK_SIZE,
+                            quantiles=(0.25, 0.75)):
+    """ Label the instances of many summary/feature files without loading them
+    all into memory.
+
+    The input files are streamed twice: once to compute the label thresholds
+    (quantiles) of each column to be labeled, using mergeable quantile
+    sketches, and once to assign the labels and write the output chunk by
+    chunk.
+
+    Parameters
+    ----------
+    input_files : list of str
+        Unlabeled summary/feature files (CSV or columnar HDF5), all with the
+        columns of the first file
+    output_file : str
+        Labeled output file. Written as columnar HDF5 if the name ends with
+        '.h5', otherwise as CSV.
+    label_prefix : str, optional
+        Columns starting with this prefix are labeled (see assign_labels())
+    remove_ugly : bool, optional
+        Whether to remove "ugly" instances (see remove_ugly_instances())
+    chunk_size : int, optional
+        Number of rows to process at a time
+    quantiles : tuple of float, optional
+        Quantile levels of the thresholds (q1, q2) of each labeled column:
+        values at or below q1 are labeled 'bad' and values at or above q2
+        'good' (see assign_labels()). The default is the quartiles.
+
+    Returns
+    -------
+    dict
+        Thresholds (q1, q2) of each labeled column
+    """
+    low, high = quantiles
+    if not 0 <= low <= high <= 1:
+        raise ValueError("Invalid label quantiles: {}".format(quantiles))
+
+    def labeled_chunks():
+        for chunk in summaryfiles.iter_summary_chunks(input_files, chunk_size=chunk_size):
+            if remove_ugly:
+                chunk = chunk[well_behaved(chunk)].copy()
+            for col, (q1, q2) in sorted(thresholds.items()):
+                # Create the column even if no rows in this chunk get labels
+                chunk['label_' + col] = pd.Categorical(
+                    [None] * len(chunk), categories=['bad', 'good'])
+                assign_labels(chunk, col, q1, q2)
+            yield chunk
+
+    # Pass 1: quantile sketches of the columns to label
+    sketches = {}
+    total = 0
+    kept = 0
+    for chunk in summaryfiles.iter_summary_chunks(input_files, chunk_size=chunk_size):
+        total += len(chunk)
+        if remove_ugly:
+            chunk = chunk[well_behaved(chunk)]
+        kept += len(chunk)
+        for col in chunk.columns:
+            if col.startswith(label_prefix):
+                # Fixed seed, so the same inputs always get the same labels
+                sketches.setdefault(col, QuantileSketch(seed=0)).update(chunk[col].values)
+    if remove_ugly and total > 0:
+        ugly = total - kept
+        print("Removed {} badly behaved instances out of {} total ({:.2f}%)".format(
+            ugly, total, 100 * (ugly / total)))
+    thresholds = {col: (sketch.quantile(low), sketch.quantile(high))
+                  for col, sketch in sketches.items()}
+
+    # Pass 2: assign labels and write output
+    if output_file.endswith('.h5'):
+        with summaryfiles.SummaryWriter(output_file) as writer:
+            for chunk in labeled_chunks():
+                writer.append(chunk)
+    else:
+        header = True
+        with open(output_file, 'w') as f:
+            for chunk in labeled_chunks():
+                chunk.to_csv(f, header=header, index=False)
+                header = False
+
+    return thresholds
+
@@ -0,0 +1,157 @@
+"""
+Indexed node config files
+
+A node config file (such as node-configs.txt in a batch directory) has one
+node config string per line, the line number being the sim number. To find
+the node config of a simulation without reading the whole file, a sidecar
+index file (the node config file name with INDEX_SUFFIX appended) holds the
+byte offset of the start of each line, plus the size of the file, as a NumPy
+.npy array of int64. It is written along with the node config file by
+write_node_config_file(), or built the first time the file is opened with
+NodeConfigFile.
+"""
+
+import os
+import mmap
+
+import numpy as np
+
+INDEX_SUFFIX = '.idx.npy'
+
+# Number of bytes scanned at a time when building an index
+INDEX_CHUNK_SIZE = 2 ** 26
+
+
+def index_filename(filename):
+    """ Return the name of the index file of a node config file. """
+    return filename + INDEX_SUFFIX
+
+
+def write_node_config_file(filename, node_configs):
+    """ Write node config strings to a file, one per line, along with its index.
+
+    Parameters
+    ----------
+    filename : str
+        Node config file to write
+    node_configs : iterable of str
+        Node config strings
+
+    Returns
+    -------
+    int
+        The number of node configs written
+    """
+    offsets = [0]
+    with open(filename, 'wb') as f:
+        for node_config in node_configs:
+            line = (node_config + '\n').encode('utf-8')
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(index_filename(filename), np.array(offsets, dtype=np.int64))
+    return len(offsets) - 1
+
+
+def build_index(filename):
+    """ Build (or rebuild) the index of a node config file.
+
+    The file is scanned in chunks of INDEX_CHUNK_SIZE bytes, so files of any
+    size can be indexed.
+
+    Returns
+    -------
+    numpy.ndarray
+        The line offsets, as stored in the index file
+    """
+    size = os.path.getsize(filename)
+    newline_positions = []
+    with open(filename, 'rb') as f:
+        position = 0
+        while True:
+            chunk = f.read(INDEX_CHUNK_SIZE)
+            if not chunk:
+                break
+            newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n'))
+            newline_positions.append(newlines + position)
+            position += len(chunk)
+    line_ends = (np.concatenate(newline_positions) + 1 if newline_positions
+                 else np.empty(0, dtype=np.int64))
+    if size > 0 and (len(line_ends) == 0 or line_ends[-1] != size):
+        # Last line has no newline
+        line_ends = np.append(line_ends, size)
+    offsets = np.concatenate([[0], line_ends]).astype(np.int64)
+    np.save(index_filename(filename), offsets)
+    return offsets
+
+
+def load_index(filename):
+    """ Load the index of a node config file, building it if it is missing or
+    out of date. """
+    index_file = index_filename(filename)
+    if (os.path.isfile(index_file) and
+            os.path.getmtime(index_file) >= os.path.getmtime(filename)):
+        offsets = np.load(index_file)
+        if len(offsets) > 0 and offsets[-1] == os.path.getsize(filename):
+            return offsets
+    return build_index(filename)
+
+
+class NodeConfigFile(object):
+    """ Random access to the node configs in a node config file.
+
+    The file is memory-mapped and its lines are located with its index (see
+    load_index()), so looking up a node config by sim number takes constant
+    time regardless of the size of the file.
+
+    Node configs are returned as strings without the trailing newline.
+    Indexing with an int returns one node config; indexing with a slice
+    returns a list.
+
+    Parameters
+    ----------
+    filename : str
+        Node config file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._offsets = load_index(filename)
+        self._file = open(filename, 'rb')
+        if self._offsets[-1] > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # Empty files can't be memory-mapped
+            self._mmap = b''
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def get(self, sim_number):
+        """ Return the node config of the given sim number. """
+        if sim_number < 0:
+            sim_number += len(self)
+        if not 0 <= sim_number < len(self):
+            raise IndexError("Sim number {} out of range".format(sim_number))
+        start = self._offsets[sim_number]
+        end = self._offsets[sim_number + 1]
+        return self._mmap[start:end].decode('utf-8').rstrip('\r\n')
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.get(i) for i in range(*key.indices(len(self)))]
+        return self.get(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get(i)
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,15 +1,27 @@
 import random
+import re
+import io
 import json
+import itertools
 import glob
 import os.path
 import pdb
 from collections import Counter, defaultdict
 import pprint
+import warnings
+import functools
+import inspect
+import multiprocessing
 
 import numpy as np
+import pandas as pd
 
 from . import foodwebs
+from . import foodchains
 from . import util
+from . import wobdata
+from . import summaryfiles
+from . import trees
 from .simulationdata import SimulationData, EXTINCT
 
 # Parameter sliders in Convergence game are bounded by these ranges
@@ -41,19 +53,46 @@ valid_param_ranges = {
 # 
 
 
+# Node parameters, in the order they are written in node config strings
+NODE_PARAMS = ('K', 'R', 'X')
+
+# Structured array representation of one node of a node config, as returned
+# by parse_node_configs(). Parameters that are not configured are NaN.
+NODE_CONFIG_DTYPE = np.dtype([
+    ('nodeId', np.int64),
+    ('initialBiomass', np.float64),
+    ('perUnitBiomass', np.float64),
+    ('K', np.float64),
+    ('R', np.float64),
+    ('X', np.float64),
+])
+
+# Number of node config strings tokenized at a time by parse_node_configs()
+_PARSE_CHUNK_SIZE = 100000
+
+
+def _parse_node_id(token):
+    if not (token.startswith('[') and token.endswith(']')):
+        raise ValueError("Invalid node ID '{}' in node config".format(token))
+    return int(token[1:-1])
+
+
 def parse_node_config(node_config):
     """
     Parse a node config string and return a list-of-dicts representation.
+
+    Link parameters, if any, are returned in a 'links' list in the node dict,
+    with one {'nodeId': linked_node_id, <param>: value} dict per link parameter.
     """
     nodes = []
-    config_list = node_config.split(',')
+    config_list = node_config.strip().split(',')
     num_nodes = int(config_list[0])
 
     pos = 1  # current position in the comma-split list
 
     for i in range(num_nodes):
         node = {
-                'nodeId': int(config_list[pos][1:-1]),  # FIXME validate [#]
+                'nodeId': _parse_node_id(config_list[pos]),
                 'initialBiomass': float(config_list[pos+1]),
                 'perUnitBiomass': float(config_list[pos+2]),
                 }
@@ -63,7 +102,17 @@ def parse_node_config(node_config):
             param_name, param_value = config_list[pos].split('=')
             node[param_name] = float(param_value)
             pos += 1
-        pos += 1  # FIXME assuming there are no node link parameters
+        num_links = int(config_list[pos])
+        pos += 1
+        if num_links > 0:
+            node['links'] = []
+            for l in range(num_links):
+                param_name, param_value = config_list[pos+1].split('=')
+                node['links'].append({
+                    'nodeId': _parse_node_id(config_list[pos]),
+                    param_name: float(param_value)
+                })
+                pos += 2
         nodes.append(node)
 
     return nodes
@@ -81,13 +130,19 @@ def node_config_to_string(nodes):
 
         param_count = 0
         param_config = ''
-        for param in ('K', 'R', 'X'):
+        for param in NODE_PARAMS:
             if param in node:
                 param_config += '{}={:.6},'.format(param, float(node[param]))
                 param_count += 1
 
-        # The final 0 is for the number of link parameters, which is always 0
-        node_config += '{},{}0'.format(param_count, param_config)
+        link_config = ''
+        links = node.get('links', [])
+        for link in links:
+            for param, value in sorted(link.items()):
+                if param != 'nodeId':
+                    link_config += ',[{}],{}={:.6}'.format(link['nodeId'], param, float(value))
+
+        node_config += '{},{}{}{}'.format(param_count, param_config, len(links), link_config)
 
     return node_config
 
@@ -97,21 +152,295 @@ def node_config_to_params(node_config):
     Given a node config as returned by parseNodeConfig(), return a dictionary
     with one key-value pair for each node-parameter pair, where the keys are
     named with the parameter name with the node ID appended.
+    Link parameters are not included.
     """
     params = {}
     for node in node_config:
         for key, value in node.items():
-            if key == 'nodeId':
+            if key in ('nodeId', 'links'):
                 continue
             params[key + str(node['nodeId'])] = value
     return params
 
 
+def _node_config_layout(tokens):
+    """ Determine the layout of a tokenized node config (see parse_node_configs()).
+
+    Returns
+    -------
+    structural : list of int
+        Token positions that must be identical in node configs with the same
+        layout (counts, node IDs and parameter names)
+    fields : list of (int, int, str)
+        (token position, node index, field name) of each value mapped to a
+        NODE_CONFIG_DTYPE field
+    """
+    structural = [0]
+    fields = []
+    num_nodes = int(tokens[0])
+    pos = 1
+    for i in range(num_nodes):
+        structural.append(pos)
+        fields.append((pos, i, 'nodeId'))
+        fields.append((pos + 1, i, 'initialBiomass'))
+        fields.append((pos + 2, i, 'perUnitBiomass'))
+        structural.append(pos + 3)
+        num_params = int(tokens[pos + 3])
+        pos += 4
+        for p in range(num_params):
+            structural.append(pos)
+            fields.append((pos + 1, i, tokens[pos]))
+            pos += 2
+        structural.append(pos)
+        num_links = int(tokens[pos])
+        pos += 1
+        # Link node IDs and parameter names; values are not mapped to fields
+        for l in range(num_links):
+            structural.extend([pos, pos + 1])
+            pos += 3
+    return structural, fields
+
+
+def _tokenize(text):
+    """ Separate parameter names from values in node config text and remove
+    the brackets around node IDs, so that every token is comma-separated. """
+    return text.replace('[', '').replace(']', '').replace('=', ',')
+
+
+def _parse_node_configs_same_layout(lines, out):
+    """ Parse node config strings with identical layouts into the structured
+    array `out`, using the pandas CSV parser to tokenize and convert them.
+    Returns False (leaving `out` partly filled) if the layouts turn out not
+    to be identical. """
+    first_tokens = _tokenize(lines[0]).split(',')
+    structural, fields = _node_config_layout(first_tokens)
+    num_tokens = len(first_tokens)
+    for start in range(0, len(lines), _PARSE_CHUNK_SIZE):
+        chunk = lines[start:start + _PARSE_CHUNK_SIZE]
+        try:
+            tokens = pd.read_csv(
+                io.StringIO(_tokenize('\n'.join(chunk))),
+                header=None, names=range(num_tokens), index_col=False,
+                float_precision='round_trip')
+        except (pd.errors.ParserError, ValueError):
+            # Some node config has more tokens
+            return False
+        if len(tokens) != len(chunk):
+            return False
+        for pos in structural:
+            column = tokens[pos].values
+            if not (column == first_tokens[pos] if column.dtype == object
+                    else column == float(first_tokens[pos])).all():
+                return False
+        for pos, node_index, field in fields:
+            if field in NODE_CONFIG_DTYPE.names:
+                out[field][start:start + len(chunk), node_index] = tokens[pos].values
+    return True
+
+
+def parse_node_configs(node_configs):
+    """
+    Parse many node config strings into a structured array.
+
+    When all node configs have the same layout (the same nodes, in the same
+    order, with the same parameters configured), which is the case for the
+    output of most generators, they are parsed with array operations.
+    Otherwise, they are parsed one at a time with parse_node_config().
+
+    Parameters
+    ----------
+    node_configs : iterable of str or bytes
+        Node config strings, e.g. the lines of a node config file or the
+        node_config values of a batch of HDF5 files. Blank lines are ignored.
+
+    Returns
+    -------
+    numpy.ndarray
+        Structured array with dtype NODE_CONFIG_DTYPE and shape
+        (number of node configs, number of nodes). Unconfigured parameters
+        are NaN. Link parameters are not included.
+
+    Raises
+    ------
+    ValueError
+        If the node configs do not all have the same number of nodes
+    """
+    lines = []
+    for node_config in node_configs:
+        if isinstance(node_config, bytes):
+            node_config = node_config.decode('utf-8')
+        node_config = node_config.strip()
+        if node_config:
+            lines.append(node_config)
+    if not lines:
+        return np.empty((0, 0), dtype=NODE_CONFIG_DTYPE)
+
+    num_nodes = int(lines[0].split(',', 1)[0])
+    out = np.empty((len(lines), num_nodes), dtype=NODE_CONFIG_DTYPE)
+    for param in NODE_PARAMS:
+        out[param] = np.nan
+
+    if _parse_node_configs_same_layout(lines, out):
+        return out
+
+    # Layouts differ: parse one at a time
+    for param in NODE_PARAMS:
+        out[param] = np.nan
+    for i, line in enumerate(lines):
+        nodes = parse_node_config(line)
+        if len(nodes) != num_nodes:
+            raise ValueError("Node config {} has {} nodes; expected {}".format(
+                i, len(nodes), num_nodes))
+        for j, node in enumerate(nodes):
+            for field in NODE_CONFIG_DTYPE.names:
+                if field in node:
+                    out[field][i, j] = node[field]
+    return out
+
+
+def read_node_config_file(filename):
+    """ Parse a node config file (one node config per line) into a structured
+    array as returned by parse_node_configs(). """
+    with open(filename) as f:
+        return parse_node_configs(f)
+
+
+def node_config_array_to_nodes(row):
+    """ Convert one row of a structured node config array into the
+    list-of-dicts representation. """
+    nodes = []
+    for node in row:
+        node_dict = {
+            'nodeId': int(node['nodeId']),
+            'initialBiomass': float(node['initialBiomass']),
+            'perUnitBiomass': float(node['perUnitBiomass']),
+        }
+        for param in NODE_PARAMS:
+            if not np.isnan(node[param]):
+                node_dict[param] = float(node[param])
+        nodes.append(node_dict)
+    return nodes
+
+
+def node_config_array_to_strings(node_configs):
+    """
+    Convert a structured node config array (as returned by
+    parse_node_configs()) into node config strings.
+
+    This is the bulk counterpart of node_config_to_string(): each string is
+    the same as node_config_to_string(node_config_array_to_nodes(row)).
+    Since the array holds floats, perUnitBiomass is always written as a
+    float, so a node config given to node_config_to_string() with an integer
+    perUnitBiomass (e.g. '1') is written here with the same value as a float
+    ('1.0'). Link parameters are not included. Rows with the same nodes and
+    configured parameters as the first row are formatted with a single
+    precompiled format string.
+
+    Parameters
+    ----------
+    node_configs : numpy.ndarray
+        Structured array with dtype NODE_CONFIG_DTYPE and shape
+        (number of node configs, number of nodes)
+
+    Yields
+    ------
+    str
+        Node config string
+    """
+    if len(node_configs) == 0:
+        return
+
+    # Build a format string from the layout of the first row
+    first = node_configs[0]
+    configured = ~np.isnan(np.stack([first[param] for param in NODE_PARAMS], axis=1))
+    fmt = str(len(first))
+    columns = []
+    for i, node in enumerate(first):
+        fmt += ',[{}],{:.6},{},' + str(configured[i].sum()) + ','
+        columns.extend([('nodeId', i), ('initialBiomass', i), ('perUnitBiomass', i)])
+        for j, param in enumerate(NODE_PARAMS):
+            if configured[i, j]:
+                fmt += param + '={:.6},'
+                columns.append((param, i))
+        fmt += '0'
+    node_ids = node_configs['nodeId']
+    same_layout = (node_ids == first['nodeId']).all(axis=1)
+    for j, param in enumerate(NODE_PARAMS):
+        same_layout &= (~np.isnan(node_configs[param]) == configured[:, j]).all(axis=1)
+
+    value_columns = [
+        node_configs[field][:, i].astype(int if field == 'nodeId' else float).tolist()
+        for field, i in columns]
+    for k in range(len(node_configs)):
+        if same_layout[k]:
+            yield fmt.format(*[values[k] for values in value_columns])
+        else:
+            yield node_config_to_string(node_config_array_to_nodes(node_configs[k]))
+
+
 _generators = {}
 
+# Generators that can also produce node configs as chunks of structured
+# arrays (see parse_node_configs()), which are much faster to write out.
+# Key: generator name; value: function with the same arguments as the
+# generator in _generators plus `start` and `stop`, yielding structured arrays
+# of the node configs with indices (sim numbers) in range(start, stop)
+_array_generators = {}
+
+# Number of node configs drawn at a time by vectorised generators
+GENERATOR_CHUNK_SIZE = 10000
+
+
+def _map_biomass_files(function, input_dir, processes=1, **kwargs):
+    """ Apply a function to each HDF5 simulation file in a directory.
+
+    Parameters
+    ----------
+    function : function
+        Module-level function called as function(filename, **kwargs)
+    input_dir : str
+        Directory containing the HDF5 files
+    processes : int, optional
+        Number of worker processes to evaluate the function in. With the
+        default of 1, it is evaluated in the calling process. If None, the
+        number of CPUs is used.
+    kwargs
+        Additional arguments to pass to the function
+
+    Yields
+    ------
+    object
+        The return value of the function for each file, in order of sim number
+    """
+    filenames = sorted(glob.glob(os.path.join(input_dir, '*.h5')), key=util.get_sim_number)
+    function = functools.partial(function, **kwargs)
+    if processes == 1:
+        yield from map(function, filenames)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        chunksize = max(1, len(filenames) // (4 * (processes or os.cpu_count() or 1)))
+        yield from pool.imap(function, filenames, chunksize)
+
+
+def _filter_steady_state_with_survivors(filename):
+    simdata = SimulationData(filename)
+
+    # Keep only stopped simulations with survivors
+    if simdata.stop_event == 'NONE' or simdata.survivor_count == 0:
+        return None
+
+    nodes = parse_node_config(simdata.node_config)
+    for node in nodes:
+        final_biomass = simdata.final_biomass[node['nodeId']]
+        if final_biomass < EXTINCT:
+            final_biomass = 0.0
+        node['initialBiomass'] = final_biomass
+
+    return nodes
+
 
 def generate_filter_steady_state_with_survivors(
-        input_dir=None, input_set=None, input_batch=None):
+        input_dir=None, input_set=None, input_batch=None, processes=1):
     """
     Generate node configs that will result in steady states with surviving species,
     based on a previous batch of simulations.
@@ -122,6 +451,9 @@ def generate_filter_steady_state_with_survivors(
         Input directory. Supply either this, or both input_set and input_batch.
     input_set : int, optional
     input_batch : int, optional
+    processes : int, optional
+        Number of worker processes to read the input files in
+        (see _map_biomass_files())
 
     Yields
     ------
@@ -129,33 +461,47 @@ def generate_filter_steady_state_with_survivors(
         A list representation of node configs that will result in
         steady-state simulations including some surviving species.
         The initial biomass is set to the final biomass of the
-        corresponding input simulation.
+        corresponding input simulation. Node configs are in order of the
+        input sim number.
     """
 
     if input_dir is None:
         input_dir = os.path.join(util.find_batch_dir(input_set, input_batch), 'biomass-data')
 
-    for filename in glob.glob(os.path.join(input_dir, '*.h5')):
-        simdata = SimulationData(filename)
+    for nodes in _map_biomass_files(_filter_steady_state_with_survivors, input_dir, processes):
+        if nodes is not None:
+            yield nodes
 
-        # Keep only stopped simulations with survivors
-        if simdata.stop_event == 'NONE' or simdata.survivor_count == 0:
-            continue
 
-        nodes = parse_node_config(simdata.node_config)
-        for node in nodes:
-            final_biomass = simdata.final_biomass[node['nodeId']]
-            if final_biomass < EXTINCT:
-                final_biomass = 0.0
-            node['initialBiomass'] = final_biomass
+_generators['filter-steady-state-with-survivors'] = generate_filter_steady_state_with_survivors
 
-        yield nodes
 
+def _filter_sustaining(filename):
+    """ Return a list of (nodeset, node config) for the sustaining food webs
+    in the given simulation file. """
+    simdata = SimulationData(filename)
+    if simdata.stop_event not in (
+            'CONSTANT_BIOMASS_WITH_CONSUMERS', 'OSCILLATING_STEADY_STATE'):
+        # Not a sustaining simulation
+        return []
+    nodes = parse_node_config(simdata.node_config)
+    sustaining_nodes = {}  # node dicts indexed by node ID
+    for node in nodes:
+        # Set initial biomass to final biomass
+        final_biomass = simdata.final_biomass[node['nodeId']]
+        if final_biomass > EXTINCT:
+            node['initialBiomass'] = final_biomass
+            sustaining_nodes[node['nodeId']] = node
 
-_generators['filter-steady-state-with-survivors'] = generate_filter_steady_state_with_survivors
+    # Generate separate node configs for separate food webs
+    # that are not connected to each other
+    subweb = foodwebs.get_serengeti().subgraph(sustaining_nodes.keys())
+    nodesets = foodwebs.connected_components(subweb)
+    return [(nodeset, [sustaining_nodes[node_id] for node_id in sorted(nodeset)])
+            for nodeset in nodesets]
 
 
-def generate_filter_sustaining(input_dir):
+def generate_filter_sustaining(input_dir, processes=1):
     """ Generate node configs that will result in sustaining simulations.
 
     A "sustaining" simulation has a nonzero (possibly oscillating) steady state that
@@ -165,46 +511,27 @@ def generate_filter_sustaining(input_dir):
     ----------
     input_dir : str
         Directory containing HDF5 files to search for sustaining simulations
+    processes : int, optional
+        Number of worker processes to read the input files in
+        (see _map_biomass_files())
 
     Yields
     ------
     list
         A list representation of node configs that will result in sustaining
         simulations. The initial biomass is set to the final biomass of the
-        corresponding input simulation.
+        corresponding input simulation. Node configs are in order of the
+        input sim number.
     """
 
-    serengeti = foodwebs.get_serengeti()
-
     # key: frozenset of node IDs in a distinct food web
     # value: number of node configs produced
     output_nodeconfig_count_by_nodeset = Counter()
 
-    for filename in glob.glob(os.path.join(input_dir, '*.h5')):
-        simdata = SimulationData(filename)
-        if simdata.stop_event not in (
-                'CONSTANT_BIOMASS_WITH_CONSUMERS', 'OSCILLATING_STEADY_STATE'):
-            # Not a sustaining simulation
-            continue
-        nodes = parse_node_config(simdata.node_config)
-        sustaining_nodes = {}  # node dicts indexed by node ID
-        all_node_ids = []
-        for node in nodes:
-            all_node_ids.append(node['nodeId'])
-            # Set initial biomass to final biomass
-            final_biomass = simdata.final_biomass[node['nodeId']]
-            if final_biomass > EXTINCT:
-                node['initialBiomass'] = final_biomass
-                sustaining_nodes[node['nodeId']] = node
-
-        # Generate separate node configs for separate food webs
-        # that are not connected to each other
-        subweb = serengeti.subgraph(sustaining_nodes.keys())
-        nodesets = foodwebs.connected_components(subweb)
-        for nodeset in nodesets:
+    for results in _map_biomass_files(_filter_sustaining, input_dir, processes):
+        for nodeset, nodes in results:
             output_nodeconfig_count_by_nodeset[nodeset] += 1
-            yield [sustaining_nodes[node_id]
-                   for node_id in sorted(nodeset)]
+            yield nodes
 
     print("Generated {} node configs for {} distinct sustaining food webs:".format(
         sum(output_nodeconfig_count_by_nodeset.values()),
@@ -219,11 +546,56 @@ def generate_filter_sustaining(input_dir):
 _generators['filter-sustaining'] = generate_filter_sustaining
 
 
+def _filter_convergence(filename, min_species, min_peak_ratio, min_range_ratio,
+                        timesteps_to_analyze):
+    simdata = SimulationData(filename)
+
+    # Keep only sustaining simulations
+    if simdata.stop_event not in (
+            'CONSTANT_BIOMASS_WITH_CONSUMERS', 'OSCILLATING_STEADY_STATE'):
+        return None
+
+    # This is the window we're interested in
+    windowed_biomass = simdata.biomass[-timesteps_to_analyze:]
+
+    # Keep only sustaining nodes; set initial biomass and growth rate
+    nodes = parse_node_config(simdata.node_config)
+    sustaining_nodes = []
+    sustaining_node_ids = []
+    for node in nodes:
+        node_id = node['nodeId']
+        final_biomass = windowed_biomass.iloc[-1][node_id]
+        if final_biomass > EXTINCT:
+            node['initialBiomass'] = final_biomass
+            sustaining_nodes.append(node)
+            sustaining_node_ids.append(node_id)
+    windowed_biomass = windowed_biomass[sustaining_node_ids]
+
+    if len(sustaining_nodes) < min_species:
+        return None
+
+    # Keep only simulations meeting biomass criteria
+    peaks = windowed_biomass.max()
+    greatest_peak = peaks.max()
+    peak_ratios = peaks / greatest_peak
+    if not (peak_ratios >= min_peak_ratio).all():  # All nodes have min_peak_ratio
+        return None
+    ranges = peaks - windowed_biomass.min()
+    range_ratios = ranges / greatest_peak
+    if not (range_ratios >= min_range_ratio).any():  # At least one node has min_range_ratio
+        return None
+
+    # If we made it this far, there are sustaining nodes and they all meet
+    # the biomass criteria
+
+    return sustaining_nodes
+
+
 def generate_filter_convergence(
         input_dir=None, input_set=None, input_batch=None,
         min_species=0,
         min_peak_ratio=0.05, min_range_ratio=0.05,
-        timesteps_to_analyze=200):
+        timesteps_to_analyze=200, processes=1):
     """
     Generate node configs for Convergence game.
 
@@ -247,59 +619,156 @@ def generate_filter_convergence(
         to the overall maximum biomass
     timesteps_to_analyze : int, optional
         How much of the end of the simulation data to analyze
+    processes : int, optional
+        Number of worker processes to read the input files in
+        (see _map_biomass_files())
     """
 
     if input_dir is None:
         input_dir = os.path.join(util.find_batch_dir(input_set, input_batch), 'biomass-data')
 
-    for filename in glob.glob(os.path.join(input_dir, '*.h5')):
-        simdata = SimulationData(filename)
-
-        # Keep only sustaining simulations
-        if simdata.stop_event not in (
-                'CONSTANT_BIOMASS_WITH_CONSUMERS', 'OSCILLATING_STEADY_STATE'):
-            continue
-
-        # This is the window we're interested in
-        windowed_biomass = simdata.biomass[-timesteps_to_analyze:]
-
-        # Keep only sustaining nodes; set initial biomass and growth rate
-        nodes = parse_node_config(simdata.node_config)
-        sustaining_nodes = []
-        sustaining_node_ids = []
-        for node in nodes:
-            node_id = node['nodeId']
-            final_biomass = windowed_biomass.iloc[-1][node_id]
-            if final_biomass > EXTINCT:
-                node['initialBiomass'] = final_biomass
-                sustaining_nodes.append(node)
-                sustaining_node_ids.append(node_id)
-        windowed_biomass = windowed_biomass[sustaining_node_ids]
-
-        if len(sustaining_nodes) < min_species:
-            continue
-
-        # Keep only simulations meeting biomass criteria
-        peaks = windowed_biomass.max()
-        greatest_peak = peaks.max()
-        peak_ratios = peaks / greatest_peak
-        if not (peak_ratios >= min_peak_ratio).all():  # All nodes have min_peak_ratio
-            continue
-        ranges = peaks - windowed_biomass.min()
-        range_ratios = ranges / greatest_peak
-        if not (range_ratios >= min_range_ratio).any():  # At least one node has min_range_ratio
-            continue
-
-        # If we made it this far, there are sustaining nodes and they all meet
-        # the biomass criteria
-
-        yield sustaining_nodes
+    for nodes in _map_biomass_files(
+            _filter_convergence, input_dir, processes,
+            min_species=min_species, min_peak_ratio=min_peak_ratio,
+            min_range_ratio=min_range_ratio, timesteps_to_analyze=timesteps_to_analyze):
+        if nodes is not None:
+            yield nodes
 
 
 _generators['filter-convergence'] = generate_filter_convergence
 
 
-def generate_uniform(node_ids, param_ranges, count):
+def _normalize_param_ranges(param_ranges):
+    """ Return a copy of `param_ranges` with fixed (scalar) parameter values
+    converted into [value, value] ranges. Node-specific dicts are kept. """
+    normalized = {}
+    for k, v in param_ranges.items():
+        if not isinstance(v, list) and not isinstance(v, dict):
+            v = [v, v]
+        normalized[k] = v
+    return normalized
+
+
+def _uniform_node_config_template(node_ids, param_ranges, centered_x=False):
+    """ Precompute the per-column bounds for drawing uniform node configs.
+
+    Parameters
+    ----------
+    node_ids : list
+        Node IDs of nodes to include in the node configs
+    param_ranges : dict
+        Parameter ranges as for generate_uniform() (or, if `centered_x` is
+        True, as for generate_uniform_centered_on_default_x())
+    centered_x : bool, optional
+        Whether ranges for X are multipliers for the node's default X value
+
+    Returns
+    -------
+    template : numpy.ndarray
+        Structured array of shape (len(node_ids),) with dtype
+        NODE_CONFIG_DTYPE, with node IDs and perUnitBiomass filled in and
+        the varied parameters NaN
+    columns : list of (int, str)
+        (node index, parameter) of each varied value
+    lows, highs : numpy.ndarray
+        Lower and upper bounds for each column
+    """
+    wob_data = wobdata.get_wob_data()
+    param_ranges = _normalize_param_ranges(param_ranges)
+
+    template = np.empty(len(node_ids), dtype=NODE_CONFIG_DTYPE)
+    for param in NODE_PARAMS:
+        template[param] = np.nan
+    columns = []
+    bounds = []
+
+    for i, node_id in enumerate(node_ids):
+        species = wob_data.node_attributes(node_id)
+        template[i]['nodeId'] = node_id
+        template[i]['perUnitBiomass'] = species['biomass']
+
+        initial_biomass = param_ranges['initialBiomass']
+        if isinstance(initial_biomass, dict):
+            value = initial_biomass[str(node_id)]
+            initial_biomass = [value, value]
+        columns.append((i, 'initialBiomass'))
+        bounds.append(initial_biomass)
+
+        if species['organism_type'] == foodwebs.ORGANISM_TYPE_ANIMAL:
+            if centered_x:
+                default_x = species['metabolism']
+                x_bounds = [default_x * param_ranges['X'][0],
+                            min(1.0, default_x * param_ranges['X'][1])]
+            else:
+                x_bounds = param_ranges['X']
+            columns.append((i, 'X'))
+            bounds.append(x_bounds)
+        else:
+            columns.append((i, 'K'))
+            bounds.append(param_ranges['K'])
+            if 'R' in param_ranges:
+                columns.append((i, 'R'))
+                bounds.append(param_ranges['R'])
+
+    bounds = np.array(bounds, dtype=np.float64).reshape(len(columns), 2)
+    return template, columns, bounds[:, 0], bounds[:, 1]
+
+
+def _fill_node_configs(template, columns, values):
+    """ Make a structured node config array from a template (as returned by
+    _uniform_node_config_template()) and a (count x columns) array of values. """
+    node_configs = np.repeat(template[np.newaxis, :], len(values), axis=0)
+    for j, (i, param) in enumerate(columns):
+        node_configs[param][:, i] = values[:, j]
+    return node_configs
+
+
+def _sim_rng(seed, sim_number, stride):
+    """ Return a NumPy Generator positioned at the random values of the given
+    sim number.
+
+    The counter-based Philox bit generator, keyed on `seed`, produces 4
+    random values per counter increment, and each node config uses `stride`
+    increments, so the values for any sim number are found without
+    generating those for the sims before it.
+    """
+    return np.random.Generator(np.random.Philox(key=seed, counter=sim_number * stride))
+
+
+def _uniform_node_config_arrays(node_ids, param_ranges, count, seed=None, centered_x=False,
+                                start=0, stop=None):
+    """ Generate uniform node configs as structured arrays, in chunks.
+
+    The parameter values of each node config are determined by `seed` and
+    its sim number (index) alone (see _sim_rng()), so any range of node
+    configs can be generated independently of the others.
+
+    Yields
+    ------
+    numpy.ndarray
+        Structured array with dtype NODE_CONFIG_DTYPE and shape
+        (chunk size, len(node_ids))
+    """
+    template, columns, lows, highs = _uniform_node_config_template(
+        node_ids, param_ranges, centered_x)
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 63)
+    stride = -(-len(lows) // 4)
+    stop = count if stop is None else min(stop, count)
+    for chunk_start in range(start, stop, GENERATOR_CHUNK_SIZE):
+        n = min(GENERATOR_CHUNK_SIZE, stop - chunk_start)
+        rng = _sim_rng(seed, chunk_start, stride)
+        values = lows + rng.random((n, 4 * stride))[:, :len(lows)] * (highs - lows)
+        yield _fill_node_configs(template, columns, values)
+
+
+def _array_chunks_to_nodes(chunks):
+    for chunk in chunks:
+        for row in chunk:
+            yield node_config_array_to_nodes(row)
+
+
+def generate_uniform(node_ids, param_ranges, count, seed=None):
     """
     Generate `count` node configs for the given node ID's with parameter
     values independently drawn from uniform random distributions with the
@@ -315,42 +784,23 @@ def generate_uniform(node_ids, param_ranges, count):
         Value: [low, high] (or a single fixed value)
     count
         Number of node configs to generate
+    seed : int, optional
+        Random seed. The same seed always produces the same node configs.
 
     Yields
     -------
     str
         Node config string
     """
-
-    serengeti = foodwebs.get_serengeti()
-
-    # Handle fixed parameter values (convert single values into lists with the same value for low and high)
-    for k, v in param_ranges.items():
-        if not isinstance(v, list):
-            param_ranges[k] = [v, v]
-
-    for i in range(count):
-        nodes = []
-        for node_id in node_ids:
-            node = {
-                'nodeId': node_id,
-                'initialBiomass': random.uniform(*param_ranges['initialBiomass']),
-                'perUnitBiomass': serengeti.node[node_id]['biomass']
-            }
-            if serengeti.node[node_id]['organism_type'] == foodwebs.ORGANISM_TYPE_ANIMAL:
-                node['X'] = random.uniform(*param_ranges['X'])
-            else:
-                node['K'] = random.uniform(*param_ranges['K'])
-                if 'R' in param_ranges:
-                    node['R'] = random.uniform(*param_ranges['R'])
-            nodes.append(node)
-        yield nodes
+    return _array_chunks_to_nodes(
+        _uniform_node_config_arrays(node_ids, param_ranges, count, seed))
 
 
 _generators['uniform'] = generate_uniform
+_array_generators['uniform'] = _uniform_node_config_arrays
 
 
-def generate_uniform_centered_on_default_x(node_ids, param_ranges, count):
+def generate_uniform_centered_on_default_x(node_ids, param_ranges, count, seed=None):
     """
     Like generate_uniform(), but interpret ranges for the X parameter
     as multipliers for the node's default X value.
@@ -375,49 +825,175 @@ def generate_uniform_centered_on_default_x(node_ids, param_ranges, count):
               a dict for node-specific values: {node_id: value, ...}
     count : int
         Number of node configs to generate
+    seed : int, optional
+        Random seed. The same seed always produces the same node configs.
 
     Yields
     -------
     str
         Node config string
     """
+    return _array_chunks_to_nodes(
+        _uniform_centered_on_default_x_arrays(node_ids, param_ranges, count, seed))
 
-    serengeti = foodwebs.get_serengeti()
 
-    # Convert ranges to
-    
-    # Handle fixed parameter values
-    # (convert single values into lists with the same value for low and high)
-    for k, v in param_ranges.items():
-        if not isinstance(v, list) and not isinstance(v, dict):
-            param_ranges[k] = [v, v]
-
-    for i in range(count):
-        nodes = []
-        for node_id in node_ids:
-            if isinstance(param_ranges['initialBiomass'], dict):
-                initialBiomass = param_ranges['initialBiomass'][str(node_id)]
-            else:
-                initialBiomass = random.uniform(*param_ranges['initialBiomass'])
-            node = {
-                'nodeId': node_id,
-                'initialBiomass': initialBiomass,
-                'perUnitBiomass': serengeti.node[node_id]['biomass']
-            }
-            if serengeti.node[node_id]['organism_type'] == foodwebs.ORGANISM_TYPE_ANIMAL:
-                default_x = serengeti.node[node_id]['metabolism']
-                low_x = default_x * param_ranges['X'][0]
-                high_x = min(1.0, default_x * param_ranges['X'][1])
-                node['X'] = random.uniform(low_x, high_x)
-            else:
-                node['K'] = random.uniform(*param_ranges['K'])
-                if 'R' in param_ranges:
-                    node['R'] = random.uniform(*param_ranges['R'])
-            nodes.append(node)
-        yield nodes
+def _uniform_centered_on_default_x_arrays(node_ids, param_ranges, count, seed=None,
+                                          start=0, stop=None):
+    return _uniform_node_config_arrays(node_ids, param_ranges, count, seed, centered_x=True,
+                                       start=start, stop=stop)
 
 
 _generators['uniform-centered-on-default-x'] = generate_uniform_centered_on_default_x
+_array_generators['uniform-centered-on-default-x'] = _uniform_centered_on_default_x_arrays
+
+
+def _scaled_node_config_arrays(node_ids, param_ranges, unit_chunks, centered_x=False):
+    """ Make structured node config arrays from chunks of points in the unit
+    hypercube, one dimension per varied parameter value.
+
+    Parameters
+    ----------
+    node_ids, param_ranges, centered_x
+        As for _uniform_node_config_template()
+    unit_chunks : function
+        Called with the number of dimensions; returns an iterable of
+        (chunk size x dimensions) arrays of values in [0, 1)
+
+    Yields
+    ------
+    numpy.ndarray
+        Structured array with dtype NODE_CONFIG_DTYPE
+    """
+    template, columns, lows, highs = _uniform_node_config_template(
+        node_ids, param_ranges, centered_x)
+
+    # Fixed values don't use up a dimension
+    varied = np.flatnonzero(lows != highs)
+    for points in unit_chunks(len(varied)):
+        values = np.repeat(lows[np.newaxis, :], len(points), axis=0)
+        values[:, varied] += points * (highs[varied] - lows[varied])
+        yield _fill_node_configs(template, columns, values)
+
+
+def _latin_hypercube_arrays(node_ids, param_ranges, count, seed=None, scramble=True,
+                            skip=0, centered_x=False, start=0, stop=None):
+    stop = count if stop is None else min(stop, count)
+
+    def unit_chunks(dimensions):
+        # The whole design is needed to find any one point of it
+        # Each skip value gives an independent design
+        rng = np.random.default_rng(None if seed is None else [seed, skip])
+        strata = np.argsort(rng.random((count, dimensions)), axis=0)
+        if scramble:
+            offsets = rng.random((count, dimensions))
+        else:
+            offsets = np.full((count, dimensions), 0.5)
+        points = (strata + offsets) / count
+        for chunk_start in range(start, stop, GENERATOR_CHUNK_SIZE):
+            yield points[chunk_start:min(stop, chunk_start + GENERATOR_CHUNK_SIZE)]
+
+    return _scaled_node_config_arrays(node_ids, param_ranges, unit_chunks, centered_x)
+
+
+def generate_latin_hypercube(node_ids, param_ranges, count, seed=None, scramble=True,
+                             skip=0, centered_x=False):
+    """
+    Generate `count` node configs forming a Latin hypercube sample of the
+    parameter space: the range of each parameter value is divided into
+    `count` equal strata, and each stratum is sampled exactly once.
+
+    Parameters
+    ----------
+    node_ids : list
+        Node IDs of nodes to include in the generated node configs
+    param_ranges : dict
+        Parameter ranges as for generate_uniform(), or as for
+        generate_uniform_centered_on_default_x() if `centered_x` is True
+    count : int
+        Number of node configs to generate
+    seed : int, optional
+        Random seed
+    scramble : bool, optional
+        If True, sample at a random point within each stratum; otherwise,
+        sample at its center
+    skip : int, optional
+        Design number. Each value gives a separate Latin hypercube for the
+        same seed, so a set can be extended with more batches without
+        repeating points.
+    centered_x : bool, optional
+        Interpret ranges for X as multipliers for the default X value
+
+    Yields
+    -------
+    dict
+        Node config
+    """
+    return _array_chunks_to_nodes(_latin_hypercube_arrays(
+        node_ids, param_ranges, count, seed, scramble, skip, centered_x))
+
+
+_generators['latin-hypercube'] = generate_latin_hypercube
+_array_generators['latin-hypercube'] = _latin_hypercube_arrays
+
+
+def _sobol_arrays(node_ids, param_ranges, count, seed=None, scramble=True,
+                  skip=0, centered_x=False, start=0, stop=None):
+    from scipy.stats import qmc
+
+    stop = count if stop is None else min(stop, count)
+
+    def unit_chunks(dimensions):
+        sampler = qmc.Sobol(max(1, dimensions), scramble=scramble, seed=seed)
+        if skip + start > 0:
+            sampler.fast_forward(skip + start)
+        with warnings.catch_warnings():
+            # Sobol' points are best used in powers of 2, but any count works
+            warnings.simplefilter('ignore', UserWarning)
+            for chunk_start in range(start, stop, GENERATOR_CHUNK_SIZE):
+                n = min(GENERATOR_CHUNK_SIZE, stop - chunk_start)
+                yield sampler.random(n)[:, :dimensions]
+
+    return _scaled_node_config_arrays(node_ids, param_ranges, unit_chunks, centered_x)
+
+
+def generate_sobol(node_ids, param_ranges, count, seed=None, scramble=True,
+                   skip=0, centered_x=False):
+    """
+    Generate `count` node configs from a Sobol' low-discrepancy sequence
+    over the parameter space, which covers it more evenly than independent
+    uniform draws. Coverage is best when `count` (and `skip`) are powers of 2.
+
+    Parameters
+    ----------
+    node_ids : list
+        Node IDs of nodes to include in the generated node configs
+    param_ranges : dict
+        Parameter ranges as for generate_uniform(), or as for
+        generate_uniform_centered_on_default_x() if `centered_x` is True
+    count : int
+        Number of node configs to generate
+    seed : int, optional
+        Seed for the scrambling
+    scramble : bool, optional
+        Whether to apply Owen scrambling to the sequence
+    skip : int, optional
+        Number of points of the sequence to skip. To extend a set, generate
+        the next batch with the same seed and `skip` equal to the number of
+        node configs already generated.
+    centered_x : bool, optional
+        Interpret ranges for X as multipliers for the default X value
+
+    Yields
+    -------
+    dict
+        Node config
+    """
+    return _array_chunks_to_nodes(_sobol_arrays(
+        node_ids, param_ranges, count, seed, scramble, skip, centered_x))
+
+
+_generators['sobol'] = generate_sobol
+_array_generators['sobol'] = _sobol_arrays
 
 
 def generate_hint_bot(node_ids, initial_biomass, range_weights, default_ranges, count):
@@ -510,30 +1086,153 @@ def generate_hint_bot(node_ids, initial_biomass, range_weights, default_ranges,
 _generators['hint-bot'] = generate_hint_bot
 
 
-def generate_multi_region(regions, count):
+def _check_regions(regions):
+    """ Raise ValueError unless all regions bound the same parameters of the
+    same nodes, including initialBiomass of every node (which has no
+    default). """
+    if not regions:
+        raise ValueError("No regions given")
+    for node_id, param_bounds in regions[0]['bounds'].items():
+        if 'initialBiomass' not in param_bounds:
+            raise ValueError("Region 0 doesn't bound initialBiomass of node {}".format(node_id))
+    keys = [{node_id: sorted(param_bounds) for node_id, param_bounds in region['bounds'].items()}
+            for region in regions]
+    for i, region_keys in enumerate(keys[1:], 1):
+        if region_keys != keys[0]:
+            raise ValueError("Region {} bounds different parameters than region 0".format(i))
 
-    for i in range(count):
 
-        # Choose a region at random
-        # TODO: Use weight attribute
-        region = random.choice(regions)
-        bounds = region['bounds']
+def _varied_params(regions):
+    """ Return the (node ID, parameter) pairs with nonzero width in any region. """
+    return {(node_id, param)
+            for region in regions
+            for node_id, param_bounds in region['bounds'].items()
+            for param, (lower, upper) in param_bounds.items() if upper > lower}
 
-        # Draw parameter values from the region bounds
-        nodes = []
-        for node_id, param_bounds in sorted(bounds.items()):
-            node = {'nodeId': int(node_id)}
-            node['perUnitBiomass'] = 1  # Irrelevant at this point
-            for param, (lower, upper) in param_bounds.items():
-                node[param] = random.uniform(lower, upper)
-            nodes.append(node)
-        yield nodes
+
+def region_volume(region, varied=None):
+    """ Return the hyper-volume of a region of the multi-region generator.
+
+    This is the product of the widths of the region's bounds on the varied
+    parameters.
+
+    Parameters
+    ----------
+    region : dict
+        Region (see generate_multi_region())
+    varied : set of (str, str), optional
+        (node ID, parameter) pairs that are varied (default: those with
+        nonzero width in this region). A region with zero width in a varied
+        parameter has zero volume. Parameters fixed in all regions should be
+        left out, as multi_region_volume() does.
+    """
+    if varied is None:
+        varied = _varied_params([region])
+    volume = 1.0
+    for node_id, param in varied:
+        lower, upper = region['bounds'][node_id][param]
+        volume *= upper - lower
+    return volume
+
+
+def multi_region_volume(regions):
+    """ Return the effective volume sampled by the multi-region generator:
+    the total volume of the regions, which are assumed not to overlap, over
+    the parameters varied in any region.
+
+    Raises
+    ------
+    ValueError
+        If the regions don't all bound the same parameters
+    """
+    _check_regions(regions)
+    varied = _varied_params(regions)
+    return sum(region_volume(region, varied) for region in regions)
+
+
+def _multi_region_arrays(regions, count, seed=None, start=0, stop=None):
+    """ Generate multi-region node configs as structured arrays, in chunks.
+
+    Each node config uses one random value to choose a region and one per
+    parameter value, drawn as in _uniform_node_config_arrays(), so node
+    configs can be generated independently by sim number.
+    """
+    _check_regions(regions)
+    # Node IDs are strings in metaparameter files
+    region_bounds = [
+        {int(node_id): param_bounds for node_id, param_bounds in region['bounds'].items()}
+        for region in regions]
+    node_ids = sorted(region_bounds[0].keys())
+    columns = [(i, param) for i, node_id in enumerate(node_ids)
+               for param in sorted(region_bounds[0][node_id])]
+    lows = np.empty((len(regions), len(columns)))
+    highs = np.empty((len(regions), len(columns)))
+    for r, bounds in enumerate(region_bounds):
+        for j, (i, param) in enumerate(columns):
+            lows[r, j], highs[r, j] = bounds[node_ids[i]][param]
+
+    # Choose regions in proportion to weight x volume, so that the union of
+    # the regions is sampled evenly
+    varied = _varied_params(regions)
+    selection_weights = np.array([
+        region.get('weight', 1) * region_volume(region, varied) for region in regions],
+        dtype=np.float64)
+    if selection_weights.sum() == 0:
+        selection_weights = np.array([region.get('weight', 1) for region in regions], dtype=np.float64)
+    cumulative = np.cumsum(selection_weights / selection_weights.sum())
+
+    template = np.empty(len(node_ids), dtype=NODE_CONFIG_DTYPE)
+    for param in NODE_PARAMS:
+        template[param] = np.nan
+    template['nodeId'] = node_ids
+    template['perUnitBiomass'] = 1  # Irrelevant at this point
+
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 63)
+    stride = -(-(len(columns) + 1) // 4)
+    stop = count if stop is None else min(stop, count)
+    for chunk_start in range(start, stop, GENERATOR_CHUNK_SIZE):
+        n = min(GENERATOR_CHUNK_SIZE, stop - chunk_start)
+        draws = _sim_rng(seed, chunk_start, stride).random((n, 4 * stride))
+        region_indices = np.minimum(
+            np.searchsorted(cumulative, draws[:, 0], side='right'), len(regions) - 1)
+        chunk_lows = lows[region_indices]
+        values = chunk_lows + draws[:, 1:len(columns) + 1] * (highs[region_indices] - chunk_lows)
+        yield _fill_node_configs(template, columns, values)
+
+
+def generate_multi_region(regions, count, seed=None):
+    """
+    Generate node configs with parameter values drawn uniformly from a set of
+    regions (boxes) of the parameter space.
+
+    Parameters
+    ----------
+    regions : list of dict
+        Regions to sample, each with keys:
+            'bounds': {node_id: {param: [lower, upper], ...}, ...}
+            'weight': sampling density relative to other regions (default 1)
+        All regions must bound the same parameters of the same nodes.
+        Regions are chosen with probability proportional to weight times
+        volume (see multi_region_volume()).
+    count : int
+        Number of node configs to generate
+    seed : int, optional
+        Random seed (see generate_uniform())
+
+    Yields
+    -------
+    list
+        Node config
+    """
+    return _array_chunks_to_nodes(_multi_region_arrays(regions, count, seed))
 
 
 _generators['multi-region'] = generate_multi_region
+_array_generators['multi-region'] = _multi_region_arrays
 
 
-def generate_trophic_level_scaling(node_ids, param_ranges, factor, count):
+def generate_trophic_level_scaling(node_ids, param_ranges, factor, count, seed=None):
     """ Like generate_uniform, but reduce initialBiomass according to
     trophic level.
 
@@ -553,6 +1252,8 @@ def generate_trophic_level_scaling(node_ids, param_ranges, factor, count):
         trophic level
     count
         Number of node configs to generate
+    seed : int, optional
+        Random seed (see generate_uniform())
 
     Yields
     -------
@@ -561,17 +1262,10 @@ def generate_trophic_level_scaling(node_ids, param_ranges, factor, count):
     """
     subweb = foodwebs.get_serengeti().subgraph(node_ids)
 
-    max_chain_length = {node_id: 0 for node_id in node_ids}  # maximum food chain length by species
-    food_chains = foodwebs.get_food_chains(subweb)
-    food_chains.sort(key=lambda c: list(reversed(c)))
-    for chain in food_chains:
-        print(str(chain))
-
-    for chain in food_chains:
-        node_id = chain[-1]
-        max_chain_length[node_id] = max(max_chain_length[node_id], len(chain) - 1)  # subtract 1 to count edges
+    # Maximum food chain length (number of links) by species
+    max_chain_length = foodchains.longest_chain_lengths(subweb)
 
-    for node_config in generate_uniform(node_ids, param_ranges, count):
+    for node_config in generate_uniform(node_ids, param_ranges, count, seed):
         for node in node_config:
             node['initialBiomass'] *= factor ** (max_chain_length[node['nodeId']])
         yield node_config
@@ -579,6 +1273,286 @@ def generate_trophic_level_scaling(node_ids, param_ranges, factor, count):
 _generators['trophic-level-scaling'] = generate_trophic_level_scaling
 
 
+_summary_param_column_pattern = re.compile(r'^(initialBiomass|perUnitBiomass|K|R|X)(\d+)$')
+
+
+def _summary_node_config_template(summary):
+    """ Make a node config template from the parameter columns of a summary.
+
+    Returns
+    -------
+    template : numpy.ndarray
+        Structured array with dtype NODE_CONFIG_DTYPE, with node IDs filled in
+    columns : list of (int, str)
+        (node index, parameter) of each parameter column
+    column_names : list of str
+        Names of the corresponding summary columns
+    """
+    node_params = defaultdict(list)
+    for column in summary.columns:
+        match = _summary_param_column_pattern.match(column)
+        if match:
+            node_params[int(match.group(2))].append(match.group(1))
+    node_ids = sorted(node_params)
+    template = np.empty(len(node_ids), dtype=NODE_CONFIG_DTYPE)
+    for param in NODE_PARAMS:
+        template[param] = np.nan
+    template['nodeId'] = node_ids
+    columns = [(i, param) for i, node_id in enumerate(node_ids) for param in node_params[node_id]]
+    column_names = ['{}{}'.format(param, node_ids[i]) for i, param in columns]
+    return template, columns, column_names
+
+
+def _active_learning_arrays(tree_file, summary_file, count, seed=None, boundary_fraction=0.5,
+                            impurity_fraction=0.25, bandwidth=0.05, start=0, stop=None):
+    """ Generate active-learning node configs as structured arrays, in chunks.
+
+    Each node config uses a fixed number of random values (see _sim_rng()),
+    so node configs can be generated independently by sim number.
+    """
+    from scipy.special import ndtri
+
+    tree, feature_names = trees.load_tree(tree_file)
+    if feature_names is None:
+        feature_names = sorted(set(node.split_attribute for node in tree.get_internal_nodes()))
+    summary = summaryfiles.read_summary(summary_file)
+
+    template, columns, column_names = _summary_node_config_template(summary)
+    unmatched = [name for name in feature_names if name not in column_names]
+    if unmatched:
+        raise ValueError("Tree features {} are not node parameter columns of {}".format(
+            unmatched, summary_file))
+    base_values = summary[column_names].values
+    feature_columns = [column_names.index(name) for name in feature_names]
+
+    features = summary[feature_names].values
+    root_bounds = np.column_stack([features.min(axis=0), features.max(axis=0)])
+    widths = root_bounds[:, 1] - root_bounds[:, 0]
+    splits = trees.get_split_thresholds(tree, feature_names)
+    leaf_bounds, impurity = trees.get_leaf_regions(tree, feature_names, root_bounds)
+    leaf_widths = leaf_bounds[:, :, 1] - leaf_bounds[:, :, 0]
+    leaf_weights = impurity * np.prod(np.where(widths > 0, leaf_widths, 1), axis=1)
+    if not splits:
+        boundary_fraction = 0
+    if leaf_weights.sum() == 0:
+        impurity_fraction = 0
+    else:
+        cumulative_leaf_weights = np.cumsum(leaf_weights / leaf_weights.sum())
+
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 63)
+    # Random values of each node config: base simulation, mode, split, distance
+    # from the split threshold, leaf, and two per feature (whole space, leaf)
+    num_features = len(feature_names)
+    stride = -(-(5 + 2 * num_features) // 4)
+    stop = count if stop is None else min(stop, count)
+    for chunk_start in range(start, stop, GENERATOR_CHUNK_SIZE):
+        n = min(GENERATOR_CHUNK_SIZE, stop - chunk_start)
+        u = _sim_rng(seed, chunk_start, stride).random((n, 4 * stride))
+        values = base_values[np.minimum((u[:, 0] * len(base_values)).astype(int),
+                                        len(base_values) - 1)]
+        x = root_bounds[:, 0] + u[:, 5:5 + num_features] * widths
+
+        near_boundary = u[:, 1] < boundary_fraction
+        in_impure_leaf = ~near_boundary & (u[:, 1] < boundary_fraction + impurity_fraction)
+
+        if near_boundary.any():
+            chosen = np.minimum((u[near_boundary, 2] * len(splits)).astype(int), len(splits) - 1)
+            split_features = np.array([splits[c][0] for c in chosen])
+            thresholds = np.array([splits[c][1] for c in chosen])
+            x[near_boundary, split_features] = np.clip(
+                thresholds + ndtri(u[near_boundary, 3]) * bandwidth * widths[split_features],
+                root_bounds[split_features, 0], root_bounds[split_features, 1])
+
+        if in_impure_leaf.any():
+            leaves = np.minimum(np.searchsorted(cumulative_leaf_weights, u[in_impure_leaf, 4],
+                                                side='right'), len(leaf_bounds) - 1)
+            lows = leaf_bounds[leaves, :, 0]
+            x[in_impure_leaf] = (lows + u[in_impure_leaf, 5 + num_features:5 + 2 * num_features] *
+                                 leaf_widths[leaves])
+
+        values[:, feature_columns] = x
+        yield _fill_node_configs(template, columns, values)
+
+
+def generate_active_learning(tree_file, summary_file, count, seed=None,
+                             boundary_fraction=0.5, impurity_fraction=0.25, bandwidth=0.05):
+    """
+    Generate node configs concentrated where a decision tree fitted to a
+    previous batch is least certain, for training a better tree.
+
+    Each node config starts from the parameter values of a random simulation
+    in the previous summary. Its values for the tree's features are then
+    replaced in one of three ways:
+    - with probability `boundary_fraction`, drawn uniformly over the whole
+      space, except for the feature of a random split, which is drawn from a
+      normal distribution centered on the split threshold;
+    - with probability `impurity_fraction`, drawn uniformly within a leaf,
+      chosen with probability proportional to its impurity times its volume;
+    - otherwise, drawn uniformly over the whole space, so that regions the
+      tree is sure about are still covered.
+
+    The whole space is bounded by the range of each feature in the summary.
+    The tree's features must be node parameter columns of the summary, such
+    as 'K5' or 'X14'.
+
+    Parameters
+    ----------
+    tree_file : str
+        Decision tree file (see trees.load_tree()): a Weka J48 output file, or
+        a pickled sklearn tree as saved by searchprocess.do_iteration()
+    summary_file : str
+        Summary file of the simulations the tree was trained on
+    count : int
+        Number of node configs to generate
+    seed : int, optional
+        Random seed (see generate_uniform())
+    boundary_fraction : float, optional
+        Fraction of node configs drawn near split thresholds
+    impurity_fraction : float, optional
+        Fraction of node configs drawn within impure leaves
+    bandwidth : float, optional
+        Standard deviation of the distance from a split threshold, as a
+        fraction of the feature's range
+
+    Yields
+    -------
+    list
+        Node config
+
+    Raises
+    ------
+    ValueError
+        If a feature of the tree is not a node parameter column of the
+        summary
+    """
+    return _array_chunks_to_nodes(_active_learning_arrays(
+        tree_file, summary_file, count, seed, boundary_fraction, impurity_fraction, bandwidth))
+
+
+_generators['active-learning'] = generate_active_learning
+_array_generators['active-learning'] = _active_learning_arrays
+
+
+def _node_param_bounds(param_ranges, node_id, param):
+    """ Return the (low, high) bounds of a parameter of a node given
+    normalized parameter ranges (see _normalize_param_ranges()), which may
+    map node IDs (strings, as in metaparameter files) to a value or range.
+    Parameters without a range are unbounded. """
+    bounds = param_ranges.get(param)
+    if isinstance(bounds, dict):
+        bounds = bounds.get(str(node_id))
+    if bounds is None:
+        return -np.inf, np.inf
+    if not isinstance(bounds, (list, tuple)):
+        return bounds, bounds
+    return bounds[0], bounds[1]
+
+
+def _cross_entropy_arrays(summary_file, count, objective='extinction_count', minimize=True,
+                          elite_fraction=0.1, param_ranges=None, min_std_fraction=0.01,
+                          seed=None, start=0, stop=None):
+    from scipy.stats import truncnorm
+
+    if isinstance(summary_file, str):
+        summary_file = [summary_file]
+    summary = pd.concat([summaryfiles.read_summary(f) for f in summary_file], ignore_index=True)
+    summary = summary[summary[objective].notnull()]
+    template, columns, column_names = _summary_node_config_template(summary)
+    values = summary[column_names].values
+
+    # The elite simulations are those with the best objective values
+    elite_count = max(1, int(np.ceil(elite_fraction * len(summary))))
+    order = np.argsort(summary[objective].values, kind='mergesort')
+    if not minimize:
+        order = order[::-1]
+    elite = values[order[:elite_count]]
+
+    ranges = dict(valid_param_ranges)
+    if param_ranges is not None:
+        ranges.update(_normalize_param_ranges(param_ranges))
+    bounds = np.array([_node_param_bounds(ranges, template['nodeId'][i], param) for i, param in columns],
+                      dtype=np.float64).reshape(len(columns), 2)
+    # Parameters with a fixed value in param_ranges take that value
+    fixed = bounds[:, 0] == bounds[:, 1]
+    lows = np.where(fixed, bounds[:, 0], np.minimum(bounds[:, 0], values.min(axis=0)))
+    highs = np.where(fixed, bounds[:, 1], np.maximum(bounds[:, 1], values.max(axis=0)))
+
+    # Parameters that did not vary in the summary (such as perUnitBiomass)
+    # keep their value
+    varied = (values.min(axis=0) < values.max(axis=0)) & ~fixed
+    means = elite.mean(axis=0)
+    means[fixed] = lows[fixed]
+    stds = elite.std(axis=0)
+    finite_widths = np.where(np.isfinite(highs - lows), highs - lows, values.ptp(axis=0))
+    stds = np.maximum(stds, min_std_fraction * finite_widths)
+    stds[~varied] = 1  # Unused
+    a = (lows - means) / stds
+    b = (highs - means) / stds
+
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 63)
+    stride = -(-len(columns) // 4)
+    stop = count if stop is None else min(stop, count)
+    for chunk_start in range(start, stop, GENERATOR_CHUNK_SIZE):
+        n = min(GENERATOR_CHUNK_SIZE, stop - chunk_start)
+        u = _sim_rng(seed, chunk_start, stride).random((n, 4 * stride))[:, :len(columns)]
+        chunk_values = np.tile(means, (n, 1))
+        chunk_values[:, varied] = truncnorm.ppf(
+            u[:, varied], a[varied], b[varied], loc=means[varied], scale=stds[varied])
+        yield _fill_node_configs(template, columns, chunk_values)
+
+
+def generate_cross_entropy(summary_file, count, objective='extinction_count', minimize=True,
+                           elite_fraction=0.1, param_ranges=None, min_std_fraction=0.01,
+                           seed=None):
+    """
+    Generate node configs from a distribution fitted to the best simulations
+    of a previous batch (the cross-entropy method).
+
+    The simulations of the previous batch are ranked by an objective column
+    of its summary, and a normal distribution, truncated to the valid range,
+    is fitted to each node parameter of the elite (best) simulations. New
+    node configs are drawn from these distributions. Creating each set from
+    the summary of the last batch of the previous one iteratively narrows
+    the search to good parameter regions.
+
+    Parameters
+    ----------
+    summary_file : str or list of str
+        Summary file(s) of the previous batch(es)
+    count : int
+        Number of node configs to generate
+    objective : str, optional
+        Summary column to optimize
+    minimize : bool, optional
+        Whether lower objective values are better
+    elite_fraction : float, optional
+        Fraction of simulations to fit the distributions to
+    param_ranges : dict, optional
+        Ranges to truncate the distribution of each parameter to, by parameter
+        name, as for generate_uniform(): [low, high], a fixed value, or a
+        dict of either by node ID (default: valid_param_ranges)
+    min_std_fraction : float, optional
+        Lower limit of the standard deviation, as a fraction of the range,
+        which keeps the distributions from collapsing
+    seed : int, optional
+        Random seed (see generate_uniform())
+
+    Yields
+    -------
+    list
+        Node config
+    """
+    return _array_chunks_to_nodes(_cross_entropy_arrays(
+        summary_file, count, objective, minimize, elite_fraction, param_ranges,
+        min_std_fraction, seed))
+
+
+_generators['cross-entropy'] = generate_cross_entropy
+_array_generators['cross-entropy'] = _cross_entropy_arrays
+
+
 def generate_parallel_sweep(node_ids, param_ranges, count):
     """
     Generate `count` node configs for the given node ID's with parameter
@@ -632,7 +1606,44 @@ def generate_parallel_sweep(node_ids, param_ranges, count):
 _generators['parallel_sweep'] = generate_parallel_sweep
 
 
-def generate_node_configs_from_metaparameter_file(metaparameter_filename, food_web_filename=None):
+def batch_seed(seed, batch_num):
+    """ Derive the random seed for a batch of a set from the set's seed.
+
+    Batch 0 uses the set's seed itself.
+    """
+    if batch_num == 0:
+        return seed
+    return int(np.random.SeedSequence([seed, batch_num]).generate_state(1, np.uint64)[0]) >> 1
+
+
+def _batch_kwargs(generator_name, kwargs, batch_num):
+    """ Adjust generator arguments so that each batch of a set gets different
+    node configs. """
+    kwargs = dict(kwargs)
+    if generator_name == 'sobol':
+        # Continue the same sequence
+        kwargs['skip'] = kwargs.get('skip', 0) + batch_num * kwargs['count']
+    elif kwargs.get('seed') is not None:
+        kwargs['seed'] = batch_seed(kwargs['seed'], batch_num)
+    return kwargs
+
+
+def _unseeded(generator_name, kwargs):
+    """ Return whether a generator draws random values without a seed, so
+    that each call generates different node configs. """
+    if generator_name == 'hint-bot':
+        # Draws from the random module, and can't be seeded
+        return True
+    if 'seed' not in inspect.signature(_generators[generator_name]).parameters:
+        return False
+    if kwargs.get('seed') is not None:
+        return False
+    # Unscrambled Sobol' sequences are deterministic
+    return not (generator_name == 'sobol' and not kwargs.get('scramble', True))
+
+
+def generate_node_configs_from_metaparameter_file(metaparameter_filename, food_web_filename=None,
+                                                  start=0, stop=None, batch_num=0):
     """
     Generate node config strings based on the given metaparameter JSON file.
 
@@ -643,11 +1654,29 @@ def generate_node_configs_from_metaparameter_file(metaparameter_filename, food_w
     food_web_filename : str, optional
         If supplied, the node IDs are taken from this file instead of the
         metaparameter file.
+    start : int, optional
+        Index (sim number) of the first node config to generate
+    stop : int, optional
+        Index after the last node config to generate (default: all).
+        Generators with an array version (see _array_generators) generate
+        only the requested node configs, so a large set can be generated
+        in independent shards; others generate and discard the node configs
+        before `start`.
+    batch_num : int, optional
+        Batch number. Seeded generators produce different node configs for
+        each batch of a set (see batch_seed()).
 
     Returns
     -------
     generator
         A generator that yields node config strings
+
+    Raises
+    ------
+    ValueError
+        If only some of the node configs are asked for (`start` or `stop`
+        given) but the generator is random and unseeded, so they would not
+        be those of the set
     """
 
     global _generators
@@ -662,6 +1691,9 @@ def generate_node_configs_from_metaparameter_file(metaparameter_filename, food_w
     kwargs = metaparameters.get('args')
     if not isinstance(kwargs, dict):
         return None
+    if (start or stop is not None) and _unseeded(generator_name, kwargs):
+        raise ValueError("Can't regenerate part of the node configs of {}: generator '{}' has no seed".format(
+            metaparameter_filename, generator_name))
 
     if food_web_filename is not None:
         with open(food_web_filename) as f:
@@ -675,4 +1707,59 @@ def generate_node_configs_from_metaparameter_file(metaparameter_filename, food_w
                     int,
                     food_web_data['nodeAttributes'].keys()))
 
-    return (node_config_to_string(nc) for nc in generator_function(**kwargs))
+    if batch_num:
+        kwargs = _batch_kwargs(generator_name, kwargs, batch_num)
+
+    if generator_name in _array_generators:
+        return (node_config
+                for chunk in _array_generators[generator_name](start=start, stop=stop, **kwargs)
+                for node_config in node_config_array_to_strings(chunk))
+
+    return (node_config_to_string(nc)
+            for nc in itertools.islice(generator_function(**kwargs), start, stop))
+
+
+def generate_node_config(metaparameter_filename, sim_number, food_web_filename=None, batch_num=0):
+    """
+    Regenerate the node config of a single simulation from the metaparameter
+    file of its set.
+
+    With a seed, the node configs of a set need not be stored to be
+    reproducible. How long regeneration takes depends on the generator:
+    'uniform', 'uniform-centered-on-default-x', 'multi-region',
+    'active-learning' and 'cross-entropy' draw each node config
+    independently, in time independent of the sim number (besides reading
+    any input files); 'sobol' fast-forwards the sequence to the sim number;
+    'latin-hypercube' builds the whole design, in time proportional to the
+    count; other generators generate and discard the node configs before
+    the sim number.
+
+    Parameters
+    ----------
+    metaparameter_filename : str
+        Path to JSON metaparameter file
+    sim_number : int
+        Index of the node config among those generated from the file
+    food_web_filename : str, optional
+        As for generate_node_configs_from_metaparameter_file()
+    batch_num : int, optional
+        Batch number of the simulation
+
+    Returns
+    -------
+    str
+        Node config string, or None if the metaparameter file is invalid or
+        generates fewer node configs
+
+    Raises
+    ------
+    ValueError
+        If the generator is random and unseeded (e.g. "seed": null), so the
+        node config can't be regenerated
+    """
+    generator = generate_node_configs_from_metaparameter_file(
+        metaparameter_filename, food_web_filename, start=sim_number, stop=sim_number + 1,
+        batch_num=batch_num)
+    if generator is None:
+        return None
+    return next(generator, None)
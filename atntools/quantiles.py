@@ -0,0 +1,95 @@
+"""
+Mergeable approximate quantile sketch
+
+Used to compute quantiles over data that is read in chunks and is too large
+to hold in memory (e.g. summaries of many batches).
+"""
+
+import numpy as np
+
+# Number of values held at each level of the sketch
+DEFAULT_CAPACITY = 2048
+
+
+class QuantileSketch(object):
+    """ Approximate quantile sketch in the style of Karnin, Lang and Liberty
+    (KLL).
+
+    Values are held in levels; a value at level i stands for 2**i original
+    values. When a level exceeds its capacity, it is sorted and every other
+    value (starting at a random offset) is promoted to the next level. Two
+    sketches can be merged by concatenating their levels and compacting,
+    so sketches of separate chunks or files can be combined.
+
+    Until more than `capacity` values have been added, the sketch holds all
+    of them and quantiles are exact.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        Number of values held at each level. The rank error is roughly
+        1 / capacity.
+    seed : int, optional
+        Seed for the random compaction offsets
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self._levels = [np.empty(0)]
+        self._rng = np.random.RandomState(seed)
+
+    def update(self, values):
+        """ Add values (array-like) to the sketch, ignoring NaNs. """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compact()
+
+    def merge(self, other):
+        """ Merge another sketch into this one. """
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for i, level in enumerate(other._levels):
+            self._levels[i] = np.concatenate([self._levels[i], level])
+        self.count += other.count
+        self._compact()
+
+    def _compact(self):
+        i = 0
+        while i < len(self._levels):
+            level = self._levels[i]
+            if len(level) > self.capacity:
+                level = np.sort(level)
+                if len(level) % 2 == 1:
+                    # Keep one value at this level so an even number is compacted
+                    keep, level = level[-1:], level[:-1]
+                else:
+                    keep = np.empty(0)
+                promoted = level[self._rng.randint(2)::2]
+                if i + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                self._levels[i] = keep
+                self._levels[i + 1] = np.concatenate([self._levels[i + 1], promoted])
+            i += 1
+
+    def quantile(self, q):
+        """ Return the approximate q-th quantile (0 <= q <= 1), or NaN if the
+        sketch is empty.
+
+        For exact sketches, the result matches pandas.Series.quantile()
+        (linear interpolation).
+        """
+        if self.count == 0:
+            return np.nan
+        if len(self._levels) == 1:
+            return np.percentile(self._levels[0], 100 * q)
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([
+            np.full(len(level), 2.0 ** i) for i, level in enumerate(self._levels)])
+        order = np.argsort(values, kind='mergesort')
+        values = values[order]
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return values[min(index, len(values) - 1)]
@@ -0,0 +1,158 @@
+"""
+Scoring simulations against a target simulation, as in the Convergence game
+
+The score of an attempt in Convergence is the sum over species of the root
+mean squared error between the attempt's biomass and the target's biomass
+(see summarize.rmse()). The functions here compute that score for a whole
+batch of candidate simulations at once, reading the candidates in chunks
+and computing the errors for each chunk with array operations.
+"""
+
+import os.path
+import glob
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from .simulationdata import SimulationData, read_biomass_array
+from .summarize import get_sim_number
+from . import util
+
+# Maximum number of biomass values (candidates x timesteps x species) to hold
+# in memory at a time
+MAX_CHUNK_ELEMENTS = 2 ** 25
+
+
+def aligned_biomass(filename, node_ids, timesteps):
+    """ Read the biomass of a simulation aligned to the given node IDs and
+    number of timesteps.
+
+    Species in `node_ids` that are not in the simulation have zero biomass,
+    and species in the simulation that are not in `node_ids` are ignored.
+    Simulations that stopped before `timesteps` (at a steady state) are
+    extended with their final biomass.
+
+    Parameters
+    ----------
+    filename : str
+        HDF5 file of the simulation
+    node_ids : sequence of int
+        Node IDs, in the order of the output columns
+    timesteps : int
+        Number of timesteps (rows) of output
+
+    Returns
+    -------
+    numpy.ndarray
+        Biomass array of shape (timesteps, len(node_ids))
+    """
+    out = np.zeros((timesteps, len(node_ids)))
+    sim_node_ids, chunk = read_biomass_array(filename, timesteps)
+    if chunk is None or len(chunk) == 0:
+        return out
+    column_by_node_id = {node_id: i for i, node_id in enumerate(sim_node_ids)}
+    out_columns = []
+    in_columns = []
+    for i, node_id in enumerate(node_ids):
+        if node_id in column_by_node_id:
+            out_columns.append(i)
+            in_columns.append(column_by_node_id[node_id])
+    out[:len(chunk), out_columns] = chunk[:, in_columns]
+    out[len(chunk):, out_columns] = chunk[-1, in_columns]
+    return out
+
+
+def _score_chunk(target, candidates):
+    """ Return per-species RMSE of each candidate, shape (candidates, species) """
+    return np.sqrt(((candidates - target) ** 2).mean(axis=1))
+
+
+def score_batch(target, biomass_files, timesteps=None, top_k=None, chunk_size=None):
+    """ Score many candidate simulations against a target simulation.
+
+    Parameters
+    ----------
+    target : SimulationData or str
+        Target simulation, or the name of its HDF5 file
+    biomass_files : iterable of str
+        HDF5 files of the candidate simulations
+    timesteps : int, optional
+        Number of timesteps to compare, starting from the first (default:
+        all timesteps of the target)
+    top_k : int, optional
+        If given, return only the `top_k` best (lowest-scoring) candidates.
+        Only these are kept in memory, so any number of candidates can be
+        streamed.
+    chunk_size : int, optional
+        Number of candidates to score at a time (default: as many as fit in
+        MAX_CHUNK_ELEMENTS)
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by sim number and sorted by score, with a 'score' column and
+        an 'rmse_<node_id>' column for each species in the target
+    """
+    if not isinstance(target, SimulationData):
+        target = SimulationData(target)
+    node_ids = list(target.node_ids)
+    if timesteps is None:
+        timesteps = target.num_biomass_timesteps
+    target_biomass = aligned_biomass(target.filename, node_ids, timesteps)
+    if chunk_size is None:
+        chunk_size = max(1, MAX_CHUNK_ELEMENTS // (timesteps * len(node_ids)))
+
+    # Heap of (-score, sim_number, rmse) holding the best top_k candidates,
+    # or list of all candidates if top_k is None
+    best = []
+    filenames = sorted(biomass_files, key=get_sim_number)
+
+    for chunk_start in range(0, len(filenames), chunk_size):
+        chunk_filenames = filenames[chunk_start:chunk_start + chunk_size]
+        candidates = np.empty((len(chunk_filenames), timesteps, len(node_ids)))
+        for i, filename in enumerate(chunk_filenames):
+            candidates[i] = aligned_biomass(filename, node_ids, timesteps)
+        rmse = _score_chunk(target_biomass, candidates)
+        scores = rmse.sum(axis=1)
+        for filename, score, species_rmse in zip(chunk_filenames, scores, rmse):
+            item = (-score, get_sim_number(filename), species_rmse)
+            if top_k is None:
+                best.append(item)
+            elif len(best) < top_k:
+                heapq.heappush(best, item)
+            elif item[0] > best[0][0]:
+                heapq.heapreplace(best, item)
+
+    df = pd.DataFrame(
+        [species_rmse for _, _, species_rmse in best],
+        index=pd.Index([sim_number for _, sim_number, _ in best], name='sim_number'),
+        columns=['rmse_{}'.format(node_id) for node_id in node_ids])
+    df.insert(0, 'score', [-neg_score for neg_score, _, _ in best])
+    return df.sort_values('score', kind='mergesort')
+
+
+def score_batch_dir(target, set_identifier, batch_num, **kwargs):
+    """ Score all simulations of a batch against a target simulation.
+
+    Parameters
+    ----------
+    target : SimulationData or str
+        Target simulation, or the name of its HDF5 file
+    set_identifier : int or str
+        Set number or set directory
+    batch_num : int
+        Batch number
+    kwargs
+        Additional arguments to pass to score_batch()
+
+    Returns
+    -------
+    pandas.DataFrame
+        As returned by score_batch()
+    """
+    batch_dir = util.find_batch_dir(set_identifier, batch_num)
+    if batch_dir is None:
+        raise RuntimeError("Batch {} of set {} not found".format(batch_num, set_identifier))
+    biomass_files = glob.glob(os.path.join(batch_dir, 'biomass-data', '*.h5'))
+    return score_batch(target, biomass_files, **kwargs)
@@ -1,8 +1,8 @@
 import os
-import glob
 import re
 import json
 import csv
+import pickle
 from collections import OrderedDict
 
 import numpy as np
@@ -13,11 +13,18 @@ from sklearn.tree._tree import TREE_LEAF
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.metrics import confusion_matrix, f1_score
 
-from . import settings, util, simulation, summarize
+from . import settings, util, catalog, simulation, summarize, summaryfiles, nodeconfigs, trees
 
 TIMESTEPS = 100000
 MIN_WEIGHT_FRACTION_LEAF = 0.01  # 1% of samples
 
+# Pre-screening: node configs predicted "bad" with at least this probability
+# by the previous iteration's classifier are skipped...
+PRESCREEN_CONFIDENCE = 0.9
+# ...except for this fraction of them, which are simulated anyway so that the
+# classifier can still learn from its mistakes
+PRESCREEN_EXPLORATION_FRACTION = 0.1
+
 
 def start_sequence(food_web, metaparameter_template):
     """ Create and initialize a new sequence directory for the given food web.
@@ -47,7 +54,32 @@ def start_sequence(food_web, metaparameter_template):
     print("Started sequence in {}".format(sequence_dir))
 
 
-def do_iteration(sequence_num, no_record_biomass=True):
+def do_iteration(sequence_num, no_record_biomass=True, prescreen=False,
+                 prescreen_confidence=PRESCREEN_CONFIDENCE,
+                 exploration_fraction=PRESCREEN_EXPLORATION_FRACTION):
+    """ Run a search iteration: simulate a training and a test batch of the
+    sequence's current set, fit a decision tree to them, and create the next
+    set from the tree's "good" leaves.
+
+    Parameters
+    ----------
+    sequence_num : int
+        Search sequence number
+    no_record_biomass : bool, optional
+        Whether to skip storing biomass data
+    prescreen : bool, optional
+        If True, score the generated node configs of the training batch with
+        the classifier of the previous iteration (if any) and skip
+        simulating those predicted "bad" with high confidence (see
+        prescreen_node_configs()). The explored node configs are weighted to
+        stand for the skipped ones in labelling and fitting. The test batch
+        is never pre-screened, so that the test scores are unbiased.
+    prescreen_confidence : float, optional
+        Minimum predicted probability of "bad" for a node config to be skipped
+    exploration_fraction : float, optional
+        Fraction of the node configs eligible to be skipped that are
+        simulated anyway
+    """
 
     sequence_dir = get_sequence_dir(sequence_num)
     state_filename = os.path.join(sequence_dir, 'sequence-state.json')
@@ -63,13 +95,32 @@ def do_iteration(sequence_num, no_record_biomass=True):
     log.write("Starting iteration {}\n".format(iteration_num))
     log.write("Set {}\n".format(set_num))
 
+    node_config_filter = None
+    prescreen_weights = []  # Sample weights of the kept node configs, set by the filter
+    previous_classifier_file = get_classifier_filename(sequence_dir, iteration_num - 1)
+    if prescreen and os.path.isfile(previous_classifier_file):
+        previous_clf, previous_X_cols = load_classifier(previous_classifier_file)
+
+        def node_config_filter(node_configs):
+            kept, keep, weights = prescreen_node_configs(
+                node_configs, previous_clf, previous_X_cols,
+                prescreen_confidence, exploration_fraction)
+            prescreen_weights[:] = weights
+            skipped = len(node_configs) - len(kept)
+            log.write("Pre-screening skipped {} of {} node configs ({:.1%})\n".format(
+                skipped, len(node_configs), skipped / max(1, len(node_configs))))
+            return keep
+
     # Simulate and summarize the initial batch
     print("Simulating training batch")
     training_batch = simulation.simulate_batch(
-        set_num, TIMESTEPS, no_record_biomass=no_record_biomass)
-    summarize.generate_summary_file_for_batch(set_num, training_batch)
+        set_num, TIMESTEPS, node_config_filter=node_config_filter,
+        no_record_biomass=no_record_biomass)
+    summarize.generate_summary_file_for_batch(set_num, training_batch, columnar=True)
     log.write("Simulated training batch {}\n".format(training_batch))
     training_df = get_batch_summary(set_dir, training_batch)
+    if node_config_filter is not None:
+        training_df['sample_weight'] = np.asarray(prescreen_weights)[training_df['sim_number'].values]
     training_df, extinction_count_threshold = label_dataset(training_df)
     log.write("Extinction count frequencies:\n")
     log.write(str(training_df['extinction_count'].value_counts(normalize=True).sort_index()))
@@ -99,20 +150,23 @@ def do_iteration(sequence_num, no_record_biomass=True):
     # Prepare y_train
     y_train = training_df['class_label']
 
+    # Weights of the training samples (all 1 unless pre-screened)
+    w_train = training_df['sample_weight'] if 'sample_weight' in training_df else None
+
     # Fit the decision tree
     clf = DecisionTreeClassifier(
         min_samples_leaf=0.01,
         class_weight='balanced',
     )
-    clf = clf.fit(X_train, y_train)
+    clf = clf.fit(X_train, y_train, sample_weight=w_train)
 
     # Evaluate it on the training data
     y_predict = clf.predict(X_train)
     log.write("Training confusion matrix:\n")
-    log.write(str(confusion_matrix(y_train, y_predict)))
+    log.write(str(confusion_matrix(y_train, y_predict, sample_weight=w_train)))
     log.write("\n")
 
-    f1_train = f1_score(y_train, y_predict, average=None)
+    f1_train = f1_score(y_train, y_predict, average=None, sample_weight=w_train)
     log.write("Training f1-scores: {}\n".format(f1_train))
 
     #########
@@ -120,7 +174,7 @@ def do_iteration(sequence_num, no_record_biomass=True):
     print("Simulating test batch")
     test_batch = simulation.simulate_batch(
         set_num, TIMESTEPS, no_record_biomass=no_record_biomass)
-    summarize.generate_summary_file_for_batch(set_num, test_batch)
+    summarize.generate_summary_file_for_batch(set_num, test_batch, columnar=True)
     log.write("Simulated test batch {}\n".format(test_batch))
     test_df = get_batch_summary(set_dir, test_batch)
     test_df, _ = label_dataset(test_df, extinction_count_threshold)
@@ -148,11 +202,17 @@ def do_iteration(sequence_num, no_record_biomass=True):
 
     # Fold test data into training data and re-train the tree
     log.write("Combining train and test data\n")
+    if w_train is not None:
+        test_df['sample_weight'] = 1.0
     combined_df = training_df.append(test_df)
     X_combined = combined_df[X_cols]
     y_combined = combined_df['class_label']
+    w_combined = combined_df['sample_weight'] if w_train is not None else None
     log.write("Extinction count frequencies:\n")
-    extinction_freq = combined_df['extinction_count'].value_counts(normalize=True).sort_index()
+    if w_combined is not None:
+        extinction_freq = w_combined.groupby(combined_df['extinction_count']).sum() / w_combined.sum()
+    else:
+        extinction_freq = combined_df['extinction_count'].value_counts(normalize=True).sort_index()
     log.write(str(extinction_freq))
     log.write("\n")
     log.write("Class counts:\n")
@@ -178,7 +238,8 @@ def do_iteration(sequence_num, no_record_biomass=True):
     extinction_freq_df.to_csv(
         os.path.join(sequence_dir, 'extinctions-iteration-{}.csv'.format(iteration_num)))
 
-    clf = clf.fit(X_combined, y_combined)
+    clf = clf.fit(X_combined, y_combined, sample_weight=w_combined)
+    save_classifier(clf, X_cols, get_classifier_filename(sequence_dir, iteration_num))
 
     # Update sequence summary file
     iteration_data = OrderedDict([
@@ -231,6 +292,13 @@ def do_iteration(sequence_num, no_record_biomass=True):
     next_metaparameters = make_multi_region_metaparameters(
         X_cols, good_leaf_bounds, current_metaparameters['args']['count'])
 
+    regions = next_metaparameters['args']['regions']
+    log.write("Merged {} good leaves into {} regions\n".format(len(good_leaf_bounds), len(regions)))
+    sampled_volume = nodeconfigs.multi_region_volume(regions)
+    root_widths = root_bounds[:, 1] - root_bounds[:, 0]
+    log.write("Effective sampled volume: {} ({:.2%} of root bounds)\n".format(
+        sampled_volume, sampled_volume / np.prod(root_widths[root_widths > 0])))
+
     # Create the next set!
     next_set_num, _ = util.create_set_dir(food_web_id, next_metaparameters)
     log.write("Created next set {}\n".format(next_set_num))
@@ -246,22 +314,15 @@ def do_iteration(sequence_num, no_record_biomass=True):
 
 
 def create_sequence_dir():
-    sequence_num = get_max_sequence_number() + 1
-    sequence_dir = get_sequence_dir(sequence_num)
-    os.makedirs(sequence_dir)
+    with catalog.connect() as conn, catalog.transaction(conn):
+        sequence_num, sequence_dir = catalog.make_numbered_dir(
+            catalog.get_max_sequence_number('search', conn) + 1, get_sequence_dir, makedirs=True)
+        catalog.add_sequence(conn, 'search', sequence_num, sequence_dir)
     return sequence_num, sequence_dir
 
 
 def get_max_sequence_number():
-    max_sequence_number = -1
-    for sequence_dir in glob.iglob(os.path.join(settings.DATA_HOME, 'sequences/sequence-*')):
-        match = re.match(r'.+?/sequence-(\d+)', sequence_dir)
-        if match is None:
-            continue
-        sequence_num = int(match.group(1))
-        if sequence_num > max_sequence_number:
-            max_sequence_number = sequence_num
-    return max_sequence_number
+    return catalog.get_max_sequence_number('search')
 
 
 def get_sequence_dir(sequence_number):
@@ -269,14 +330,22 @@ def get_sequence_dir(sequence_number):
 
 
 def get_batch_summary(set_dir, batch_num):
-    summary_file = os.path.join(util.find_batch_dir(set_dir, batch_num), 'summary.csv')
-    return pd.read_csv(summary_file)
+    return summaryfiles.read_batch_summary(util.find_batch_dir(set_dir, batch_num))
+
+
+def weighted_median(values, weights):
+    """ Return the lower weighted median of `values`: the smallest value with
+    at least half of the total weight at or below it. """
+    order = np.argsort(values, kind='mergesort')
+    cumulative = np.cumsum(np.asarray(weights, dtype=np.float64)[order])
+    return np.asarray(values)[order][np.searchsorted(cumulative, cumulative[-1] / 2)]
 
 
 def label_dataset(df, extinction_count_threshold=None):
     """
     - filters out non-steady-state simulations
-    - calculates threshold as median extinction count
+    - calculates threshold as median extinction count (weighted by the
+      'sample_weight' column, if any)
     - assigns class labels based on threshold
     """
     df = df[
@@ -284,13 +353,91 @@ def label_dataset(df, extinction_count_threshold=None):
         (df['stop_event'] != 'UNKNOWN_EVENT')].copy()
     
     if extinction_count_threshold is None:
-        extinction_count_threshold = df['extinction_count'].median()
+        if 'sample_weight' in df:
+            extinction_count_threshold = weighted_median(
+                df['extinction_count'].values, df['sample_weight'].values)
+        else:
+            extinction_count_threshold = df['extinction_count'].median()
     
     df['class_label'] = df['extinction_count'].map(lambda x: 1 if x < extinction_count_threshold else 0)
     
     return df, extinction_count_threshold
 
 
+def get_classifier_filename(sequence_dir, iteration_num):
+    return os.path.join(sequence_dir, 'classifier-iteration-{}.pkl'.format(iteration_num))
+
+
+def save_classifier(classifier, feature_names, filename):
+    """ Save a fitted classifier and the names of its features """
+    with open(filename, 'wb') as f:
+        pickle.dump({'classifier': classifier, 'feature_names': list(feature_names)}, f)
+
+
+def load_classifier(filename):
+    """ Load a classifier saved by save_classifier().
+
+    Returns
+    -------
+    classifier, feature_names
+    """
+    return trees.load_tree(filename)
+
+
+def prescreen_node_configs(node_configs, classifier, feature_names,
+                           confidence=PRESCREEN_CONFIDENCE,
+                           exploration_fraction=PRESCREEN_EXPLORATION_FRACTION,
+                           seed=None):
+    """
+    Select the node configs worth simulating according to a classifier
+    trained on previous simulations.
+
+    Node configs predicted to be "bad" (class 0) with probability at least
+    `confidence` are dropped, except for a random `exploration_fraction` of
+    them. Each of those explored node configs stands for 1 /
+    `exploration_fraction` of them, which is its sample weight.
+
+    Parameters
+    ----------
+    node_configs : list of str
+        Node config strings (all with the same nodes)
+    classifier : sklearn classifier
+        Fitted classifier with predict_proba() and classes 0 (bad), 1 (good)
+    feature_names : list of str
+        Names of the classifier's features, such as 'X14' (see
+        parse_feature_name())
+    confidence : float, optional
+    exploration_fraction : float, optional
+    seed : int, optional
+        Seed for choosing the explored node configs
+
+    Returns
+    -------
+    kept : list of str
+        The node configs to simulate, in their original order
+    keep : numpy.ndarray
+        Boolean array: whether each node config was kept
+    weights : numpy.ndarray
+        Sample weight of each kept node config
+    """
+    if len(node_configs) == 0:
+        return [], np.zeros(0, dtype=bool), np.zeros(0)
+
+    configs = nodeconfigs.parse_node_configs(node_configs)
+    node_index = {node_id: i for i, node_id in enumerate(configs['nodeId'][0])}
+    X = np.empty((len(configs), len(feature_names)))
+    for feature_id, feature_name in enumerate(feature_names):
+        node_id, param = parse_feature_name(feature_name)
+        X[:, feature_id] = configs[param][:, node_index[node_id]]
+
+    bad_column = list(classifier.classes_).index(0)
+    confident_bad = classifier.predict_proba(X)[:, bad_column] >= confidence
+    explore = np.random.default_rng(seed).random(len(configs)) < exploration_fraction
+    keep = ~confident_bad | explore
+    weights = np.where(confident_bad, 1 / exploration_fraction if exploration_fraction else 0, 1.0)
+    return [nc for nc, k in zip(node_configs, keep) if k], keep, weights[keep]
+
+
 def save_tree_image(classifier, feature_names, outfile):
     dot_data = tree.export_graphviz(
         classifier, out_file=None,
@@ -433,11 +580,66 @@ def features_to_node_param_pairs(feature_names):
     return pairs
 
 
-def make_region_list(feature_names, leaf_bounds):
+def _merge_boxes(a, b):
+    """ Return the union of two boxes (arrays of [lower, upper] per feature)
+    if it is itself a box, i.e. they differ only in one feature, along which
+    they are adjacent; otherwise return None. """
+    differing = np.flatnonzero((a != b).any(axis=1))
+    if len(differing) != 1:
+        return None
+    k = differing[0]
+    if a[k, 1] != b[k, 0] and b[k, 1] != a[k, 0]:
+        return None
+    merged = a.copy()
+    merged[k, 0] = min(a[k, 0], b[k, 0])
+    merged[k, 1] = max(a[k, 1], b[k, 1])
+    return merged
+
+
+def merge_adjacent_boxes(boxes):
+    """
+    Merge adjacent boxes (such as the bounds of decision tree leaves) that
+    together form a larger box, until no more can be merged.
+
+    Parameters
+    ----------
+    boxes : numpy.ndarray
+        Array of shape (number of boxes, number of features, 2) containing
+        the lower and upper bound of each feature for each box
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of the same form with the merged boxes
+    """
+    boxes = [np.array(box) for box in boxes]
+    merged_any = True
+    while merged_any:
+        merged_any = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                merged = _merge_boxes(boxes[i], boxes[j])
+                if merged is not None:
+                    boxes[i] = merged
+                    del boxes[j]
+                    merged_any = True
+                    break
+            if merged_any:
+                break
+    return np.array(boxes)
+
+
+def make_region_list(feature_names, leaf_bounds, merge=True):
+    """ Make a list of regions for the multi-region generator from the bounds
+    of decision tree leaves, merging adjacent leaves into single regions
+    unless `merge` is False. """
     regions = []
     
     node_param_pairs = features_to_node_param_pairs(feature_names)
     node_ids = [p[0] for p in node_param_pairs]
+
+    if merge:
+        leaf_bounds = merge_adjacent_boxes(leaf_bounds)
     
     for bounds in leaf_bounds:
         region = {
@@ -458,6 +660,7 @@ def make_multi_region_metaparameters(feature_names, leaf_bounds, count):
         'generator': 'multi-region',
         'args': {
             'count': count,
-            'regions': make_region_list(feature_names, leaf_bounds)
+            'regions': make_region_list(feature_names, leaf_bounds),
+            'seed': None
         }
     }
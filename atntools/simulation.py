@@ -6,7 +6,14 @@ import os
 import subprocess
 import re
 
-from atntools import settings, util, nodeconfigs
+import numpy as np
+
+from atntools import settings, util, nodeconfigs, nodeconfigfiles
+
+# Written to the batch directory when a node config filter is used: the
+# generated sim number (see nodeconfigs.generate_node_config()) of each
+# simulated node config, one per line
+GENERATED_SIM_NUMBERS_FILE = 'generated-sim-numbers.txt'
 
 
 def atn_engine_batch_runner(
@@ -70,7 +77,7 @@ def atn_batch_simulator(
             print("\rRunning simulation " + match.group(1), end='', flush=True)
 
 
-def simulate_batch(set_num, timesteps, **kwargs):
+def simulate_batch(set_num, timesteps, node_config_filter=None, **kwargs):
     """ Run a batch of simulations for the given set.
 
     Parameters
@@ -79,6 +86,12 @@ def simulate_batch(set_num, timesteps, **kwargs):
         The set number
     timesteps : int
         Maximum number of timesteps to run the simulations
+    node_config_filter : function, optional
+        Called with the list of generated node config strings; returns a
+        boolean array saying which of them to simulate (e.g. to skip node
+        configs predicted to be uninteresting). The generated sim numbers of
+        the simulated node configs are recorded (see
+        get_generated_sim_numbers()).
     kwargs
         Additional arguments to pass to atn_batch_simulator()
 
@@ -96,12 +109,37 @@ def simulate_batch(set_num, timesteps, **kwargs):
     # Generate node config file
     metaparameter_file = os.path.join(set_dir, 'metaparameters.json')
     node_config_file = os.path.join(batch_dir, 'node-configs.txt')
-    with open(node_config_file, 'w') as f:
-        for node_config in nodeconfigs.generate_node_configs_from_metaparameter_file(metaparameter_file):
-            print(node_config, file=f)
+    node_configs = nodeconfigs.generate_node_configs_from_metaparameter_file(
+        metaparameter_file, batch_num=batch_num)
+    if node_config_filter is not None:
+        node_configs = list(node_configs)
+        generated_sim_numbers = np.flatnonzero(node_config_filter(node_configs))
+        node_configs = [node_configs[i] for i in generated_sim_numbers]
+        np.savetxt(os.path.join(batch_dir, GENERATED_SIM_NUMBERS_FILE), generated_sim_numbers, fmt='%d')
+    nodeconfigfiles.write_node_config_file(node_config_file, node_configs)
 
     output_dir = os.path.join(batch_dir, 'biomass-data')
     os.mkdir(output_dir)
     atn_batch_simulator(timesteps, node_config_file, output_dir, **kwargs)
 
     return batch_num
+
+
+def get_generated_sim_numbers(batch_dir):
+    """ Return the generated sim number of each simulation of a batch.
+
+    Simulation i of the batch ran node config i of its node-configs.txt. If
+    the node configs were filtered (see simulate_batch()), that is generated
+    node config get_generated_sim_numbers(batch_dir)[i] of the set's
+    metaparameters, otherwise generated node config i.
+
+    Returns
+    -------
+    numpy.ndarray or None
+        The generated sim numbers, or None if the node configs were not
+        filtered
+    """
+    filename = os.path.join(batch_dir, GENERATED_SIM_NUMBERS_FILE)
+    if not os.path.isfile(filename):
+        return None
+    return np.loadtxt(filename, dtype=np.int64, ndmin=1)
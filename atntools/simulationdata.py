@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import h5py
 from cached_property import cached_property
@@ -9,6 +10,88 @@ EXTINCT = 1e-12
 
 BIOMASS_SCALE = 1000
 
+# Default number of timesteps to read at a time when streaming biomass data
+BIOMASS_CHUNK_SIZE = 10000
+
+
+def read_biomass_array(filename, stop=None):
+    """ Read node IDs and (scaled) biomass from an HDF5 file without the
+    overhead of constructing a SimulationData object.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the HDF5 file
+    stop : int, optional
+        Number of timesteps to read from the start (default: all)
+
+    Returns
+    -------
+    node_ids : numpy.ndarray, biomass : numpy.ndarray or None
+        The node IDs and the biomass array with one column per node ID, or
+        None if the file has no biomass data
+    """
+    with h5py.File(filename, 'r') as f:
+        node_ids = f['node_ids'][:]
+        if 'biomass' not in f:
+            return node_ids, None
+        biomass = f['biomass'][:stop, :]
+        if 'node_config' not in f.attrs:
+            # Format version 2
+            biomass *= BIOMASS_SCALE
+    return node_ids, biomass
+
+
+def derive_output_attributes(chunks, num_nodes):
+    """ Derive extinction timesteps, final biomass, the number of timesteps
+    and the last timestep with nonzero biomass from biomass data.
+
+    This is for data files that do not record these outputs (format version 1).
+    The biomass data is processed a chunk at a time with array operations.
+
+    Parameters
+    ----------
+    chunks : iterable
+        (timestep, chunk) pairs as yielded by SimulationData.iter_biomass_chunks()
+    num_nodes : int
+        Number of nodes (columns of each chunk)
+
+    Returns
+    -------
+    dict
+        extinction_timesteps : numpy.ndarray
+            First timestep at which each node's biomass is below EXTINCT, or -1
+        final_biomass : numpy.ndarray
+            Biomass of each node at the final timestep (NaN if no timesteps)
+        timesteps_simulated : int
+            Number of timesteps of biomass data
+        last_nonzero_timestep : int
+            Last timestep at which any node has nonzero biomass, or -1
+    """
+    extinction_timesteps = np.full(num_nodes, -1, dtype=np.int64)
+    final_biomass = np.full(num_nodes, np.nan)
+    timesteps = 0
+    last_nonzero_timestep = -1
+
+    for timestep, chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        below = chunk < EXTINCT
+        newly_extinct = (extinction_timesteps == -1) & below.any(axis=0)
+        extinction_timesteps[newly_extinct] = timestep + below[:, newly_extinct].argmax(axis=0)
+        nonzero_rows = np.flatnonzero((chunk != 0).any(axis=1))
+        if len(nonzero_rows) > 0:
+            last_nonzero_timestep = timestep + nonzero_rows[-1]
+        final_biomass = chunk[-1]
+        timesteps = timestep + len(chunk)
+
+    return {
+        'extinction_timesteps': extinction_timesteps,
+        'final_biomass': final_biomass,
+        'timesteps_simulated': timesteps,
+        'last_nonzero_timestep': last_nonzero_timestep,
+    }
+
 
 class SimulationData(object):
     """ ATN simulation data from an HDF5 file produced by WoB Server.
@@ -33,6 +116,21 @@ class SimulationData(object):
             CONSTANT_BIOMASS_PRODUCERS_ONLY
             CONSTANT_BIOMASS_WITH_CONSUMERS
             OSCILLATING_STEADY_STATE
+    extinction_timesteps : pandas.Series
+        Timestep at which each species went extinct (-1 if it survived),
+        indexed by node ID
+    extinction_count, survivor_count : int
+        Number of species that went extinct / survived
+    final_biomass : pandas.Series
+        Biomass of each species at the end of the simulation, indexed by node ID
+    timesteps_simulated : int
+        Number of timesteps simulated
+    last_nonzero_timestep : int
+        Last timestep at which any species has nonzero biomass (-1 if none)
+
+    Format version 1 files do not record the extinction timesteps, final
+    biomass or timesteps simulated. For these, the attributes are derived from
+    the biomass data when first accessed.
     """
 
     def __init__(self, filename):
@@ -64,6 +162,39 @@ class SimulationData(object):
                     f['final_biomass'][:], index=self.node_ids) * BIOMASS_SCALE
                 self.timesteps_simulated = f['timesteps_simulated'][()]
 
+    @cached_property
+    def _derived_output_attributes(self):
+        return derive_output_attributes(self.iter_biomass_chunks(), len(self.node_ids))
+
+    # For format version 2, the following are read in __init__(), which
+    # shadows these properties
+
+    @cached_property
+    def extinction_timesteps(self):
+        return pd.Series(self._derived_output_attributes['extinction_timesteps'],
+                         index=self.node_ids)
+
+    @cached_property
+    def extinction_count(self):
+        return (self.extinction_timesteps > -1).sum()
+
+    @cached_property
+    def survivor_count(self):
+        return (self.extinction_timesteps == -1).sum()
+
+    @cached_property
+    def final_biomass(self):
+        return pd.Series(self._derived_output_attributes['final_biomass'],
+                         index=self.node_ids)
+
+    @cached_property
+    def timesteps_simulated(self):
+        return self._derived_output_attributes['timesteps_simulated']
+
+    @cached_property
+    def last_nonzero_timestep(self):
+        return self._derived_output_attributes['last_nonzero_timestep']
+
     # Read biomass data once when first accessed, since it is large and
     # expensive to read
     @cached_property
@@ -79,3 +210,42 @@ class SimulationData(object):
                     _biomass *= BIOMASS_SCALE
 
         return _biomass
+
+    def iter_biomass_chunks(self, chunk_size=BIOMASS_CHUNK_SIZE, start=0):
+        """ Read the biomass array a chunk of timesteps at a time.
+
+        Unlike the `biomass` attribute, this never holds more than
+        `chunk_size` timesteps in memory.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Maximum number of timesteps per chunk
+        start : int, optional
+            First timestep to read. Negative values count from the end.
+
+        Yields
+        ------
+        timestep : int, chunk : numpy.ndarray
+            The first timestep of the chunk, and the (scaled) biomass for
+            timesteps [timestep, timestep + len(chunk)), with one column per
+            node ID in the order of `node_ids`
+        """
+        with h5py.File(self.filename, 'r') as f:
+            if 'biomass' not in f:
+                return
+            dataset = f['biomass']
+            num_timesteps = dataset.shape[0]
+            if start < 0:
+                start = max(0, num_timesteps + start)
+            for timestep in range(start, num_timesteps, chunk_size):
+                chunk = dataset[timestep:timestep + chunk_size, :]
+                if self.format_version == 2:
+                    chunk = chunk * BIOMASS_SCALE
+                yield timestep, chunk
+
+    @cached_property
+    def num_biomass_timesteps(self):
+        """ Number of timesteps of biomass data recorded in the file """
+        with h5py.File(self.filename, 'r') as f:
+            return f['biomass'].shape[0] if 'biomass' in f else 0
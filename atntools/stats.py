@@ -1,32 +1,93 @@
 #!/usr/bin/env python3
 
+""" Prints the count, mean, standard deviation and median of the features of
+each class ('classification' column) of the given feature files.
+
+The files are streamed in chunks (see summaryfiles.iter_summary_chunks()), so
+they may be larger than memory. With --combined, one table is printed for all
+of the files together instead of one per file.
+"""
+
 import sys
 
 import pandas as pd
 import numpy as np
 
+from atntools import summaryfiles
+from atntools.quantiles import QuantileSketch
+
 pd.set_option('display.max_columns', 999)
 pd.set_option('display.max_rows', 999)
 
-for filename in sys.argv[1:]:
+CLASSES = ['good', 'bad']
+
+
+def class_statistics(filenames, chunk_size=summaryfiles.READ_CHUNK_SIZE):
+    """ Return the statistics of the features of each class over one or more
+    feature files, streaming them in chunks.
+
+    Means and standard deviations are exact (merged per chunk); medians are
+    estimated with quantile sketches (exact up to the sketch capacity).
 
+    Returns
+    -------
+    pandas.DataFrame
+        One row per statistic ('len', 'mean', 'std', 'median') and feature,
+        one column per class
+    """
+    counts = {}
+    means = {}
+    squares = {}  # sums of squared deviations from the mean
+    sketches = {}
+    for chunk in summaryfiles.iter_summary_chunks(filenames, chunk_size=chunk_size):
+        values = [s for s in list(chunk.columns)
+                  if not s == 'classification'
+                  and not s.startswith('perUnitBiomass')
+                  and not s.startswith('extinction')]
+        for cls in CLASSES:
+            rows = chunk.loc[chunk['classification'] == cls, values].astype(np.float64)
+            if len(rows) == 0:
+                continue
+            n = len(rows)
+            mean = rows.mean()
+            square = ((rows - mean) ** 2).sum()
+            if cls in counts:
+                # Combine with the earlier chunks (Chan et al.)
+                total = counts[cls] + n
+                delta = mean - means[cls]
+                squares[cls] = squares[cls] + square + delta ** 2 * counts[cls] * n / total
+                means[cls] = means[cls] + delta * n / total
+                counts[cls] = total
+            else:
+                counts[cls], means[cls], squares[cls] = n, mean, square
+            for col in values:
+                sketches.setdefault((cls, col), QuantileSketch(seed=0)).update(rows[col].values)
+
+    table = {}
+    for cls in counts:
+        stats = {}
+        for col in means[cls].index:
+            stats[('len', col)] = counts[cls]
+            stats[('mean', col)] = means[cls][col]
+            stats[('std', col)] = (np.sqrt(squares[cls][col] / (counts[cls] - 1))
+                                   if counts[cls] > 1 else np.nan)
+            stats[('median', col)] = sketches[(cls, col)].quantile(0.5)
+        table[cls] = pd.Series(stats)
+    return pd.DataFrame(table, columns=[cls for cls in CLASSES if cls in table])
+
+
+def print_statistics(title, filenames):
     print("===================================================================")
-    print(filename)
+    print(title)
     print("-------------------------------------------------------------------")
-
-    df = pd.read_csv(filename)
-    values = [s for s in list(df.columns)
-            if not s == 'classification'
-            and not s.startswith('perUnitBiomass')
-            and not s.startswith('extinction')]
-
-    df['classification'] = df['classification'].astype("category")
-    df['classification'].cat.set_categories(['good', 'bad'], inplace=True)
-
-    table = pd.pivot_table(df, index=['classification'], values=values[:1],
-            aggfunc=[len])
-    print(table.T)
-    table = pd.pivot_table(df, index=['classification'], values=values,
-            aggfunc=[np.mean, np.std, np.median])
-    print(table.T)
+    print(class_statistics(filenames))
     print()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args and args[0] == '--combined':
+        print_statistics(', '.join(args[1:]), args[1:])
+    else:
+        for filename in args:
+            print_statistics(filename, filename)
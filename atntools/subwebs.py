@@ -0,0 +1,471 @@
+"""
+Food web sampling over bitsets
+
+The sub-web samplers represent a food web as integer bitsets: each node is
+given an index, and a set of nodes is an int with the corresponding bits set.
+The prey and predators of each node are precomputed as bitsets, so growing a
+sub-web, tracking its frontier (predators of its members that are not yet
+members) and checking its connectivity take a few bit operations per node
+rather than networkx graph traversals.
+
+Self-loops (cannibalism) are left out of the bitsets: a cannibal is not its
+own predator, and a node whose only prey is itself is a source node (as in
+foodwebs.get_source_nodes()).
+
+Besides random sampling (PredatorCompleteSampler), the connected sub-webs of
+a given size can be enumerated exhaustively (enumerate_subweb_bits()), which
+is feasible for small sizes.
+"""
+
+import os
+import random
+import shutil
+import multiprocessing
+
+
+def iter_bits(bits):
+    """ Yield the indices of the set bits of an int, from lowest to highest. """
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit.bit_length() - 1
+        bits ^= low_bit
+
+
+def count_bits(bits):
+    return bin(bits).count('1')
+
+
+def _random_bit(bits, rng):
+    """ Return the index of a uniformly chosen set bit of a nonzero int. """
+    k = rng.randrange(count_bits(bits))
+    for i, index in enumerate(iter_bits(bits)):
+        if i == k:
+            return index
+
+
+class BitsetFoodWeb(object):
+    """ A food web with its adjacency stored as bitsets.
+
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        Food web, with edges from prey to predator
+    full_graph : networkx.DiGraph, optional
+        Food web that `graph` was taken from (default: `graph`). Source nodes
+        are those without prey in the full food web, so a node whose prey
+        were all left out of `graph` (e.g. an animal eating only Decaying
+        Material) is not taken for a source.
+
+    Attributes
+    ----------
+    node_ids : list
+        Node ID of each index, in sorted order
+    index : dict
+        Index of each node ID
+    predators, prey : list of int
+        Bitset of the predators and prey of each node, excluding itself
+    neighbors : list of int
+        Bitset of the predators and prey of each node
+    sources : int
+        Bitset of the source nodes
+    plant_eaters : int
+        Bitset of the nodes that have a source node as prey
+    """
+
+    def __init__(self, graph, full_graph=None):
+        self.node_ids = sorted(graph.nodes())
+        self.index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        n = len(self.node_ids)
+        self.predators = [0] * n
+        self.prey = [0] * n
+        for u, v in graph.edges():
+            if u != v:
+                i = self.index[u]
+                j = self.index[v]
+                self.predators[i] |= 1 << j
+                self.prey[j] |= 1 << i
+        self.neighbors = [self.predators[i] | self.prey[i] for i in range(n)]
+        if full_graph is None:
+            full_graph = graph
+        self.sources = 0
+        self.plant_eaters = 0
+        for i, node_id in enumerate(self.node_ids):
+            if not set(full_graph.predecessors(node_id)) - {node_id}:
+                self.sources |= 1 << i
+                self.plant_eaters |= self.predators[i]
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def to_bits(self, node_ids):
+        """ Return the bitset of the given node IDs. """
+        bits = 0
+        for node_id in node_ids:
+            bits |= 1 << self.index[node_id]
+        return bits
+
+    def to_node_ids(self, bits):
+        """ Return the sorted list of node IDs of a bitset. """
+        return [self.node_ids[i] for i in iter_bits(bits)]
+
+    def is_connected(self, bits):
+        """ Return whether the nodes of a bitset form a weakly connected
+        sub-web. """
+        if bits == 0:
+            return True
+        reached = bits & -bits
+        frontier = reached
+        while frontier:
+            expanded = 0
+            for i in iter_bits(frontier):
+                expanded |= self.neighbors[i]
+            frontier = expanded & bits & ~reached
+            reached |= frontier
+        return reached == bits
+
+
+class PredatorCompleteSampler(object):
+    """ Randomly grow sub-webs in which plant eaters have predators.
+
+    A sub-web is started from `seed_size` nodes chosen from `seed_nodes`, and
+    grown one node at a time. While any plant eater in the sub-web has
+    predators in the full food web but none in the sub-web (a "lonely plant
+    eater"), the next node is one of those predators, chosen uniformly from
+    the predators of all lonely plant eaters (counted once per plant eater
+    they eat). Otherwise, the next node is chosen uniformly from the frontier:
+    the predators of sub-web members that are not yet members.
+
+    An attempt fails if the frontier runs out before the sub-web reaches the
+    requested size, or if the sub-web is not connected. Plant eaters are not
+    guaranteed to have predators, because some have none in the full food web
+    (e.g. African Elephant, Hippopotamus) and the size may be too small to
+    include them all.
+
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        Food web to sample from
+    seed_nodes : list, optional
+        Node IDs from which to choose starting nodes (default: all nodes)
+    rng : random.Random, optional
+        Random number generator (default: the `random` module)
+
+    Attributes
+    ----------
+    attempts, failures : int
+        Number of sub-webs attempted and failed by this sampler
+    """
+
+    def __init__(self, graph, seed_nodes=None, rng=None):
+        self.web = BitsetFoodWeb(graph)
+        if seed_nodes is None:
+            seed_nodes = self.web.node_ids
+        self.seed_indices = [self.web.index[node_id] for node_id in seed_nodes]
+        self.rng = random if rng is None else rng
+        self.attempts = 0
+        self.failures = 0
+
+        # Plant eaters that can become lonely, and their predator counts
+        web = self.web
+        self._lonely_candidates = 0
+        self._predator_counts = [count_bits(p) for p in web.predators]
+        for i in iter_bits(web.plant_eaters):
+            if web.predators[i]:
+                self._lonely_candidates |= 1 << i
+
+    def _choose_lonely_predator(self, lonely):
+        """ Choose a predator of the lonely plant eaters, with each plant
+        eater weighted by its number of predators. """
+        web = self.web
+        indices = list(iter_bits(lonely))
+        weights = [self._predator_counts[i] for i in indices]
+        r = self.rng.randrange(sum(weights))
+        for i, weight in zip(indices, weights):
+            if r < weight:
+                return _random_bit(web.predators[i], self.rng)
+            r -= weight
+
+    def sample_bits(self, size, seed_size=1):
+        """ Make one attempt at a sub-web.
+
+        Returns
+        -------
+        int or None
+            Bitset of the sub-web nodes, or None if the attempt failed
+        """
+        web = self.web
+        self.attempts += 1
+        members = 0
+        frontier = 0
+        lonely = 0
+
+        def add(i):
+            nonlocal members, frontier, lonely
+            bit = 1 << i
+            members |= bit
+            frontier = (frontier | web.predators[i]) & ~members
+            # Plant eaters eaten by i are no longer lonely
+            lonely &= ~web.prey[i]
+            if bit & self._lonely_candidates and not web.predators[i] & members:
+                lonely |= bit
+
+        for i in self.rng.sample(self.seed_indices, seed_size):
+            add(i)
+
+        for _ in range(size - seed_size):
+            if lonely:
+                add(self._choose_lonely_predator(lonely))
+            elif frontier:
+                add(_random_bit(frontier, self.rng))
+            else:
+                self.failures += 1
+                return None
+
+        if not web.is_connected(members):
+            self.failures += 1
+            return None
+        return members
+
+    def sample(self, size, seed_size=1, max_attempts=1):
+        """ Attempt up to `max_attempts` times to generate a sub-web.
+
+        Returns
+        -------
+        list or None
+            Sorted node IDs of the sub-web, or None if all attempts failed
+        """
+        for _ in range(max_attempts):
+            bits = self.sample_bits(size, seed_size)
+            if bits is not None:
+                return self.web.to_node_ids(bits)
+        return None
+
+    def sample_many(self, size, count, seed_size=1, unique=True, max_attempts=None):
+        """ Generate up to `count` sub-webs.
+
+        Parameters
+        ----------
+        size : int
+            Number of nodes in each sub-web
+        count : int
+            Number of sub-webs to generate
+        seed_size : int, optional
+            Number of starting nodes of each sub-web
+        unique : bool, optional
+            If True, don't generate the same sub-web twice
+        max_attempts : int, optional
+            Stop after this many attempts (default: 100 * count), so that
+            fewer than `count` sub-webs may be generated
+
+        Yields
+        ------
+        list
+            Sorted node IDs of each sub-web
+        """
+        if max_attempts is None:
+            max_attempts = 100 * count
+        seen = set()
+        generated = 0
+        for _ in range(max_attempts):
+            if generated == count:
+                break
+            bits = self.sample_bits(size, seed_size)
+            if bits is None or (unique and bits in seen):
+                continue
+            seen.add(bits)
+            generated += 1
+            yield self.web.to_node_ids(bits)
+
+
+def is_predator_complete(web, bits):
+    """ Return whether every plant eater in a sub-web that has predators in
+    the full food web has a predator in the sub-web. """
+    for i in iter_bits(bits & web.plant_eaters):
+        if web.predators[i] and not web.predators[i] & bits:
+            return False
+    return True
+
+
+def has_prey(web, bits):
+    """ Return whether every member of a sub-web that is not a source node of
+    the full food web has prey in the sub-web. """
+    for i in iter_bits(bits & ~web.sources):
+        if not web.prey[i] & bits:
+            return False
+    return True
+
+
+def _extend_subwebs(web, remaining, basal, num_basal, sub, neighborhood, extension, higher,
+                    basal_count):
+    """ Recursive step of enumerate_subweb_bits(): ESU extension of `sub` by
+    `remaining` more nodes.
+
+    `neighborhood` is `sub` and its neighbours, `extension` the candidate
+    nodes, and `higher` the nodes with a higher index than the root. """
+    if remaining == 0:
+        yield sub
+        return
+    while extension:
+        w_bit = extension & -extension
+        extension ^= w_bit
+        w = w_bit.bit_length() - 1
+        new_basal_count = basal_count + (1 if w_bit & basal else 0)
+        # Prune sub-webs with too many basal species, or too few slots
+        # left for the basal species they still need
+        if new_basal_count > num_basal or num_basal - new_basal_count > remaining - 1:
+            continue
+        exclusive = web.neighbors[w] & ~neighborhood & higher
+        yield from _extend_subwebs(web, remaining - 1, basal, num_basal, sub | w_bit,
+                                   neighborhood | web.neighbors[w], extension | exclusive,
+                                   higher, new_basal_count)
+
+
+def enumerate_subweb_bits(web, size, basal_nodes, num_basal_species, shard=0, num_shards=1,
+                          require_predators=True, require_prey=True):
+    """ Enumerate the connected sub-webs of a food web with a given number of
+    basal species.
+
+    Uses the ESU algorithm (Wernicke 2006): each sub-web is grown from its
+    lowest-indexed node (the root) by adding only nodes with a higher index
+    that are neighbours of the newest node but not of the earlier ones, so
+    each connected sub-web is generated exactly once.
+
+    Parameters
+    ----------
+    web : BitsetFoodWeb
+        Food web
+    size : int
+        Number of nodes in each sub-web
+    basal_nodes : list
+        Node IDs of the basal species
+    num_basal_species : int
+        Number of basal species in each sub-web
+    shard, num_shards : int, optional
+        Enumerate only the sub-webs whose root index modulo `num_shards` is
+        `shard`, so that the enumeration can be split across processes
+    require_predators : bool, optional
+        Only include predator-complete sub-webs (see is_predator_complete())
+    require_prey : bool, optional
+        Only include sub-webs in which every non-source node has prey (as in
+        the sub-webs grown by PredatorCompleteSampler)
+
+    Yields
+    ------
+    int
+        Bitset of the nodes of each sub-web
+    """
+    basal = web.to_bits(node_id for node_id in basal_nodes if node_id in web.index)
+    all_nodes = (1 << len(web)) - 1
+    for root in range(shard, len(web), num_shards):
+        root_bit = 1 << root
+        basal_count = 1 if root_bit & basal else 0
+        if basal_count > num_basal_species or num_basal_species - basal_count > size - 1:
+            continue
+        higher = all_nodes & ~((root_bit << 1) - 1)
+        for bits in _extend_subwebs(web, size - 1, basal, num_basal_species, root_bit,
+                                    root_bit | web.neighbors[root], web.neighbors[root] & higher,
+                                    higher, basal_count):
+            if require_predators and not is_predator_complete(web, bits):
+                continue
+            if require_prey and not has_prey(web, bits):
+                continue
+            yield bits
+
+
+def enumerate_subwebs(graph, size, basal_nodes, num_basal_species, full_graph=None, **kwargs):
+    """ Like enumerate_subweb_bits(), but taking a networkx graph (and the
+    full food web it was taken from, if any; see BitsetFoodWeb) and yielding
+    sorted lists of node IDs. """
+    web = BitsetFoodWeb(graph, full_graph)
+    for bits in enumerate_subweb_bits(web, size, basal_nodes, num_basal_species, **kwargs):
+        yield web.to_node_ids(bits)
+
+
+def write_subwebs(filename, graph, size, basal_nodes, num_basal_species, **kwargs):
+    """ Write the food web IDs of the enumerated sub-webs to a file, one per
+    line, as they are generated.
+
+    Returns
+    -------
+    int
+        Number of sub-webs written
+    """
+    count = 0
+    with open(filename, 'w') as f:
+        for node_ids in enumerate_subwebs(graph, size, basal_nodes, num_basal_species, **kwargs):
+            print('-'.join(map(str, node_ids)), file=f)
+            count += 1
+    return count
+
+
+def count_subwebs(graph, size, basal_nodes, num_basal_species, full_graph=None, **kwargs):
+    """ Count the enumerated sub-webs without storing them. """
+    web = BitsetFoodWeb(graph, full_graph)
+    return sum(1 for _ in enumerate_subweb_bits(web, size, basal_nodes, num_basal_species,
+                                                **kwargs))
+
+
+def _count_shard(args):
+    graph, size, basal_nodes, num_basal_species, shard, num_shards, kwargs = args
+    return count_subwebs(graph, size, basal_nodes, num_basal_species, shard=shard,
+                         num_shards=num_shards, **kwargs)
+
+
+def _write_shard(args):
+    filename, graph, size, basal_nodes, num_basal_species, shard, num_shards, kwargs = args
+    return write_subwebs(filename, graph, size, basal_nodes, num_basal_species, shard=shard,
+                         num_shards=num_shards, **kwargs)
+
+
+def shard_filename(filename, shard, num_shards):
+    return '{}.shard-{}-of-{}'.format(filename, shard, num_shards)
+
+
+def enumerate_subwebs_parallel(graph, size, basal_nodes, num_basal_species, filename=None,
+                               num_shards=None, processes=None, **kwargs):
+    """ Enumerate sub-webs in shards across processes.
+
+    If `filename` is given, each shard is written to its own file (see
+    shard_filename()) and the shard files are then concatenated into
+    `filename` and removed; otherwise the sub-webs are only counted.
+
+    Parameters
+    ----------
+    filename : str, optional
+        Output file
+    num_shards : int, optional
+        Number of shards (default: one per node, which balances the load
+        better than one per process)
+    processes : int, optional
+        Number of worker processes (default: number of CPUs)
+    **kwargs
+        Other arguments to enumerate_subwebs()
+
+    Returns
+    -------
+    int
+        Number of sub-webs
+    """
+    if num_shards is None:
+        num_shards = graph.number_of_nodes()
+    if filename is None:
+        tasks = [(graph, size, basal_nodes, num_basal_species, shard, num_shards, kwargs)
+                 for shard in range(num_shards)]
+        worker = _count_shard
+    else:
+        tasks = [(shard_filename(filename, shard, num_shards), graph, size, basal_nodes,
+                  num_basal_species, shard, num_shards, kwargs)
+                 for shard in range(num_shards)]
+        worker = _write_shard
+
+    with multiprocessing.Pool(processes) as pool:
+        total = sum(pool.imap_unordered(worker, tasks))
+
+    if filename is not None:
+        with open(filename, 'w') as f:
+            for task in tasks:
+                with open(task[0]) as shard_file:
+                    shutil.copyfileobj(shard_file, f)
+                os.remove(task[0])
+
+    return total
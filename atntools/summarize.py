@@ -16,7 +16,6 @@ import os.path
 import gzip
 import csv
 from math import log2
-import re
 import glob
 
 import numpy as np
@@ -25,23 +24,19 @@ import pandas as pd
 import h5py
 
 from .nodeconfigs import parse_node_config, node_config_to_params
-from .simulationdata import SimulationData, EXTINCT
-from . import util, foodwebs
+from .simulationdata import SimulationData, EXTINCT, BIOMASS_CHUNK_SIZE
+from . import util, foodwebs, summaryfiles, wobdata
+from .util import get_sim_number
 
+# Number of rows to buffer before appending to a columnar summary file
+SUMMARY_CHUNK_SIZE = 1000
 
-def get_sim_number(filename):
-    """
-    Based on a filename such as
-    ATN.csv
-    ATN_1.csv
-    ATN_123.csv
-    return the simulation number such as
-    0
-    1
-    123
-    """
-    match = re.match(r'.+_(\d+)\..+', filename)
-    return int(match.group(1)) if match else 0
+# Number of final timesteps over which oscillation period and amplitude are measured
+OSCILLATION_WINDOW = 2048
+
+# Relative size of oscillations, compared to the species' biomass, below
+# which they are treated as floating-point noise
+OSCILLATION_TOLERANCE = 1e-9
 
 
 def get_species_data(filename=None):
@@ -50,20 +45,22 @@ def get_species_data(filename=None):
     species, rows unique by nodeId),
     return a dict whose keys are node IDs and keys are dicts containing the data
     for that species.
-    """
 
-    if filename is None:
-        filename = os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                'data/species-data.csv')
+    By default, the data of data/species-data.csv is read from the compiled
+    WoB data (see wobdata).
+    """
 
     data = {}
-    with open(filename, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            data[int(row['nodeId'])] = {
-                'name': row['name'],
-                'trophicLevel': float(row['trophicLevel'])
-            }
+    if filename is None:
+        rows = wobdata.get_wob_data().table_rows('species_data')
+    else:
+        with open(filename, 'r') as f:
+            rows = list(csv.DictReader(f))
+    for row in rows:
+        data[int(row['nodeId'])] = {
+            'name': row['name'],
+            'trophicLevel': float(row['trophicLevel'])
+        }
     return data
 
 
@@ -197,13 +194,99 @@ def shannon_index_biomass_product_norm(species_data, node_config, biomass_data):
 
 def last_nonzero_timestep(biomass_data):
     """
-    Returns the last timestep at which there is nonzero biomass.
+    Returns the last timestep at which there is nonzero biomass,
+    or -1 if there is none.
+    """
+    nonzero_rows = np.flatnonzero((biomass_data.values != 0).any(axis=1))
+    if len(nonzero_rows) == 0:
+        return -1
+    return biomass_data.index[nonzero_rows[-1]]
+
+
+def oscillation_features(simdata, window=OSCILLATION_WINDOW, chunk_size=None):
+    """ Compute oscillation features for each species, streaming the biomass
+    data from the HDF5 file chunk by chunk.
+
+    The period and amplitude are measured over the final `window` timesteps,
+    where an oscillating steady state has settled. The mean and variance are
+    over the whole simulation, accumulated per chunk with the pairwise
+    update of Chan et al., so that memory use is bounded by the chunk size
+    and the window rather than by the length of the simulation.
+
+    Parameters
+    ----------
+    simdata : SimulationData
+        The simulation data
+    window : int, optional
+        Number of final timesteps over which to measure period and amplitude
+    chunk_size : int, optional
+        Number of timesteps to read at a time
+
+    Returns
+    -------
+    dict
+        Attributes named "<feature>_<node_id>", where <feature> is one of
+        oscillation_period (dominant period in timesteps, from the FFT of the
+        window; NaN if the species' biomass is constant in the window, to
+        within OSCILLATION_TOLERANCE), oscillation_amplitude (peak-to-trough
+        over the window; 0 if constant),
+        biomass_mean and biomass_variance.
     """
-    df = biomass_data
-    nonzero = pd.Series(index=df.index, data=False)
-    for col in df:
-        nonzero |= (df[col] != 0)
-    return nonzero.sort_index(ascending=False).argmax()
+    if chunk_size is None:
+        chunk_size = max(window, BIOMASS_CHUNK_SIZE)
+
+    num_timesteps = simdata.num_biomass_timesteps
+    window_start = max(0, num_timesteps - window)
+    num_nodes = len(simdata.node_ids)
+
+    count = 0
+    mean = np.zeros(num_nodes)
+    m2 = np.zeros(num_nodes)  # Sum of squared deviations from the mean
+    tail = []
+
+    for timestep, chunk in simdata.iter_biomass_chunks(chunk_size):
+        n = len(chunk)
+        chunk_mean = chunk.mean(axis=0)
+        chunk_m2 = ((chunk - chunk_mean) ** 2).sum(axis=0)
+        delta = chunk_mean - mean
+        total = count + n
+        mean += delta * n / total
+        m2 += chunk_m2 + delta ** 2 * count * n / total
+        count = total
+
+        if timestep + n > window_start:
+            tail.append(chunk[max(0, window_start - timestep):])
+
+    out = {}
+    if count == 0:
+        return out
+
+    tail = np.concatenate(tail)
+    amplitude = tail.max(axis=0) - tail.min(axis=0)
+    # Variation within OSCILLATION_TOLERANCE of the biomass is noise
+    tolerance = OSCILLATION_TOLERANCE * np.abs(tail).max(axis=0)
+    amplitude[amplitude <= tolerance] = 0
+
+    # Dominant period: frequency bin with the greatest power, excluding DC.
+    # A sinusoid of amplitude a over n timesteps has a peak power of about
+    # (a * n / 4) ** 2 after windowing, so noise is about (tolerance * n) ** 2
+    # at most.
+    detrended = (tail - tail.mean(axis=0)) * np.hanning(len(tail))[:, np.newaxis]
+    power = np.abs(np.fft.rfft(detrended, axis=0)) ** 2
+    period = np.full(num_nodes, np.nan)
+    if len(power) > 1:
+        peak_bin = power[1:].argmax(axis=0) + 1
+        oscillating = (power[1:].max(axis=0) > (tolerance * len(tail)) ** 2) & (amplitude > 0)
+        period[oscillating] = len(tail) / peak_bin[oscillating]
+
+    variance = m2 / count
+    for i, node_id in enumerate(simdata.node_ids):
+        out['oscillation_period_{}'.format(node_id)] = period[i]
+        out['oscillation_amplitude_{}'.format(node_id)] = amplitude[i]
+        out['biomass_mean_{}'.format(node_id)] = mean[i]
+        out['biomass_variance_{}'.format(node_id)] = variance[i]
+
+    return out
 
 
 def get_output_attributes(simdata, species_data, optional_output_attributes=[]):
@@ -230,16 +313,39 @@ def get_output_attributes(simdata, species_data, optional_output_attributes=[]):
         out['environment_score_slope'] = environment_score_slope(simdata)
     elif 'environment_score_slope_skip200' in optional_output_attributes:
         out['environment_score_slope_skip200'] = environment_score_slope(simdata, skip=200)
+    if 'oscillation' in optional_output_attributes:
+        out.update(oscillation_features(simdata))
 
     return out
 
 
 def generate_summary_file(set_number, batch_number, output_file, biomass_files,
-                          optional_output_attributes=[]):
+                          optional_output_attributes=[], columnar=False):
+    """ Generate a summary file with one row per simulation.
+
+    Parameters
+    ----------
+    set_number : int
+    batch_number : int
+    output_file : str
+        Name of the CSV summary file to write
+    biomass_files : iterable of str
+        Simulation data files to summarize
+    optional_output_attributes : list of str, optional
+        Optional output attributes to include (see get_output_attributes())
+    columnar : bool, optional
+        If True, also write a columnar HDF5 summary file with the same base
+        name as `output_file` (see summaryfiles)
+    """
     species_data = get_species_data()
 
     outfile = None
     writer = None
+    columnar_writer = None
+    columnar_rows = []
+    if columnar:
+        columnar_writer = summaryfiles.SummaryWriter(
+            summaryfiles.columnar_filename(output_file))
 
     for sim_number, infilename in sorted(
             [(get_sim_number(f), f) for f in biomass_files]):
@@ -263,7 +369,6 @@ def generate_summary_file(set_number, batch_number, output_file, biomass_files,
         simdata = SimulationData(infilename)
         node_config_list = parse_node_config(simdata.node_config)
         input_attributes = node_config_to_params(node_config_list)
-        biomass_data = simdata.biomass
         outrow.update(input_attributes)
         output_attributes = get_output_attributes(simdata, species_data,
                                                   optional_output_attributes)
@@ -282,13 +387,25 @@ def generate_summary_file(set_number, batch_number, output_file, biomass_files,
 
         writer.writerow(outrow)
 
+        if columnar_writer is not None:
+            columnar_rows.append(outrow)
+            if len(columnar_rows) == SUMMARY_CHUNK_SIZE:
+                columnar_writer.append(pd.DataFrame(columnar_rows, columns=fieldnames))
+                columnar_rows = []
+
     print()
 
     if outfile is not None:
         outfile.close()
 
+    if columnar_writer is not None:
+        if columnar_rows:
+            columnar_writer.append(pd.DataFrame(columnar_rows, columns=fieldnames))
+        columnar_writer.close()
+
 
-def generate_summary_file_for_batch(set_number, batch_number, optional_output_attributes=[]):
+def generate_summary_file_for_batch(set_number, batch_number, optional_output_attributes=[],
+                                    columnar=False):
     set_dir = util.find_set_dir(set_number)
     if set_dir is None:
         print("Error: set {} not found".format(set_number), file=sys.stderr)
@@ -302,6 +419,7 @@ def generate_summary_file_for_batch(set_number, batch_number, optional_output_at
     generate_summary_file(
         set_number,
         batch_number,
-        os.path.join(batch_dir, 'summary.csv'),
+        os.path.join(batch_dir, summaryfiles.SUMMARY_CSV),
         glob.iglob(os.path.join(batch_dir, 'biomass-data/*.h5')),
-        optional_output_attributes)
+        optional_output_attributes,
+        columnar)
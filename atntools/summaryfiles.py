@@ -0,0 +1,375 @@
+"""
+Reading and writing summary files
+
+A summary file has one row per simulation, with identifiers, input
+parameters and output attributes as produced by
+summarize.generate_summary_file().  It is always written as CSV
+(summary.csv) and may also be written in a columnar HDF5 format (summary.h5)
+with an explicit schema, which is much faster and smaller to load for wide
+summaries.
+
+The HDF5 layout is one 1-D dataset per column in the root group, with the
+column order stored in the 'columns' attribute of the file.  Categorical
+columns (such as stop_event) are stored as integer codes, with the category
+names in the 'categories' attribute of the dataset.
+"""
+
+import os.path
+
+import numpy as np
+import pandas as pd
+import h5py
+
+from . import util
+
+SUMMARY_CSV = 'summary.csv'
+SUMMARY_HDF5 = 'summary.h5'
+
+# Default number of rows per chunk when streaming summary files
+READ_CHUNK_SIZE = 100000
+
+# Possible values of stop_event (see SimulationData)
+STOP_EVENTS = [
+    'NONE',
+    'UNKNOWN_EVENT',
+    'TOTAL_EXTINCTION',
+    'CONSTANT_BIOMASS_PRODUCERS_ONLY',
+    'CONSTANT_BIOMASS_WITH_CONSUMERS',
+    'OSCILLATING_STEADY_STATE',
+]
+
+_int_columns = {
+    'set_number',
+    'batch_number',
+    'sim_number',
+    'timesteps_simulated',
+    'extinction_count',
+    'survivor_count',
+}
+
+_categorical_columns = {
+    'stop_event',
+}
+
+
+def column_dtype(column):
+    """ Return the schema type of the given summary column.
+
+    Counts, identifiers and timesteps (including the per-species
+    extinction_<node_id> timesteps) are int64, stop_event is categorical,
+    and everything else (parameters and computed features) is float64.
+
+    Parameters
+    ----------
+    column : str
+        Column name
+
+    Returns
+    -------
+    numpy.dtype or str
+        The column type, or 'category' for categorical columns
+    """
+    if column in _categorical_columns:
+        return 'category'
+    if column in _int_columns or column.startswith('extinction_'):
+        return np.dtype(np.int64)
+    return np.dtype(np.float64)
+
+
+def apply_schema(df):
+    """ Cast the columns of a summary DataFrame to their schema types, in place.
+
+    Columns that are not numeric in `df` and have no categorical schema type
+    (e.g. class labels) are made categorical.
+    """
+    for column in df.columns:
+        dtype = column_dtype(column)
+        if column == 'stop_event':
+            # Fixed categories, so that separately read chunks are consistent
+            values = df[column].astype(object)
+            extra = sorted(set(values.dropna()) - set(STOP_EVENTS))
+            df[column] = pd.Categorical(values, categories=STOP_EVENTS + extra)
+        elif dtype == 'category' or not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].astype('category')
+        elif df[column].dtype != dtype:
+            if dtype.kind == 'i' and df[column].isnull().any():
+                # Can't represent missing values as int
+                df[column] = df[column].astype(np.float64)
+            else:
+                df[column] = df[column].astype(dtype)
+    return df
+
+
+class SummaryWriter(object):
+    """ Incrementally writes a columnar HDF5 summary file.
+
+    Rows are appended in chunks (DataFrames with the same columns), so a
+    summary can be written without holding all of it in memory. Column types
+    are fixed by the first chunk: integer columns with missing values in it
+    are stored as float64, and missing values in later chunks of an integer
+    column raise ValueError.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the HDF5 file to create (overwritten if it exists)
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = h5py.File(filename, 'w')
+        self._columns = None
+        self._categories = {}
+        self.row_count = 0
+
+    def _create_datasets(self, df):
+        self._columns = list(df.columns)
+        self._file.attrs['columns'] = np.array(self._columns, dtype=h5py.special_dtype(vlen=str))
+        for column in self._columns:
+            dtype = column_dtype(column)
+            if dtype == 'category' or not pd.api.types.is_numeric_dtype(df[column]):
+                self._categories[column] = list(STOP_EVENTS) if column == 'stop_event' else []
+                dtype = np.int16
+            elif dtype.kind == 'i' and df[column].isnull().any():
+                # Can't represent missing values as int (as in apply_schema())
+                dtype = np.float64
+            self._file.create_dataset(
+                column, shape=(0,), maxshape=(None,), dtype=dtype,
+                chunks=True, compression='gzip', shuffle=True)
+
+    def _category_codes(self, column, values):
+        categories = self._categories[column]
+        codes = np.empty(len(values), dtype=np.int16)
+        index = {c: i for i, c in enumerate(categories)}
+        for i, value in enumerate(values):
+            if pd.isnull(value):
+                codes[i] = -1
+                continue
+            value = str(value)
+            if value not in index:
+                index[value] = len(categories)
+                categories.append(value)
+            codes[i] = index[value]
+        return codes
+
+    def append(self, df):
+        """ Append the rows of the DataFrame `df` to the file. """
+        if len(df) == 0:
+            return
+        if self._columns is None:
+            self._create_datasets(df)
+        n = len(df)
+        for column in self._columns:
+            dataset = self._file[column]
+            if column in self._categories:
+                values = self._category_codes(column, df[column].values)
+            else:
+                if dataset.dtype.kind == 'i' and df[column].isnull().any():
+                    raise ValueError("Missing values in integer column '{}', which had none "
+                                     "in the first chunk".format(column))
+                values = df[column].values.astype(dataset.dtype)
+            dataset.resize((self.row_count + n,))
+            dataset[self.row_count:] = values
+        self.row_count += n
+
+    def close(self):
+        for column, categories in self._categories.items():
+            self._file[column].attrs['categories'] = np.array(
+                categories, dtype=h5py.special_dtype(vlen=str))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_summary_hdf5(df, filename):
+    """ Write a summary DataFrame to a columnar HDF5 file. """
+    with SummaryWriter(filename) as writer:
+        writer.append(df)
+
+
+def _decode(values):
+    return [v.decode('utf-8') if isinstance(v, bytes) else v for v in values]
+
+
+def read_summary_hdf5(filename, columns=None):
+    """ Read a columnar HDF5 summary file into a DataFrame.
+
+    Parameters
+    ----------
+    filename : str
+        HDF5 summary file
+    columns : list of str, optional
+        Columns to read (default: all columns, in file order)
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    with h5py.File(filename, 'r') as f:
+        if columns is None:
+            columns = _decode(f.attrs['columns'])
+        data = {}
+        for column in columns:
+            dataset = f[column]
+            if 'categories' in dataset.attrs:
+                data[column] = pd.Categorical.from_codes(
+                    dataset[:], categories=_decode(dataset.attrs['categories']))
+            else:
+                data[column] = dataset[:]
+    return pd.DataFrame(data, columns=columns)
+
+
+def read_summary_csv(filename, columns=None):
+    """ Read a CSV summary file into a DataFrame with schema types applied. """
+    df = pd.read_csv(filename, usecols=columns)
+    if columns is not None:
+        df = df[columns]
+    return apply_schema(df)
+
+
+def columnar_filename(filename):
+    """ Return the name of the columnar counterpart of a CSV summary file. """
+    return os.path.splitext(filename)[0] + '.h5'
+
+
+def preferred_summary_file(filename):
+    """ Return the columnar counterpart of `filename` if it exists and is up to
+    date, otherwise `filename` itself. """
+    if filename.endswith('.h5'):
+        return filename
+    h5_filename = columnar_filename(filename)
+    if (os.path.isfile(h5_filename) and
+            (not os.path.isfile(filename) or
+             os.path.getmtime(h5_filename) >= os.path.getmtime(filename))):
+        return h5_filename
+    return filename
+
+
+def read_summary(filename, columns=None):
+    """ Read a summary file, preferring its columnar HDF5 counterpart.
+
+    Parameters
+    ----------
+    filename : str
+        Summary file (CSV or HDF5). If it is a CSV file and an up-to-date
+        HDF5 file with the same base name exists, that is read instead.
+    columns : list of str, optional
+        Columns to read (default: all columns)
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    filename = preferred_summary_file(filename)
+    if filename.endswith('.h5'):
+        return read_summary_hdf5(filename, columns)
+    else:
+        return read_summary_csv(filename, columns)
+
+
+def read_batch_summary(batch_dir, columns=None):
+    """ Read the summary file of the given batch directory. """
+    return read_summary(os.path.join(batch_dir, SUMMARY_CSV), columns)
+
+
+def summary_columns(filename):
+    """ Return the column names of a summary file (CSV or HDF5) without
+    reading its rows. """
+    filename = preferred_summary_file(filename)
+    if filename.endswith('.h5'):
+        with h5py.File(filename, 'r') as f:
+            return _decode(f.attrs['columns'])
+    return list(pd.read_csv(filename, nrows=0).columns)
+
+
+def summary_row_count(filename):
+    """ Return the number of rows in a summary file (CSV or HDF5). """
+    filename = preferred_summary_file(filename)
+    if filename.endswith('.h5'):
+        with h5py.File(filename, 'r') as f:
+            columns = _decode(f.attrs['columns'])
+            return f[columns[0]].shape[0] if columns else 0
+    with open(filename) as f:
+        return max(0, sum(1 for line in f) - 1)
+
+
+def _iter_hdf5_chunks(filename, columns, chunk_size):
+    with h5py.File(filename, 'r') as f:
+        if columns is None:
+            columns = _decode(f.attrs['columns'])
+        num_rows = f[columns[0]].shape[0] if columns else 0
+        categories = {
+            column: _decode(f[column].attrs['categories'])
+            for column in columns if 'categories' in f[column].attrs}
+        for start in range(0, num_rows, chunk_size):
+            data = {}
+            for column in columns:
+                values = f[column][start:start + chunk_size]
+                if column in categories:
+                    values = pd.Categorical.from_codes(values, categories=categories[column])
+                data[column] = values
+            yield pd.DataFrame(data, columns=columns,
+                               index=pd.RangeIndex(start, start + len(values)))
+
+
+def iter_summary_chunks(filenames, columns=None, chunk_size=READ_CHUNK_SIZE):
+    """ Stream the rows of one or more summary files as DataFrame chunks.
+
+    Each file is read in its preferred format (see preferred_summary_file()),
+    so only one chunk of one file is in memory at a time.
+
+    Parameters
+    ----------
+    filenames : str or iterable of str
+        Summary file(s)
+    columns : list of str, optional
+        Columns to read. By default, all columns of the first file are read
+        (in its order) from every file.
+    chunk_size : int, optional
+        Maximum number of rows per chunk
+
+    Yields
+    ------
+    pandas.DataFrame
+        A chunk of rows, with schema types applied
+    """
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    for filename in filenames:
+        filename = preferred_summary_file(filename)
+        if filename.endswith('.h5'):
+            chunks = _iter_hdf5_chunks(filename, columns, chunk_size)
+        else:
+            chunks = pd.read_csv(filename, usecols=columns, chunksize=chunk_size)
+        for chunk in chunks:
+            if columns is None:
+                columns = list(chunk.columns)
+            elif list(chunk.columns) != columns:
+                chunk = chunk[columns].copy()
+            yield apply_schema(chunk)
+
+
+def list_set_summary_files(set_identifier):
+    """ List the summary files of all batches of a set that have one.
+
+    Parameters
+    ----------
+    set_identifier : int or str
+        Set number or set directory
+
+    Returns
+    -------
+    list of str
+        Summary file names (CSV names; see preferred_summary_file()),
+        ordered by batch number
+    """
+    filenames = []
+    for batch_num, batch_dir in sorted(util.list_batch_dirs(set_identifier)):
+        filename = os.path.join(batch_dir, SUMMARY_CSV)
+        if preferred_summary_file(filename) != filename or os.path.isfile(filename):
+            filenames.append(filename)
+    return filenames
@@ -1,10 +1,15 @@
 """
 Classes and functions for working with decision trees
 
-For now, these deal with parsing and representing Weka's J48 decision tree.
+These deal with parsing and representing Weka's J48 decision tree, and with
+extracting the regions and splits of either a J48 tree or a fitted sklearn
+decision tree.
 """
 
 import re
+import pickle
+
+import numpy as np
 
 
 class TreeNode(object):
@@ -245,3 +250,116 @@ def parse_weka_j48_output_file(filename):
 
     tree_lines = get_weka_j48_tree_lines(filename)
     return parse_weka_j48_output(tree_lines)
+
+
+def load_tree(filename):
+    """
+    Load a decision tree from a Weka J48 output file or from a pickle file
+    written by searchprocess.save_classifier().
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file. Files ending in '.pkl' are read as pickles;
+        others as Weka J48 output.
+
+    Returns
+    -------
+    tree : TreeNode or sklearn.tree.DecisionTreeClassifier
+    feature_names : list of str or None
+        Names of the features of an sklearn tree (None for a J48 tree)
+    """
+    if filename.endswith('.pkl'):
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+        return data['classifier'], data['feature_names']
+    return parse_weka_j48_output_file(filename), None
+
+
+def _is_sklearn_tree(tree):
+    return not isinstance(tree, TreeNode)
+
+
+def get_split_thresholds(tree, feature_names):
+    """
+    Return the splits of the internal nodes of a decision tree.
+
+    Parameters
+    ----------
+    tree : TreeNode or sklearn.tree.DecisionTreeClassifier
+    feature_names : list of str
+        Feature names, in the order of the sklearn tree's features. For a J48
+        tree, splits on attributes not in this list are ignored.
+
+    Returns
+    -------
+    list of (int, float)
+        Feature index and threshold of each split
+    """
+    if _is_sklearn_tree(tree):
+        tree_ = tree.tree_
+        return [(tree_.feature[i], tree_.threshold[i])
+                for i in range(tree_.node_count) if tree_.children_left[i] != -1]
+    feature_ids = {name: i for i, name in enumerate(feature_names)}
+    return [(feature_ids[node.split_attribute], node.split_value)
+            for node in tree.get_internal_nodes() if node.split_attribute in feature_ids]
+
+
+def get_leaf_regions(tree, feature_names, root_bounds):
+    """
+    Return the region of feature space covered by each leaf of a decision
+    tree, along with its impurity.
+
+    Parameters
+    ----------
+    tree : TreeNode or sklearn.tree.DecisionTreeClassifier
+    feature_names : list of str
+        Feature names, in the order of the sklearn tree's features
+    root_bounds : numpy.ndarray
+        Array of shape (len(feature_names), 2) with the lower and upper
+        bound of each feature over the whole space
+
+    Returns
+    -------
+    bounds : numpy.ndarray
+        Array of shape (number of leaves, len(feature_names), 2) with the
+        bounds of each leaf
+    impurity : numpy.ndarray
+        Misclassification rate of the training instances in each leaf
+        (0 for a pure leaf)
+    """
+    feature_ids = {name: i for i, name in enumerate(feature_names)}
+    leaf_bounds = []
+    impurity = []
+
+    def visit(node, bounds):
+        if _is_sklearn_tree(tree):
+            tree_ = tree.tree_
+            if tree_.children_left[node] == -1:
+                value = tree_.value[node, 0]
+                leaf_bounds.append(bounds)
+                impurity.append(1 - value.max() / value.sum() if value.sum() > 0 else 0)
+                return
+            feature_id = tree_.feature[node]
+            threshold = tree_.threshold[node]
+            children = (tree_.children_left[node], tree_.children_right[node])
+        else:
+            if node.is_leaf:
+                leaf_bounds.append(bounds)
+                impurity.append(node.misclassified_count / node.instance_count
+                                if node.instance_count else 0)
+                return
+            feature_id = feature_ids.get(node.split_attribute)
+            threshold = node.split_value
+            children = (node.child_lte, node.child_gt)
+
+        lte_bounds = bounds.copy()
+        gt_bounds = bounds.copy()
+        if feature_id is not None:
+            lte_bounds[feature_id, 1] = min(threshold, bounds[feature_id, 1])
+            gt_bounds[feature_id, 0] = max(threshold, bounds[feature_id, 0])
+        visit(children[0], lte_bounds)
+        visit(children[1], gt_bounds)
+
+    visit(0 if _is_sklearn_tree(tree) else tree, np.array(root_bounds, dtype=np.float64))
+    return np.array(leaf_bounds), np.array(impurity)
@@ -3,12 +3,12 @@ Utility functions
 """
 
 import os
-import csv
 import re
 import collections
 import json
 import copy
 import glob
+import random
 
 import numpy as np
 
@@ -70,9 +70,9 @@ def read_species_csv():
         'node_id': int,
     }
 
-    f = open(os.path.join(WOB_DB_DIR, 'species-table.csv'))
-    reader = csv.DictReader(f)
-    for row in reader:
+    # Rows of species-table.csv, from the compiled WoB data
+    from atntools import wobdata
+    for row in wobdata.get_wob_data().table_rows('species'):
         row = typecast_dict_values(row, types)
         species_id = row['species_id']
         if species_id in species_data:
@@ -81,7 +81,6 @@ def read_species_csv():
             row['node_id_list'] = [row['node_id']]
             del row['node_id']
             species_data[species_id] = row
-    f.close()
 
     return species_data
 
@@ -98,6 +97,21 @@ def clip(x, xmin, xmax):
     return min(xmax, max(x, xmin))
 
 
+def get_sim_number(filename):
+    """
+    Based on a filename such as
+    ATN.csv
+    ATN_1.csv
+    ATN_123.csv
+    return the simulation number such as
+    0
+    1
+    123
+    """
+    match = re.match(r'.+_(\d+)\..+', filename)
+    return int(match.group(1)) if match else 0
+
+
 def remove_trailing_digits(string):
     """ Return the string with trailing digits removed. """
     return re.match(r'(\D+)', string).group()
@@ -130,6 +144,33 @@ def get_food_web_dir(identifier):
     return os.path.join(settings.DATA_HOME, '{}-species'.format(len(node_ids)), food_web_id)
 
 
+_food_web_parent_dir_pattern = re.compile(r'^(\d+)-species$')
+_food_web_dir_pattern = re.compile(r'^\d+(-\d+)*$')
+
+
+def list_food_web_dirs():
+    """ List all food web directories under DATA_HOME.
+
+    Yields
+    -------
+    food_web_id : str, food_web_dir : str
+        Each item yielded is a tuple containing the food web ID and
+        the path to the food web directory.
+    """
+    if not os.path.isdir(settings.DATA_HOME):
+        return
+    for parent in sorted(os.listdir(settings.DATA_HOME)):
+        match = _food_web_parent_dir_pattern.match(parent)
+        parent_dir = os.path.join(settings.DATA_HOME, parent)
+        if not match or not os.path.isdir(parent_dir):
+            continue
+        for food_web_id in sorted(os.listdir(parent_dir)):
+            food_web_dir = os.path.join(parent_dir, food_web_id)
+            if (_food_web_dir_pattern.match(food_web_id) and os.path.isdir(food_web_dir) and
+                    len(food_web_id.split('-')) == int(match.group(1))):
+                yield food_web_id, food_web_dir
+
+
 _set_dir_pattern = re.compile(r'^set-(\d+)$')
 
 
@@ -151,7 +192,9 @@ def list_set_dirs():
                 set_num = int(match.group(1))
                 set_dir = os.path.join(root, d)
                 yield set_num, set_dir
-        (dirs.remove(d) for d in remove_dirs)
+        # Don't descend into set directories
+        for d in remove_dirs:
+            dirs.remove(d)
 
 
 def list_batch_dirs(set_identifier):
@@ -180,7 +223,8 @@ def list_batch_dirs(set_identifier):
 
 
 def find_set_dir(set_num):
-    """ Find a set directory under DATA_HOME.
+    """ Find a set directory under DATA_HOME, using the catalog (see
+    catalog.find_set_dir()).
 
     Parameters
     ----------
@@ -192,10 +236,8 @@ def find_set_dir(set_num):
     str or None
         Path to the set directory, or None if it doesn't exist
     """
-    for set_num_, set_dir in list_set_dirs():
-        if set_num_ == set_num:
-            return set_dir
-    return None
+    from atntools import catalog
+    return catalog.find_set_dir(set_num)
 
 
 def find_batch_dir(set_identifier, batch_number):
@@ -232,11 +274,8 @@ def get_max_set_number():
     int
         The maximum set number, or None if no sets exist
     """
-    set_dirs = list(list_set_dirs())
-    if len(set_dirs) == 0:
-        return None
-    else:
-        return max(set_num for set_num, set_dir in set_dirs)
+    from atntools import catalog
+    return catalog.get_max_set_number()
 
 
 def get_max_batch_number(set_identifier):
@@ -276,23 +315,29 @@ def create_set_dir(food_web, metaparameter_template):
         A tuple containing the set number and the path to the set directory.
     """
 
+    from atntools import catalog
+
     # Determine food web directory (assumed to exist) and set directory (does not exist)
     food_web_dir = get_food_web_dir(food_web)
-    max_set_num = get_max_set_number()
-    if max_set_num is None:
-        set_num = 0
-    else:
-        set_num = max_set_num + 1
-    set_dir = os.path.join(food_web_dir, 'set-{}'.format(set_num))
 
-    # Create the set directory
-    os.mkdir(set_dir)
+    # Allocate the set number and create the set directory
+    with catalog.connect() as conn, catalog.transaction(conn):
+        max_set_num = catalog.get_max_set_number(conn)
+        if max_set_num is None:
+            max_set_num = -1
+        set_num, set_dir = catalog.make_numbered_dir(
+            max_set_num + 1, lambda n: os.path.join(food_web_dir, 'set-{}'.format(n)),
+            taken=lambda n: catalog.set_number_taken(conn, n))
+        catalog.add_set(conn, set_num, set_dir)
 
     # Generate the metaparameter file from the template
     food_web_id = os.path.basename(food_web_dir)
     with open(os.path.join(food_web_dir, 'foodweb.{}.json'.format(food_web_id))) as f:
         food_web_info = json.load(f)
-    metaparameters = copy.copy(metaparameter_template)
+    metaparameters = copy.deepcopy(metaparameter_template)
+    if 'seed' in metaparameters['args'] and metaparameters['args']['seed'] is None:
+        # Record a random seed so the node configs can be regenerated
+        metaparameters['args']['seed'] = random.SystemRandom().randrange(2 ** 63)
     if 'node_ids' in metaparameters['args']:
         try:
             node_ids = food_web_info['node_ids']
@@ -321,31 +366,29 @@ def create_batch_dir(set_num):
         created batch directory
     """
 
+    from atntools import catalog
+
     set_dir = find_set_dir(set_num)
-    max_batch_num = get_max_batch_number(set_num)
-    if max_batch_num is None:
-        batch_num = 0
-    else:
-        batch_num = max_batch_num + 1
-    batch_dir = os.path.join(set_dir, 'batch-{}'.format(batch_num))
-    os.mkdir(batch_dir)
+    with catalog.connect() as conn, catalog.transaction(conn):
+        max_batch_num = get_max_batch_number(set_dir)
+        if max_batch_num is None:
+            max_batch_num = -1
+        batch_num, batch_dir = catalog.make_numbered_dir(
+            max_batch_num + 1, lambda n: os.path.join(set_dir, 'batch-{}'.format(n)))
+        catalog.add_batch(conn, set_num, batch_num, batch_dir)
     return batch_num, batch_dir
 
 
-def dataframe_to_arff(df, relation_name, class_column, class_values, filename):
+def dataframe_to_arff(df, relation_name, class_column, class_values, filename, chunk_size=100000):
     """ Save a DataFrame as an ARFF file. Requires a column with class labels.
-    Assumes all columns except the class column are numeric. """
-
-    with open(filename, 'w') as f:
-        f.write('@RELATION {}\n\n'.format(relation_name))
-        for column in df.columns:
-            if column == class_column:
-                f.write('@ATTRIBUTE class {{{}}}\n'.format(','.join(class_values)))
-            else:
-                f.write('@ATTRIBUTE {} NUMERIC\n'.format(column))
-
-        f.write('\n@DATA\n')
-        f.write(df.to_csv(index=False, header=False))
+    Assumes all columns except the class column are numeric.
+
+    Rows are written `chunk_size` at a time (see featureexport.ArffWriter). """
+    from atntools.featureexport import ArffWriter
+
+    with ArffWriter(filename, relation_name, df.columns, class_column, class_values) as writer:
+        for start in range(0, len(df), chunk_size):
+            writer.append(df.iloc[start:start + chunk_size])
 
 
 def weighted_random_choice(seq, weights):
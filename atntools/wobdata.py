@@ -0,0 +1,297 @@
+"""
+Compiled WoB database export data
+
+The Serengeti food web and species data are exported from the WoB database as
+CSV files (see util.WOB_DB_DIR and data/species-data.csv). Parsing these and
+building the food web graph takes a noticeable part of the run time of short
+processes, so the first process to need them compiles them into a single
+binary artefact (a pickle file in CACHE_DIR) holding only arrays: the
+edges of the food web as arrays of node IDs, a vector for each species
+attribute, and a typed vector for each used column of the species tables
+(see TABLE_COLUMNS). Later processes load the artefact instead. It is recompiled
+whenever the hash of the source files changes. The artefact also records the
+size and modification time of the source files, and the files are only read
+and hashed when these have changed.
+
+The food web graph itself is only built when asked for (see
+WobData.graph()); attributes and neighbours of a node can be looked up
+directly from the arrays.
+"""
+
+import os
+import csv
+import hashlib
+import pickle
+import tempfile
+
+import numpy as np
+
+from .util import WOB_DB_DIR
+
+CACHE_DIR = os.path.expanduser('~/.atn-tools/cache')
+ARTEFACT_NAME = 'wob-data.pickle'
+
+# Source tables: key: table name; value: CSV file
+SOURCE_FILES = {
+    'consume': os.path.join(WOB_DB_DIR, 'consume-table.csv'),
+    'species': os.path.join(WOB_DB_DIR, 'species-table.csv'),
+    'species_data': os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'data', 'species-data.csv'),
+}
+
+# Columns of the species tables kept in the artefact, and their types
+TABLE_COLUMNS = {
+    'species': [
+        ('species_id', int),
+        ('name', str),
+        ('organism_type', int),
+        ('cost', int),
+        ('category', str),
+        ('biomass', float),
+        ('diet_type', int),
+        ('carrying_capacity', float),
+        ('metabolism', float),
+        ('trophic_level', float),
+        ('growth_rate', float),
+        ('model_id', int),
+        ('unlock', int),
+        ('node_id', int),
+    ],
+    'species_data': [
+        ('nodeId', int),
+        ('name', str),
+        ('trophicLevel', float),
+    ],
+}
+
+# Species attributes of the food web nodes, and their types
+NODE_ATTRIBUTES = [
+    ('name', str),
+    ('organism_type', int),
+    ('category', str),
+    ('biomass', float),
+    ('diet_type', int),
+    ('carrying_capacity', int),
+    ('metabolism', float),
+    ('trophic_level', float),
+    ('growth_rate', float),
+]
+
+
+def source_hash():
+    """ Return the SHA-256 hex digest of the source files. """
+    sha = hashlib.sha256()
+    for table, filename in sorted(SOURCE_FILES.items()):
+        sha.update(table.encode('utf-8'))
+        with open(filename, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def source_states():
+    """ Return the size and modification time of each source file, by table. """
+    states = {}
+    for table, filename in SOURCE_FILES.items():
+        stat = os.stat(filename)
+        states[table] = [os.path.abspath(filename), stat.st_size, stat.st_mtime_ns]
+    return states
+
+
+def get_artefact_filename():
+    return os.path.join(CACHE_DIR, ARTEFACT_NAME)
+
+
+def _read_table(filename):
+    with open(filename, newline='') as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        rows = list(reader)
+    return columns, rows
+
+
+def compile_wob_data():
+    """ Parse the source files into the arrays stored in the artefact.
+
+    Returns
+    -------
+    dict
+        Arrays by name
+    """
+    # States first, so that a source file changed while compiling is noticed
+    arrays = {'source_states': source_states(), 'source_hash': source_hash()}
+    tables = {}
+    for table, filename in SOURCE_FILES.items():
+        columns, rows = _read_table(filename)
+        values = np.array(rows, dtype=object).reshape(len(rows), len(columns))
+        tables[table] = {column: values[:, i] for i, column in enumerate(columns)}
+        for column, type_ in TABLE_COLUMNS.get(table, []):
+            arrays['table_{}_{}'.format(table, column)] = np.array(
+                [type_(value) for value in tables[table][column]])
+
+    # Food web edges, in the order of the consume table
+    consume = tables['consume']
+    prey = consume['prey_node_id'].astype(np.int64)
+    predators = consume['predator_node_id'].astype(np.int64)
+    arrays['edge_prey'] = prey
+    arrays['edge_predator'] = predators
+
+    # Nodes in order of first appearance
+    node_ids = []
+    seen = set()
+    for node_id in np.column_stack([prey, predators]).ravel():
+        if node_id not in seen:
+            seen.add(node_id)
+            node_ids.append(node_id)
+    node_ids = np.array(node_ids, dtype=np.int64)
+    arrays['node_ids'] = node_ids
+
+    # Node attributes from the species of the food web
+    species = tables['species']
+    consume_species_ids = set(consume['species_id'].astype(int)) | set(consume['prey_id'].astype(int))
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    has_attributes = np.zeros(len(node_ids), dtype=bool)
+    attribute_values = {name: [type_()] * len(node_ids) for name, type_ in NODE_ATTRIBUTES}
+    for row in range(len(species['species_id'])):
+        node_id = int(species['node_id'][row])
+        if int(species['species_id'][row]) not in consume_species_ids or node_id not in index:
+            continue
+        i = index[node_id]
+        has_attributes[i] = True
+        for name, type_ in NODE_ATTRIBUTES:
+            attribute_values[name][i] = type_(species[name][row])
+    arrays['has_attributes'] = has_attributes
+    for name, type_ in NODE_ATTRIBUTES:
+        arrays['attribute_' + name] = np.array(attribute_values[name])
+
+    return arrays
+
+
+def save_artefact(arrays, filename=None):
+    """ Save compiled arrays, atomically replacing any existing artefact
+    (default: get_artefact_filename()). """
+    if filename is None:
+        filename = get_artefact_filename()
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    fd, temp_filename = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(arrays, f, protocol=4)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        os.remove(temp_filename)
+        raise
+
+
+def load_artefact(filename=None):
+    """ Load the compiled arrays, compiling and saving them first if the
+    artefact (default: get_artefact_filename()) is missing or out of date.
+
+    The source files are only hashed if their sizes or modification times
+    differ from those recorded in the artefact. If the hash still matches
+    (e.g. the files were touched), the recorded states are updated.
+
+    If the artefact can't be written (e.g. the cache directory is read-only),
+    the compiled arrays are returned anyway.
+    """
+    if filename is None:
+        filename = get_artefact_filename()
+    current_states = source_states()
+    if os.path.isfile(filename):
+        try:
+            with open(filename, 'rb') as f:
+                arrays = pickle.load(f)
+            if arrays.get('source_states') == current_states:
+                return arrays
+            if arrays['source_hash'] == source_hash():
+                arrays['source_states'] = current_states
+                try:
+                    save_artefact(arrays, filename)
+                except OSError:
+                    pass
+                return arrays
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError):
+            pass
+    arrays = compile_wob_data()
+    try:
+        save_artefact(arrays, filename)
+    except OSError:
+        pass
+    return arrays
+
+
+class WobData(object):
+    """ Lookups into the compiled WoB data.
+
+    Parameters
+    ----------
+    arrays : dict
+        Arrays as returned by load_artefact()
+    """
+
+    def __init__(self, arrays):
+        self._arrays = arrays
+        self.node_ids = arrays['node_ids']
+        self._index = {int(node_id): i for i, node_id in enumerate(self.node_ids)}
+        self._has_attributes = arrays['has_attributes']
+        self._graph = None
+
+    def attribute(self, name):
+        """ Return the vector of the given species attribute, aligned with
+        node_ids. """
+        return self._arrays['attribute_' + name]
+
+    def has_node(self, node_id):
+        return node_id in self._index
+
+    def node_attributes(self, node_id):
+        """ Return the species attributes of a node, as in the node data of
+        graph(). """
+        i = self._index[node_id]
+        if not self._has_attributes[i]:
+            return {}
+        attributes = {}
+        for name, type_ in NODE_ATTRIBUTES:
+            attributes[name] = type_(self.attribute(name)[i])
+        return attributes
+
+    def prey(self, node_id):
+        """ Return the node IDs of the prey of a node. """
+        return self._arrays['edge_prey'][self._arrays['edge_predator'] == node_id].tolist()
+
+    def predators(self, node_id):
+        """ Return the node IDs of the predators of a node. """
+        return self._arrays['edge_predator'][self._arrays['edge_prey'] == node_id].tolist()
+
+    def graph(self):
+        """ Return the food web as a networkx DiGraph with edges from prey to
+        predator and species attributes as node data, building it the first
+        time. """
+        if self._graph is None:
+            import networkx as nx
+            graph = nx.DiGraph()
+            graph.add_edges_from(zip(self._arrays['edge_prey'].tolist(),
+                                     self._arrays['edge_predator'].tolist()))
+            for node_id in self.node_ids.tolist():
+                graph.node[node_id].update(self.node_attributes(node_id))
+            self._graph = graph
+        return self._graph
+
+    def table_rows(self, table):
+        """ Return the rows of a species table (a key of TABLE_COLUMNS) as a
+        list of dicts of the columns kept in the artefact, with typed
+        values. """
+        columns = [column for column, _ in TABLE_COLUMNS[table]]
+        values = [self._arrays['table_{}_{}'.format(table, column)].tolist() for column in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+_wob_data = None
+
+
+def get_wob_data():
+    """ Return the WobData for the compiled artefact, loading it the first
+    time. """
+    global _wob_data
+    if _wob_data is None:
+        _wob_data = WobData(load_artefact())
+    return _wob_data
@@ -0,0 +1,355 @@
+"""
+Cached, concurrent dataset workflow
+
+A dataset is built by a graph of tasks, each producing artefacts in a set or
+batch directory:
+
+    generate -> simulate -> summarize    (for each batch)
+    summarize (all batches) -> label     (for the set)
+
+- generate: node-configs.txt from the set's metaparameters.json
+- simulate: biomass-data/ from the node configs, with atn-simulator, packing
+  any CSV output with gzip (HDF5 output is already compressed). Packing is
+  part of the stage so that its stamp records the packed files.
+- summarize: summary.csv and summary.h5, from the HDF5 simulation output
+- label: summary-labeled.h5 in the set directory, from all batch summaries
+
+Each task has an input hash computed from its own parameters, the contents
+of its input files and the output hashes of the tasks it depends on. When a
+task finishes, a stamp file (STAMP_DIR/<stage>.json in its directory) records
+its input hash and the size and modification time of its outputs, and its
+output hash is computed from these. A task is up to date, and skipped, if its
+stamp has the current input hash and its outputs are unchanged. So after
+changing a labelling parameter, only the label task runs again, while a task
+that runs again makes the tasks depending on it run again too.
+
+Tasks whose dependencies are complete run concurrently in worker processes,
+up to a worker limit.
+"""
+
+import os
+import glob
+import gzip
+import json
+import shutil
+import hashlib
+import concurrent.futures
+
+from atntools import catalog
+from atntools import util
+from atntools import nodeconfigs
+from atntools import nodeconfigfiles
+from atntools import simulation
+from atntools import summarize
+from atntools import summaryfiles
+from atntools import labels
+
+STAMP_DIR = '.workflow'
+
+LABELED_SUMMARY_FILE = 'summary-labeled.h5'
+
+
+def file_hash(filename):
+    """ Return the SHA-256 hex digest of a file's contents. """
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _file_state(filename):
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class Task(object):
+    """ A step of a workflow.
+
+    Parameters
+    ----------
+    key : str
+        Unique name of the task
+    stage : str
+        Name of the stage, used for the stamp file name
+    directory : str
+        Directory holding the task's stamp file
+    func : callable
+        Module-level function (so it can run in a worker process) called with
+        `args`, returning the list of output files
+    args : tuple, optional
+        Arguments of `func`
+    deps : list of str, optional
+        Keys of the tasks this task depends on
+    params : dict, optional
+        JSON-serializable parameters hashed into the input hash (besides
+        `args`, which are not hashed since they may hold paths)
+    input_files : list of str, optional
+        Files whose contents are hashed into the input hash
+    """
+
+    def __init__(self, key, stage, directory, func, args=(), deps=(), params=None,
+                 input_files=()):
+        self.key = key
+        self.stage = stage
+        self.directory = directory
+        self.func = func
+        self.args = tuple(args)
+        self.deps = list(deps)
+        self.params = params or {}
+        self.input_files = list(input_files)
+
+    @property
+    def stamp_filename(self):
+        return os.path.join(self.directory, STAMP_DIR, '{}.json'.format(self.stage))
+
+    def input_hash(self, dep_hashes):
+        """ Return the input hash, given the output hashes of the dependencies
+        (by key). """
+        content = json.dumps([
+            self.stage,
+            self.params,
+            [dep_hashes[dep] for dep in self.deps],
+            [file_hash(f) for f in self.input_files],
+        ], sort_keys=True)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def up_to_date_output_hash(self, input_hash):
+        """ Return the output hash recorded in the stamp if the task is up to
+        date with the given input hash, otherwise None. """
+        try:
+            with open(self.stamp_filename) as f:
+                stamp = json.load(f)
+            if stamp['input_hash'] == input_hash and all(
+                    _file_state(filename) == state for filename, state in stamp['outputs']):
+                return stamp['output_hash']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def write_stamp(self, input_hash, outputs):
+        """ Record a run with the given input hash and output files, and
+        return the output hash. """
+        outputs = [[filename, _file_state(filename)] for filename in outputs]
+        content = json.dumps([input_hash, outputs])
+        output_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        os.makedirs(os.path.dirname(self.stamp_filename), exist_ok=True)
+        with open(self.stamp_filename, 'w') as f:
+            json.dump({
+                'input_hash': input_hash,
+                'output_hash': output_hash,
+                'outputs': outputs,
+            }, f, indent=4)
+        return output_hash
+
+    def remove_stamp(self):
+        if os.path.isfile(self.stamp_filename):
+            os.remove(self.stamp_filename)
+
+
+def _call(func, args):
+    return func(*args)
+
+
+def run(tasks, max_workers=1, force=False, log=print):
+    """ Run the tasks that are not up to date, in dependency order.
+
+    Parameters
+    ----------
+    tasks : list of Task
+        Tasks of the workflow (the dependencies of each must be included)
+    max_workers : int, optional
+        Maximum number of tasks to run at once (None: number of CPUs)
+    force : bool, optional
+        Run all tasks, even if up to date
+    log : callable, optional
+        Called with progress messages
+
+    Returns
+    -------
+    dict
+        'ran' or 'skipped' by task key
+
+    Raises
+    ------
+    ValueError
+        If a dependency is missing or there is a cycle
+    """
+    tasks = {task.key: task for task in tasks}
+    for task in tasks.values():
+        for dep in task.deps:
+            if dep not in tasks:
+                raise ValueError("Task {} depends on unknown task {}".format(task.key, dep))
+
+    hashes = {}  # output hashes by key
+    results = {}
+    pending = dict(tasks)
+    running = {}  # key: future; value: (task, input hash)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        while pending or running:
+            # Start or skip every task whose dependencies are done, until
+            # skipping no longer makes more tasks ready
+            ready = True
+            while ready:
+                ready = [key for key, task in pending.items()
+                         if all(dep in results for dep in task.deps)]
+                for key in ready:
+                    task = pending.pop(key)
+                    input_hash = task.input_hash(hashes)
+                    output_hash = None if force else task.up_to_date_output_hash(input_hash)
+                    if output_hash is not None:
+                        hashes[key] = output_hash
+                        results[key] = 'skipped'
+                        log("Up to date: {}".format(key))
+                    else:
+                        # Invalidate the stamp in case the task fails part way
+                        task.remove_stamp()
+                        log("Running: {}".format(key))
+                        future = executor.submit(_call, task.func, task.args)
+                        running[future] = (task, input_hash)
+
+            if not running:
+                if pending:
+                    raise ValueError("Dependency cycle among tasks: {}".format(sorted(pending)))
+                continue
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                task, input_hash = running.pop(future)
+                outputs = future.result()
+                hashes[task.key] = task.write_stamp(input_hash, outputs)
+                results[task.key] = 'ran'
+                log("Finished: {}".format(task.key))
+
+    return results
+
+
+# Stages of the dataset workflow
+
+def generate_stage(metaparameter_file, batch_num, batch_dir):
+    node_config_file = os.path.join(batch_dir, 'node-configs.txt')
+    node_configs = nodeconfigs.generate_node_configs_from_metaparameter_file(
+        metaparameter_file, batch_num=batch_num)
+    nodeconfigfiles.write_node_config_file(node_config_file, node_configs)
+    return [node_config_file, nodeconfigfiles.index_filename(node_config_file)]
+
+
+def _biomass_files(batch_dir):
+    output_dir = os.path.join(batch_dir, 'biomass-data')
+    return sorted(glob.glob(os.path.join(output_dir, '*.h5')) +
+                  glob.glob(os.path.join(output_dir, '*.csv')) +
+                  glob.glob(os.path.join(output_dir, '*.csv.gz')))
+
+
+def pack_biomass_files(batch_dir):
+    """ Gzip the CSV simulation output of a batch, replacing the CSV files,
+    and return the simulation data files. """
+    for filename in glob.glob(os.path.join(batch_dir, 'biomass-data', '*.csv')):
+        with open(filename, 'rb') as f_in, gzip.open(filename + '.gz', 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(filename)
+    return _biomass_files(batch_dir)
+
+
+def simulate_stage(batch_dir, timesteps, simulator_kwargs):
+    output_dir = os.path.join(batch_dir, 'biomass-data')
+    # Remove the output of any earlier run
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.mkdir(output_dir)
+    simulation.atn_batch_simulator(
+        timesteps, os.path.join(batch_dir, 'node-configs.txt'), output_dir, **simulator_kwargs)
+    return pack_biomass_files(batch_dir)
+
+
+def summarize_stage(set_num, batch_num, batch_dir, optional_output_attributes):
+    summary_file = os.path.join(batch_dir, summaryfiles.SUMMARY_CSV)
+    # Only the HDF5 output can be summarized (see simulationdata)
+    summarize.generate_summary_file(
+        set_num, batch_num, summary_file, glob.glob(os.path.join(batch_dir, 'biomass-data', '*.h5')),
+        optional_output_attributes, columnar=True)
+    return [summary_file, summaryfiles.columnar_filename(summary_file)]
+
+
+def label_stage(summary_files, output_file, label_kwargs):
+    labels.assign_labels_streaming(summary_files, output_file, **label_kwargs)
+    return [output_file]
+
+
+def get_batch_dir(set_num, batch_num):
+    """ Return the directory of a batch of a set, creating (and cataloguing)
+    it if it doesn't exist. """
+    set_dir = util.find_set_dir(set_num)
+    if set_dir is None:
+        raise RuntimeError("No directory found for set {}".format(set_num))
+    batch_dir = os.path.join(set_dir, 'batch-{}'.format(batch_num))
+    if not os.path.isdir(batch_dir):
+        with catalog.connect() as conn, catalog.transaction(conn):
+            os.makedirs(batch_dir, exist_ok=True)
+            catalog.add_batch(conn, set_num, batch_num, batch_dir)
+    return batch_dir
+
+
+def dataset_tasks(set_num, num_batches, timesteps, simulator_kwargs=None,
+                  optional_output_attributes=('environment_score_slope',), label_kwargs=None):
+    """ Build the tasks of the dataset workflow for a set (see module docstring).
+
+    Parameters
+    ----------
+    set_num : int
+        Set number (the set directory, with metaparameters.json, must exist)
+    num_batches : int
+        Number of batches (batch-0 to batch-<num_batches - 1>, created if
+        they don't exist)
+    timesteps : int
+        Maximum number of timesteps to run the simulations
+    simulator_kwargs : dict, optional
+        Other arguments to simulation.atn_batch_simulator()
+    optional_output_attributes : list of str, optional
+        Optional summary attributes (see summarize.get_output_attributes()).
+        The default includes the environment score slope used for labels.
+    label_kwargs : dict, optional
+        Arguments to labels.assign_labels_streaming(). The label prefix
+        defaults to 'environment_score_slope', the summary column.
+
+    Returns
+    -------
+    list of Task
+    """
+    simulator_kwargs = dict(simulator_kwargs or {})
+    optional_output_attributes = list(optional_output_attributes)
+    label_kwargs = dict(label_kwargs or {})
+    label_kwargs.setdefault('label_prefix', 'environment_score_slope')
+    set_dir = util.find_set_dir(set_num)
+    if set_dir is None:
+        raise RuntimeError("No directory found for set {}".format(set_num))
+    metaparameter_file = os.path.join(set_dir, 'metaparameters.json')
+
+    tasks = []
+    summary_files = []
+    for batch_num in range(num_batches):
+        batch_dir = get_batch_dir(set_num, batch_num)
+        prefix = 'set-{}/batch-{}/'.format(set_num, batch_num)
+        tasks.append(Task(
+            prefix + 'generate', 'generate', batch_dir, generate_stage,
+            (metaparameter_file, batch_num, batch_dir),
+            params={'batch_num': batch_num}, input_files=[metaparameter_file]))
+        tasks.append(Task(
+            prefix + 'simulate', 'simulate', batch_dir, simulate_stage,
+            (batch_dir, timesteps, simulator_kwargs), deps=[prefix + 'generate'],
+            params={'timesteps': timesteps, 'simulator_kwargs': simulator_kwargs}))
+        tasks.append(Task(
+            prefix + 'summarize', 'summarize', batch_dir, summarize_stage,
+            (set_num, batch_num, batch_dir, optional_output_attributes),
+            deps=[prefix + 'simulate'],
+            params={'set_num': set_num, 'batch_num': batch_num,
+                    'optional_output_attributes': optional_output_attributes}))
+        summary_files.append(os.path.join(batch_dir, summaryfiles.SUMMARY_CSV))
+
+    tasks.append(Task(
+        'set-{}/label'.format(set_num), 'label', set_dir, label_stage,
+        (summary_files, os.path.join(set_dir, LABELED_SUMMARY_FILE), label_kwargs),
+        deps=[task.key for task in tasks if task.stage == 'summarize'],
+        params={'label_kwargs': label_kwargs}))
+    return tasks
@@ -1,37 +1,25 @@
 #!/usr/bin/env python3
 
 """ Generates a labeled feature file from the given feature file(s).
+
+The input files are streamed in chunks, so they may be larger than memory.
 """
 
 import argparse
 
-import pandas as pd
-
-from atntools.labels import remove_ugly_instances, assign_labels
+from atntools.labels import assign_labels_streaming
+from atntools.summaryfiles import READ_CHUNK_SIZE
 
 parser = argparse.ArgumentParser(description=globals()['__doc__'])
 parser.add_argument('input_files', nargs='+', help="Unlabeled feature file(s)")
-parser.add_argument('output_file', help="Labeled feature file (output)")
+parser.add_argument('output_file', help="Labeled feature file (output; columnar HDF5 if it ends with .h5)")
+parser.add_argument('--chunk-size', type=int, default=READ_CHUNK_SIZE,
+                    help="Number of rows to process at a time (default: %(default)s)")
+parser.add_argument('--quantiles', type=float, nargs=2, default=[0.25, 0.75], metavar=('LOW', 'HIGH'),
+                    help="Label values at or below the LOW quantile 'bad' and at or above the HIGH "
+                         "quantile 'good' (default: %(default)s)")
 args = parser.parse_args()
 
-# Read the input files into DataFrame df
-df = None
-for fname in args.input_files:
-    if df is None:
-        df = pd.read_csv(fname)
-        columns = df.columns  # For fixing column order later
-    else:
-        df = df.append(pd.read_csv(fname))
-
-# Order columns according to the first CSV
-df = df[columns]
-
-df = remove_ugly_instances(df)
-
 # Assign labels based on environment score slope features
-for col in df.columns:
-    if col.startswith('environmentScoreSlope'):
-        assign_labels(df, col)
-
-# Save the result
-df.to_csv(args.output_file, index=False)
+assign_labels_streaming(args.input_files, args.output_file, chunk_size=args.chunk_size,
+                        quantiles=tuple(args.quantiles))
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+""" Rebuilds or lists the catalog of food web, set, batch and sequence
+directories under DATA_HOME. """
+
+import sys
+import argparse
+
+from atntools import catalog
+
+parser = argparse.ArgumentParser(description=globals()['__doc__'])
+subparsers = parser.add_subparsers(dest='subparser_name')
+subparsers.add_parser('rebuild', help="Rebuild the catalog from the directories on disk")
+subparsers.add_parser('sets', help="List set numbers, food web IDs and set directories")
+subparsers.add_parser('food-webs', help="List food web IDs and directories")
+subparsers.add_parser('conflicts', help="List set directories left out because of duplicate set numbers")
+args = parser.parse_args()
+
+if args.subparser_name == 'rebuild':
+    catalog.rebuild()
+elif args.subparser_name == 'sets':
+    for set_num, food_web_id, set_dir in catalog.list_sets():
+        print('{}\t{}\t{}'.format(set_num, food_web_id or '', set_dir))
+elif args.subparser_name == 'conflicts':
+    for set_num, set_dir in catalog.list_set_conflicts():
+        print('{}\t{}'.format(set_num, set_dir))
+elif args.subparser_name == 'food-webs':
+    for food_web_id, food_web_dir in catalog.list_food_webs():
+        print('{}\t{}'.format(food_web_id, food_web_dir))
+else:
+    parser.print_usage()
+    sys.exit(1)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+""" Enumerates (or counts) every connected predator-complete sub-web of the
+Serengeti food web with the given number of species and basal species.
+
+As in 'atn-generate-food-web.py generate', Decaying Material (node 1) is left
+out, and so are the animals that eat only Decaying Material, which would have
+no prey. Food web IDs are written one per line.
+"""
+
+import sys
+import argparse
+
+from atntools import foodwebs
+from atntools import subwebs
+
+parser = argparse.ArgumentParser(description=globals()['__doc__'])
+parser.add_argument('size', type=int, help="Number of species")
+parser.add_argument('num_basal_species', type=int, help="Number of basal species")
+parser.add_argument('-o', '--output-file', help="Output file (default: standard output)")
+parser.add_argument('--count-only', action='store_true', help="Only print the number of sub-webs")
+parser.add_argument('--shard', nargs=2, type=int, metavar=('SHARD', 'NUM_SHARDS'),
+                    help="Enumerate only the given shard (0 to NUM_SHARDS - 1) of the sub-webs")
+parser.add_argument('-p', '--processes', type=int,
+                    help="Enumerate in parallel with this many processes (0: number of CPUs)")
+parser.add_argument('--allow-lonely-plant-eaters', action='store_true',
+                    help="Include sub-webs that are not predator-complete")
+args = parser.parse_args()
+
+serengeti = foodwebs.get_serengeti()
+seed_nodes = foodwebs.serengeti_seed_nodes(serengeti)
+graph = serengeti.subgraph([node for node in serengeti.nodes() if node != 1])
+# Source nodes are those of the full food web (see subwebs.BitsetFoodWeb)
+options = {'require_predators': not args.allow_lonely_plant_eaters, 'full_graph': serengeti}
+
+if args.processes is not None:
+    if args.shard is not None:
+        print("Error: --shard and --processes are mutually exclusive", file=sys.stderr)
+        sys.exit(1)
+    if args.output_file is None and not args.count_only:
+        print("Error: --processes requires --output-file or --count-only", file=sys.stderr)
+        sys.exit(1)
+    count = subwebs.enumerate_subwebs_parallel(
+        graph, args.size, seed_nodes, args.num_basal_species,
+        filename=None if args.count_only else args.output_file,
+        processes=args.processes or None, **options)
+    print(count)
+    sys.exit(0)
+
+if args.shard is not None:
+    options['shard'], options['num_shards'] = args.shard
+
+if args.count_only:
+    print(subwebs.count_subwebs(graph, args.size, seed_nodes, args.num_basal_species, **options))
+elif args.output_file is not None:
+    count = subwebs.write_subwebs(args.output_file, graph, args.size, seed_nodes,
+                                  args.num_basal_species, **options)
+    print(count)
+else:
+    for node_ids in subwebs.enumerate_subwebs(graph, args.size, seed_nodes,
+                                              args.num_basal_species, **options):
+        print('-'.join(map(str, node_ids)))
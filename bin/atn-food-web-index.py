@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+""" Updates the index of food web properties under DATA_HOME and prints it,
+or the food webs matching a query.
+
+Example: atn-food-web-index.py -q 'num_species == 5 and num_basal == 2 and max_chain_length == 3'
+"""
+
+import argparse
+
+from atntools import foodwebindex
+
+parser = argparse.ArgumentParser(description=globals()['__doc__'],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('-q', '--query', help="pandas query expression on the index columns")
+parser.add_argument('--rebuild', action='store_true',
+                    help="Recompute the properties of all food webs")
+parser.add_argument('--ids-only', action='store_true', help="Print only the food web IDs")
+args = parser.parse_args()
+
+index = foodwebindex.update_index(rebuild=args.rebuild)
+if args.query:
+    index = index.query(args.query)
+
+if args.ids_only:
+    for food_web_id in index['food_web_id']:
+        print(food_web_id)
+else:
+    print(index.to_string(index=False))
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+""" Generates a labeled dataset for a set: node configs, simulations, packed
+simulation data and a summary for each batch, then labels for the set.
+
+Only the stages whose inputs changed since they last ran are run again (see
+atntools.workflow), and independent batches run concurrently.
+"""
+
+import argparse
+
+from atntools import workflow
+
+parser = argparse.ArgumentParser(description=globals()['__doc__'])
+parser.add_argument('set_number', type=int, help="Set number (set directory must exist under DATA_HOME)")
+parser.add_argument('timesteps', type=int, help="Number of time steps to run the simulations")
+parser.add_argument('-b', '--batches', type=int, default=1, help="Number of batches")
+parser.add_argument('-j', '--jobs', type=int, default=1,
+                    help="Maximum number of stages to run at once (0: number of CPUs)")
+parser.add_argument('-f', '--force', action='store_true', help="Run all stages, even if up to date")
+parser.add_argument('--no-record-biomass', action='store_true')
+parser.add_argument('--no-stop-on-steady-state', action='store_true')
+parser.add_argument('--label-prefix', default='environment_score_slope',
+                    help="Label the summary columns starting with this prefix")
+parser.add_argument('--keep-ugly', action='store_true',
+                    help="Don't remove badly-behaved simulations before labeling")
+parser.add_argument('--label-quantiles', type=float, nargs=2, default=[0.25, 0.75],
+                    metavar=('LOW', 'HIGH'),
+                    help="Label values at or below the LOW quantile 'bad' and at or above the HIGH "
+                         "quantile 'good' (default: %(default)s)")
+args = parser.parse_args()
+
+simulator_kwargs = {
+    'no_record_biomass': args.no_record_biomass,
+    'no_stop_on_steady_state': args.no_stop_on_steady_state,
+}
+label_kwargs = {
+    'label_prefix': args.label_prefix,
+    'remove_ugly': not args.keep_ugly,
+    'quantiles': args.label_quantiles,
+}
+
+tasks = workflow.dataset_tasks(args.set_number, args.batches, args.timesteps,
+                               simulator_kwargs=simulator_kwargs, label_kwargs=label_kwargs)
+workflow.run(tasks, max_workers=args.jobs or None, force=args.force)
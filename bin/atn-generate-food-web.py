@@ -28,10 +28,15 @@ subparsers = parser.add_subparsers(dest='subparser_name')
 parser_generate = subparsers.add_parser('generate', help="Generate a new food web and save plot and JSON")
 parser_generate.add_argument('size', type=int, help="Number of species")
 parser_generate.add_argument('num_basal_species', type=int, help="Number of basal species")
+parser_generate.add_argument('--count', type=int, default=1,
+                             help="Number of distinct food webs to generate")
 
 # 'regenerate' sub-command
-parser_regenerate = subparsers.add_parser('regenerate', help="Regenerate files in existing food web directory")
-parser_regenerate.add_argument('existing_dir', help="Existing food web directory")
+parser_regenerate = subparsers.add_parser('regenerate', help="Regenerate files in existing food web directories")
+parser_regenerate.add_argument('existing_dirs', nargs='+', metavar='existing_dir',
+                               help="Existing food web directory")
+parser_regenerate.add_argument('-p', '--processes', type=int,
+                               help="Number of processes drawing plots (default: number of CPUs)")
 
 # 'from-node-ids' sub-command
 parser_from_node_ids = subparsers.add_parser('from-node-ids', help="Generate plot and JSON from given node IDs")
@@ -44,45 +49,55 @@ if not args.subparser_name:
     parser.print_usage()
     sys.exit(1)
 
-if args.subparser_name == 'generate':
 
-    subweb = foodwebs.serengeti_predator_complete_subweb(args.size, args.num_basal_species)
-    node_ids = sorted(subweb.nodes())
-    food_web_id = '-'.join([str(x) for x in node_ids])
+def get_new_food_web_dir(food_web_id):
     if args.parent_dir is None:
         food_web_dir = util.get_food_web_dir(food_web_id)
     else:
         food_web_dir = os.path.join(os.path.expanduser(args.parent_dir), food_web_id)
     print("Creating food web directory " + food_web_dir)
     os.makedirs(food_web_dir)
+    return food_web_dir
 
-elif args.subparser_name == 'regenerate':
 
-    food_web_dir = os.path.normpath(args.existing_dir)
-    if not os.path.isdir(food_web_dir):
-        print("Error: directory doesn't exist: " + food_web_dir, file=sys.stderr)
+if args.subparser_name == 'generate':
+
+    serengeti = foodwebs.get_serengeti()
+    generated = 0
+    for node_ids in foodwebs.serengeti_predator_complete_subwebs(
+            args.size, args.num_basal_species, args.count):
+        food_web_id = '-'.join([str(x) for x in node_ids])
+        food_web_dir = get_new_food_web_dir(food_web_id)
+        foodwebs.write_food_web_files(serengeti.subgraph(node_ids), food_web_dir,
+                                      figsize=args.figsize, dpi=args.dpi)
+        generated += 1
+    if generated < args.count:
+        print("Error: generated only {} of {} food webs".format(generated, args.count),
+              file=sys.stderr)
         sys.exit(1)
-    food_web_id = os.path.basename(food_web_dir)
-    node_ids = [int(x) for x in food_web_id.split('-')]
-    serengeti = foodwebs.read_serengeti()
-    subweb = serengeti.subgraph(node_ids)
+
+elif args.subparser_name == 'regenerate':
+
+    food_web_dirs = [os.path.normpath(d) for d in args.existing_dirs]
+    for food_web_dir in food_web_dirs:
+        if not os.path.isdir(food_web_dir):
+            print("Error: directory doesn't exist: " + food_web_dir, file=sys.stderr)
+            sys.exit(1)
+
+    serengeti = foodwebs.get_serengeti()
+    for food_web_dir in food_web_dirs:
+        food_web_id = os.path.basename(food_web_dir)
+        node_ids = [int(x) for x in food_web_id.split('-')]
+        foodwebs.write_food_web_files(serengeti.subgraph(node_ids), food_web_dir, draw=False)
+
+    foodwebs.draw_food_web_dirs(food_web_dirs, processes=args.processes,
+                                figsize=args.figsize, dpi=args.dpi)
 
 elif args.subparser_name == 'from-node-ids':
 
     node_ids = sorted(args.node_ids)
     serengeti = foodwebs.read_serengeti()
-    subweb = serengeti.subgraph(node_ids)
     food_web_id = '-'.join([str(x) for x in node_ids])
-    if args.parent_dir is None:
-        food_web_dir = util.get_food_web_dir(food_web_id)
-    else:
-        food_web_dir = os.path.join(os.path.expanduser(args.parent_dir), food_web_id)
-    print("Creating food web directory " + food_web_dir)
-    os.makedirs(food_web_dir)
-
-foodwebs.draw_food_web(subweb, show_legend=True,
-                       output_file=os.path.join(food_web_dir, 'foodweb.{}.png'.format(food_web_id)),
-                       figsize=args.figsize, dpi=args.dpi)
-
-with open(os.path.join(food_web_dir, 'foodweb.{}.json'.format(food_web_id)), 'w') as f:
-    print(foodwebs.food_web_json(subweb), file=f)
+    food_web_dir = get_new_food_web_dir(food_web_id)
+    foodwebs.write_food_web_files(serengeti.subgraph(node_ids), food_web_dir,
+                                  figsize=args.figsize, dpi=args.dpi)
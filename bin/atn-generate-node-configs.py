@@ -5,19 +5,21 @@
 import sys
 import argparse
 
-from atntools import nodeconfigs
+from atntools import nodeconfigs, nodeconfigfiles
 
 parser = argparse.ArgumentParser(description=globals()['__doc__'])
 parser.add_argument('metaparameter_file', help="metaparameter JSON file")
 parser.add_argument('output_file', help="output file")
 parser.add_argument('-w', '--food-web-file', help="food web JSON file; overrides node IDs in metaparameter file")
+parser.add_argument('--start', type=int, default=0,
+                    help="index of the first node config to generate (for generating a set in shards)")
+parser.add_argument('--stop', type=int, help="index after the last node config to generate")
 args = parser.parse_args()
 
-generator = nodeconfigs.generate_node_configs_from_metaparameter_file(args.metaparameter_file, args.food_web_file)
+generator = nodeconfigs.generate_node_configs_from_metaparameter_file(
+    args.metaparameter_file, args.food_web_file, start=args.start, stop=args.stop)
 if generator is None:
     print("Error processing metaparameter file", file=sys.stderr)
     sys.exit(1)
 
-with open(args.output_file, 'w') as f:
-    for node_config in generator:
-        print(node_config, file=f)
\ No newline at end of file
+nodeconfigfiles.write_node_config_file(args.output_file, generator)
\ No newline at end of file
@@ -13,11 +13,15 @@ parser.add_argument('batch_number', type=int)
 parser.add_argument(
     '--optional',
     nargs='*',
-    choices=['environment_score_slope', 'environment_score_slope_skip200'],
+    choices=['environment_score_slope', 'environment_score_slope_skip200', 'oscillation'],
     help="List of optional output attributes to include")
+parser.add_argument(
+    '--columnar', action='store_true',
+    help="Also write a columnar HDF5 summary file (summary.h5)")
 args = parser.parse_args()
 
 generate_summary_file_for_batch(
     args.set_number,
     args.batch_number,
-    args.optional)
+    args.optional,
+    args.columnar)
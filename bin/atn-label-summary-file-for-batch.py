@@ -10,7 +10,7 @@ import argparse
 
 import pandas as pd
 
-from atntools import util
+from atntools import util, summaryfiles, featureexport
 
 parser = argparse.ArgumentParser(description=globals()['__doc__'])
 parser.add_argument('set_number', type=int)
@@ -18,32 +18,44 @@ parser.add_argument('batch_number', type=int)
 parser.add_argument('measure_col')
 parser.add_argument('bad_threshold', type=float)
 parser.add_argument('good_threshold', type=float)
+parser.add_argument('--format', choices=['arff', 'sparse-arff', 'matrix'], default='arff',
+                    help="Output format: dense or sparse ARFF (summary-labeled.arff), "
+                         "or binary feature matrix (summary-labeled.features.h5)")
+parser.add_argument('--labeled-csv', action='store_true',
+                    help="Also save all rows and columns of the summary file, with labels, "
+                         "as summary-labeled.csv")
 args = parser.parse_args()
 
-# Read summary file
 batch_dir = util.find_batch_dir(args.set_number, args.batch_number)
-summary_file = os.path.join(batch_dir, 'summary.csv')
-df = pd.read_csv(summary_file)
-
-# Assign labels based on assigned threshold
-df.loc[df[args.measure_col] <= args.bad_threshold, 'class'] = 'bad'
-df.loc[df[args.measure_col] >= args.good_threshold, 'class'] = 'good'
-
-# Save CSV file including all rows and columns from summary file
-labeled_summary_file = os.path.join(batch_dir, 'summary-labeled.csv')
-df.to_csv(labeled_summary_file, index=False)
-
-# Drop unlabeled rows, and keep only the columns we're using for classification
-df = df[[col for col in df.columns
-         if col.startswith('X')
-         or col.startswith('K')
-         or col == 'class']]
-df.dropna(axis=0, subset=['class'], inplace=True)
-
-labeled_summary_file = os.path.join(batch_dir, 'summary-labeled.arff')
-util.dataframe_to_arff(
-    df,
-    relation_name='summary-labeled',
-    class_column='class',
-    class_values=['bad', 'good'],
-    filename=labeled_summary_file)
+summary_file = os.path.join(batch_dir, summaryfiles.SUMMARY_CSV)
+class_values = ['bad', 'good']
+
+
+def label(chunk):
+    """ Assign labels based on the thresholds """
+    labels = pd.Series(None, index=chunk.index, dtype=object)
+    labels[chunk[args.measure_col] <= args.bad_threshold] = 'bad'
+    labels[chunk[args.measure_col] >= args.good_threshold] = 'good'
+    chunk['class'] = labels
+    return chunk
+
+
+if args.labeled_csv:
+    header = True
+    with open(os.path.join(batch_dir, 'summary-labeled.csv'), 'w') as f:
+        for chunk in summaryfiles.iter_summary_chunks(summary_file):
+            label(chunk).to_csv(f, header=header, index=False)
+            header = False
+
+# Read only the columns we're using for classification
+features = featureexport.feature_columns(summaryfiles.summary_columns(summary_file))
+chunks = summaryfiles.iter_summary_chunks(
+    summary_file, columns=features + [c for c in [args.measure_col] if c not in features])
+
+if args.format == 'matrix':
+    output_file = os.path.join(batch_dir, 'summary-labeled.features.h5')
+else:
+    output_file = os.path.join(batch_dir, 'summary-labeled.arff')
+featureexport.export_features(
+    (label(chunk) for chunk in chunks), output_file, features, 'class', class_values,
+    file_format=args.format, relation_name='summary-labeled')
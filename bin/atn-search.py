@@ -21,6 +21,15 @@ parser_regenerate = subparsers.add_parser('iterate', help="Run a search iteratio
 parser_regenerate.add_argument('sequence_num', type=int, help="Search sequence number")
 parser_regenerate.add_argument('--store-biomass', action='store_true',
                                help="Store biomass data in output files")
+parser_regenerate.add_argument('--prescreen', action='store_true',
+                               help="Skip node configs that the previous iteration's classifier "
+                                    "confidently predicts to be bad")
+parser_regenerate.add_argument('--prescreen-confidence', type=float,
+                               default=searchprocess.PRESCREEN_CONFIDENCE,
+                               help="Minimum predicted probability of 'bad' for skipping a node config")
+parser_regenerate.add_argument('--exploration-fraction', type=float,
+                               default=searchprocess.PRESCREEN_EXPLORATION_FRACTION,
+                               help="Fraction of skippable node configs to simulate anyway")
 
 args = parser.parse_args()
 
@@ -36,4 +45,6 @@ if args.subparser_name == 'start':
 
 elif args.subparser_name == 'iterate':
     searchprocess.do_iteration(
-        args.sequence_num, no_record_biomass=(not args.store_biomass))
+        args.sequence_num, no_record_biomass=(not args.store_biomass),
+        prescreen=args.prescreen, prescreen_confidence=args.prescreen_confidence,
+        exploration_fraction=args.exploration_fraction)
@@ -0,0 +1,12 @@
+import pytest
+
+from atntools import wobdata
+
+
+@pytest.fixture(autouse=True, scope='session')
+def cache_dir(tmpdir_factory):
+    """ Keep the tests from writing to the user's cache directory. """
+    original = wobdata.CACHE_DIR
+    wobdata.CACHE_DIR = str(tmpdir_factory.mktemp('cache'))
+    yield wobdata.CACHE_DIR
+    wobdata.CACHE_DIR = original
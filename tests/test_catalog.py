@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import multiprocessing
+
+import pytest
+
+from atntools import settings
+from atntools import catalog
+from atntools import util
+from atntools import searchprocess
+
+directories = [
+    '5-species/1-2-3-4-5/set-0/batch-0',
+    '5-species/1-2-3-4-5/set-0/batch-1',
+    '5-species/1-2-3-4-5/set-1',
+    '5-species/1-2-3-4-5/biomass-data',
+    '6-species/1-2-3-4-5-6/set-3',
+    'old/set-2',
+    'sequences/sequence-0',
+    'sequences/sequence-4',
+    'sequences/cvg-sequence-1',
+]
+
+
+@pytest.fixture()
+def fake_data_home(monkeypatch, tmpdir):
+    for directory in directories:
+        os.makedirs(os.path.join(str(tmpdir), directory))
+    monkeypatch.setattr(settings, 'DATA_HOME', str(tmpdir))
+
+
+def test_build(fake_data_home):
+    data_home = settings.DATA_HOME
+    assert catalog.list_sets() == [
+        (0, '1-2-3-4-5', os.path.join(data_home, '5-species/1-2-3-4-5/set-0')),
+        (1, '1-2-3-4-5', os.path.join(data_home, '5-species/1-2-3-4-5/set-1')),
+        (2, None, os.path.join(data_home, 'old/set-2')),
+        (3, '1-2-3-4-5-6', os.path.join(data_home, '6-species/1-2-3-4-5-6/set-3')),
+    ]
+    assert catalog.list_food_webs() == [
+        ('1-2-3-4-5', os.path.join(data_home, '5-species/1-2-3-4-5')),
+        ('1-2-3-4-5-6', os.path.join(data_home, '6-species/1-2-3-4-5-6')),
+    ]
+    assert catalog.get_max_set_number() == 3
+    assert catalog.get_max_sequence_number('search') == 4
+    assert catalog.get_max_sequence_number('convergence') == 1
+    with catalog.connect() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM batches').fetchone()[0] == 2
+
+
+def test_find_set_dir(fake_data_home):
+    assert catalog.find_set_dir(2) == os.path.join(settings.DATA_HOME, 'old/set-2')
+    assert catalog.find_set_dir(99) is None
+
+    # Directories created or moved behind the catalog's back are found by
+    # rebuilding it
+    os.makedirs(os.path.join(settings.DATA_HOME, '5-species/1-2-3-4-5/set-99'))
+    assert catalog.find_set_dir(99) == os.path.join(settings.DATA_HOME, '5-species/1-2-3-4-5/set-99')
+    os.rename(os.path.join(settings.DATA_HOME, 'old/set-2'),
+              os.path.join(settings.DATA_HOME, '6-species/1-2-3-4-5-6/set-2'))
+    assert catalog.find_set_dir(2) == os.path.join(settings.DATA_HOME, '6-species/1-2-3-4-5-6/set-2')
+
+
+def test_create_dirs(fake_data_home):
+    food_web_dir = util.get_food_web_dir('1-2-3-4-5')
+    with open(os.path.join(food_web_dir, 'foodweb.1-2-3-4-5.json'), 'w') as f:
+        f.write('{"node_ids": [1, 2, 3, 4, 5]}')
+    set_num, set_dir = util.create_set_dir('1-2-3-4-5', {'generator': 'uniform', 'args': {}})
+    assert set_num == 4
+    batch_num, batch_dir = util.create_batch_dir(set_num)
+    assert batch_num == 0
+
+    with catalog.connect() as conn:
+        assert conn.execute('SELECT path FROM sets WHERE set_num = 4').fetchone()[0] == \
+            os.path.relpath(set_dir, settings.DATA_HOME)
+        assert conn.execute('SELECT path FROM batches WHERE set_num = 4').fetchone()[0] == \
+            os.path.relpath(batch_dir, settings.DATA_HOME)
+        rows = conn.execute('SELECT * FROM sets ORDER BY set_num').fetchall()
+
+    # Rebuilding from disk gives the same catalog
+    catalog.rebuild()
+    with catalog.connect() as conn:
+        assert conn.execute('SELECT * FROM sets ORDER BY set_num').fetchall() == rows
+
+
+def allocate(data_home, count):
+    settings.DATA_HOME = data_home
+    allocated = []
+    for i in range(count):
+        set_num, set_dir = util.create_set_dir('1-2-3-4-5', {'generator': 'uniform', 'args': {}})
+        batch_num, _ = util.create_batch_dir(0)
+        sequence_num, _ = searchprocess.create_sequence_dir()
+        allocated.append((set_num, batch_num, sequence_num))
+    return allocated
+
+
+def test_concurrent_allocation(fake_data_home):
+    food_web_dir = util.get_food_web_dir('1-2-3-4-5')
+    with open(os.path.join(food_web_dir, 'foodweb.1-2-3-4-5.json'), 'w') as f:
+        f.write('{"node_ids": [1, 2, 3, 4, 5]}')
+    # Set directories the catalog doesn't know about, in this food web and
+    # in another one
+    catalog.rebuild()
+    os.makedirs(os.path.join(food_web_dir, 'set-5'))
+    os.makedirs(os.path.join(util.get_food_web_dir('1-2-3-4-5-6'), 'set-7'))
+
+    num_processes = 8
+    count = 5
+    with multiprocessing.Pool(num_processes) as pool:
+        results = pool.starmap(allocate, [(settings.DATA_HOME, count)] * num_processes)
+    set_nums, batch_nums, sequence_nums = zip(*[a for result in results for a in result])
+
+    total = num_processes * count
+    assert sorted(set_nums) == [4, 6] + list(range(8, total + 6))
+    assert sorted(batch_nums) == list(range(2, total + 2))
+    assert sorted(sequence_nums) == list(range(5, total + 5))
+    assert [s[0] for s in catalog.list_sets()] == sorted((0, 1, 2, 3) + set_nums)
+    catalog.rebuild()
+    assert [s[0] for s in catalog.list_sets()] == sorted((0, 1, 2, 3, 5, 7) + set_nums)
+
+
+def test_duplicate_set_number(fake_data_home):
+    # A set number is never catalogued twice
+    with catalog.connect() as conn:
+        with pytest.raises(sqlite3.IntegrityError):
+            catalog.add_set(conn, 1, os.path.join(settings.DATA_HOME, '6-species/1-2-3-4-5-6/set-1'))
+
+
+def test_duplicate_set_directories(fake_data_home):
+    # Directories on disk with the same set number: the first by path is
+    # catalogued, the other is recorded as a conflict
+    data_home = settings.DATA_HOME
+    os.makedirs(os.path.join(data_home, '6-species/1-2-3-4-5-6/set-1/batch-0'))
+    # The catalog is built when first opened
+    with pytest.warns(UserWarning):
+        assert catalog.find_set_dir(1) == os.path.join(data_home, '5-species/1-2-3-4-5/set-1')
+    assert catalog.list_set_conflicts() == [(1, os.path.join(data_home, '6-species/1-2-3-4-5-6/set-1'))]
+    assert [s[0] for s in catalog.list_sets()] == [0, 1, 2, 3]
+    with catalog.connect() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM batches WHERE set_num = 1').fetchone()[0] == 0
+
+
+def test_find_set_dir_rescans(fake_data_home, monkeypatch):
+    catalog.list_sets()
+    scans = []
+    scan_data_home = catalog.scan_data_home
+    monkeypatch.setattr(catalog, 'scan_data_home', lambda: scans.append(1) or scan_data_home())
+
+    # Missing sets rebuild the catalog only once per process
+    assert catalog.find_set_dir(99) is None
+    assert catalog.find_set_dir(98) is None
+    assert len(scans) == 1
+
+    # Set directories in food web directories are found without rebuilding
+    os.makedirs(os.path.join(settings.DATA_HOME, '6-species/1-2-3-4-5-6/set-97/batch-2'))
+    assert catalog.find_set_dir(97) == os.path.join(settings.DATA_HOME, '6-species/1-2-3-4-5-6/set-97')
+    assert len(scans) == 1
+    with catalog.connect() as conn:
+        assert conn.execute('SELECT batch_num FROM batches WHERE set_num = 97').fetchall() == [(2,)]
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from atntools import summaryfiles
+from atntools import featureexport
+from atntools import util
+
+
+def make_labeled():
+    return pd.DataFrame({
+        'K5': [1000.0, 0.0, 3000.0, 4000.0],
+        'X14': [0.1, 0.0, np.nan, 0.0],
+        'class': ['good', 'bad', None, 'bad'],
+    }, columns=['K5', 'X14', 'class'])
+
+
+def read_data_lines(filename):
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    return lines[lines.index('@DATA') + 1:], lines[:lines.index('@DATA')]
+
+
+def test_feature_columns():
+    columns = ['sim_number', 'K5', 'X14', 'initialBiomass5', 'Xbar', 'extinction_5']
+    assert featureexport.feature_columns(columns) == ['K5', 'X14']
+
+
+def test_arff(tmpdir):
+    df = make_labeled()
+    filename = os.path.join(str(tmpdir), 'dense.arff')
+    util.dataframe_to_arff(df, 'test', 'class', ['bad', 'good'], filename, chunk_size=3)
+    data, header = read_data_lines(filename)
+    assert header[:5] == ['@RELATION test', '', '@ATTRIBUTE K5 NUMERIC', '@ATTRIBUTE X14 NUMERIC',
+                          '@ATTRIBUTE class {bad,good}']
+    assert data == ['1000.0,0.1,good', '0.0,0.0,bad', '3000.0,?,?', '4000.0,0.0,bad']
+
+    filename = os.path.join(str(tmpdir), 'sparse.arff')
+    count = featureexport.export_features([df[:2], df[2:]], filename, ['K5', 'X14'], 'class',
+                                          ['bad', 'good'], file_format='sparse-arff')
+    assert count == 3
+    data, _ = read_data_lines(filename)
+    assert data == ['{0 1000.0,1 0.1,2 good}', '{2 bad}', '{0 4000.0,2 bad}']
+
+
+def test_feature_matrix(tmpdir):
+    summary = pd.DataFrame({
+        'sim_number': np.arange(10),
+        'K5': np.arange(10) * 100.0,
+        'X14': np.linspace(0, 1, 10),
+        'extinction_count': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    }, columns=['sim_number', 'K5', 'X14', 'extinction_count'])
+    summary_file = os.path.join(str(tmpdir), 'summary.h5')
+    summaryfiles.write_summary_hdf5(summary, summary_file)
+
+    features = featureexport.feature_columns(summaryfiles.summary_columns(summary_file))
+    assert features == ['K5', 'X14']
+
+    def labeled(chunks):
+        for chunk in chunks:
+            assert list(chunk.columns) == ['K5', 'X14', 'extinction_count']
+            chunk['class'] = None
+            chunk.loc[chunk['extinction_count'] <= 2, 'class'] = 'good'
+            chunk.loc[chunk['extinction_count'] >= 7, 'class'] = 'bad'
+            yield chunk
+
+    chunks = summaryfiles.iter_summary_chunks(summary_file, columns=features + ['extinction_count'],
+                                              chunk_size=4)
+    filename = os.path.join(str(tmpdir), 'features.h5')
+    count = featureexport.export_features(labeled(chunks), filename, features, 'class',
+                                          ['bad', 'good'], file_format='matrix')
+    assert count == 6
+    X, y, feature_names, class_values = featureexport.read_feature_matrix(filename)
+    assert X.dtype == np.float32
+    assert X.shape == (6, 2)
+    assert np.allclose(X[:, 0], [0, 100, 200, 700, 800, 900])
+    assert list(y) == [1, 1, 1, 0, 0, 0]
+    assert feature_names == ['K5', 'X14']
+    assert class_values == ['bad', 'good']
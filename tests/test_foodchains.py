@@ -0,0 +1,73 @@
+import networkx as nx
+import pytest
+
+from atntools import foodwebs
+from atntools import foodchains
+
+
+def brute_force_lengths(graph):
+    longest = {node: 0 for node in graph.nodes()}
+    shortest = {node: None for node in graph.nodes()}
+    counts = {node: 0 for node in graph.nodes()}
+    for source in foodwebs.get_source_nodes(graph):
+        shortest[source] = 0
+    for chain in foodwebs.get_food_chains(graph):
+        node = chain[-1]
+        length = len(chain) - 1
+        longest[node] = max(longest[node], length)
+        if shortest[node] is None or length < shortest[node]:
+            shortest[node] = length
+        counts[node] += 1
+    return longest, shortest, counts
+
+
+def test_serengeti_subweb():
+    node_ids = [3, 4, 5, 7, 13, 30, 31, 42, 45, 49, 50, 51, 52, 53, 57, 65, 72, 74, 75, 85]
+    subweb = foodwebs.get_serengeti().subgraph(node_ids)
+    longest, shortest, counts = brute_force_lengths(subweb)
+    assert foodchains.longest_chain_lengths(subweb) == longest
+    assert foodchains.shortest_chain_lengths(subweb) == shortest
+    if any(len(c) > 1 for c in nx.strongly_connected_components(subweb)):
+        with pytest.raises(ValueError):
+            foodchains.chain_counts(subweb)
+    else:
+        assert foodchains.chain_counts(subweb) == counts
+
+
+def test_cycles_and_self_loops():
+    graph = nx.DiGraph()
+    # 1 is a plant; 2 is cannibalistic; 3 and 4 eat each other; 5 eats 4;
+    # 6 eats only itself; 7 is unreachable from any source
+    graph.add_edges_from([(1, 2), (2, 2), (2, 3), (3, 4), (4, 3), (1, 4), (4, 5),
+                          (6, 6), (6, 5), (7, 8), (8, 7)])
+    longest, shortest, _ = brute_force_lengths(graph)
+    assert longest == {1: 0, 2: 1, 3: 2, 4: 3, 5: 4, 6: 0, 7: 0, 8: 0}
+    assert foodchains.longest_chain_lengths(graph) == longest
+    assert foodchains.shortest_chain_lengths(graph) == shortest
+
+    approximate = foodchains.longest_chain_lengths(graph, exact_cycles=False)
+    assert approximate[3] == approximate[4] == 2
+    assert approximate[5] == 3
+
+    with pytest.raises(ValueError):
+        foodchains.chain_counts(graph)
+    metrics = foodchains.chain_metrics(graph)
+    assert metrics[5] == {'longest_chain': 4, 'shortest_chain': 1, 'chain_count': None}
+
+
+def test_chain_counts_acyclic():
+    graph = nx.DiGraph()
+    graph.add_edges_from([(1, 3), (2, 3), (3, 4), (1, 4), (4, 4)])
+    _, _, counts = brute_force_lengths(graph)
+    assert foodchains.chain_counts(graph) == counts
+    assert counts[4] == 3
+
+
+def test_full_serengeti():
+    serengeti = foodwebs.get_serengeti()
+    longest = foodchains.longest_chain_lengths(serengeti)
+    shortest = foodchains.shortest_chain_lengths(serengeti)
+    assert set(longest) == set(serengeti.nodes())
+    for node in serengeti.nodes():
+        if shortest[node] is not None:
+            assert shortest[node] <= longest[node]
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from atntools import settings
+from atntools import foodwebindex
+
+
+food_web_ids = ['3-49-50-53', '5-7-42-50-72', '7-31-50-51-53']
+
+
+@pytest.fixture()
+def fake_data_home(monkeypatch, tmpdir):
+    for food_web_id in food_web_ids:
+        os.makedirs(os.path.join(str(tmpdir), '{}-species'.format(len(food_web_id.split('-'))),
+                                 food_web_id))
+    os.makedirs(os.path.join(str(tmpdir), '5-species', 'not-a-food-web'))
+    monkeypatch.setattr(settings, 'DATA_HOME', str(tmpdir))
+
+
+def test_food_web_properties():
+    properties = foodwebindex.food_web_properties([53, 51, 50, 31, 7])
+    assert list(properties.keys()) == foodwebindex.COLUMNS
+    assert properties['food_web_id'] == '7-31-50-51-53'
+    assert properties['num_species'] == 5
+    assert properties['num_links'] == 5
+    assert properties['connectance'] == 0.2
+    assert properties['num_basal'] == 1
+    assert properties['num_top'] == 3
+    assert properties['num_cannibals'] == 1
+    assert properties['num_components'] == 1
+    assert properties['max_chain_length'] == 2
+    assert properties['min_trophic_level'] == 1
+
+
+def test_update_index(fake_data_home, monkeypatch):
+    index = foodwebindex.update_index()
+    assert list(index['food_web_id']) == ['3-49-50-53', '5-7-42-50-72', '7-31-50-51-53']
+    assert os.path.isfile(foodwebindex.get_index_filename())
+
+    # Only new food webs are computed
+    os.makedirs(os.path.join(settings.DATA_HOME, '3-species', '5-50-72'))
+    os.rmdir(os.path.join(settings.DATA_HOME, '5-species', '5-7-42-50-72'))
+    computed = []
+    food_web_properties = foodwebindex.food_web_properties
+    monkeypatch.setattr(foodwebindex, 'food_web_properties',
+                        lambda node_ids: computed.append(node_ids) or food_web_properties(node_ids))
+    index = foodwebindex.update_index()
+    assert computed == [[5, 50, 72]]
+    assert list(index['food_web_id']) == ['5-50-72', '3-49-50-53', '7-31-50-51-53']
+
+    reread = foodwebindex.read_index()
+    assert reread.equals(index)
+    selected = foodwebindex.query_food_webs('num_species == 5', update=False)
+    assert list(selected['food_web_id']) == ['7-31-50-51-53']
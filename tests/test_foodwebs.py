@@ -0,0 +1,55 @@
+import os
+
+import networkx as nx
+
+from atntools import foodwebs
+
+
+def test_get_layout(monkeypatch, tmpdir):
+    calls = []
+
+    def fake_graphviz_layout(graph, prog, args):
+        calls.append(sorted(graph.nodes()))
+        return {node: (float(i), 2.0 * i) for i, node in enumerate(sorted(graph.nodes()))}
+
+    monkeypatch.setattr(nx.drawing.nx_agraph, 'graphviz_layout', fake_graphviz_layout)
+    cache_dir = str(tmpdir)
+    serengeti = foodwebs.get_serengeti()
+    subweb = serengeti.subgraph([7, 31, 50, 51, 53])
+
+    pos = foodwebs.get_layout(subweb, cache_dir=cache_dir)
+    assert pos == {7: (0, 0), 31: (1, 2), 50: (2, 4), 51: (3, 6), 53: (4, 8)}
+    assert len(os.listdir(cache_dir)) == 1
+    assert foodwebs.get_layout(subweb, cache_dir=cache_dir) == pos
+    assert len(calls) == 1
+
+    # A different food web, program or set of edges gets its own layout
+    foodwebs.get_layout(serengeti.subgraph([7, 31, 50]), cache_dir=cache_dir)
+    foodwebs.get_layout(subweb, prog='neato', cache_dir=cache_dir)
+    modified = subweb.copy()
+    modified.remove_edge(*modified.edges()[0])
+    foodwebs.get_layout(modified, cache_dir=cache_dir)
+    assert len(calls) == 4
+    assert len(os.listdir(cache_dir)) == 4
+
+    foodwebs.get_layout(subweb, cache_dir=cache_dir, use_cache=False)
+    assert len(calls) == 5
+
+    # The default cache directory follows wobdata.CACHE_DIR (see conftest.py)
+    default_dir = tmpdir.join('default')
+    monkeypatch.setattr(foodwebs.wobdata, 'CACHE_DIR', str(default_dir))
+    foodwebs.get_layout(subweb)
+    assert len(default_dir.join('layouts').listdir()) == 1
+
+
+def test_write_food_web_files(tmpdir):
+    food_web_dir = os.path.join(str(tmpdir), '7-31-50')
+    os.mkdir(food_web_dir)
+    subweb = foodwebs.get_serengeti().subgraph([7, 31, 50])
+    foodwebs.write_food_web_files(subweb, food_web_dir, draw=False)
+    assert foodwebs.food_web_json_filename(food_web_dir) == os.path.join(
+        food_web_dir, 'foodweb.7-31-50.json')
+    with open(foodwebs.food_web_json_filename(food_web_dir)) as f:
+        assert f.read().strip() == foodwebs.food_web_json(subweb)
+    assert foodwebs.food_web_plot_filename(food_web_dir + '/') == os.path.join(
+        food_web_dir, 'foodweb.7-31-50.png')
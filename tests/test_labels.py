@@ -0,0 +1,68 @@
+import os.path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atntools.labels import *
+from atntools.summaryfiles import write_summary_hdf5, read_summary
+
+
+def make_features(seed, n):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'X14': rng.rand(n),
+        'timesteps': 100,
+        'lastNonzeroTimestep': 99,
+        'lastNonzeroBiomass': 1.0,
+        'maxBiomass': np.where(rng.rand(n) < 0.1, 1e6, 1.0),
+        'environmentScoreSlope': rng.randn(n),
+    }, columns=['X14', 'timesteps', 'lastNonzeroTimestep', 'lastNonzeroBiomass',
+                'maxBiomass', 'environmentScoreSlope'])
+
+
+def test_assign_labels_streaming(tmpdir):
+    df1 = make_features(0, 300)
+    df2 = make_features(1, 200)
+    file1 = os.path.join(str(tmpdir), 'features1.csv')
+    file2 = os.path.join(str(tmpdir), 'features2.h5')
+    df1.to_csv(file1, index=False)
+    write_summary_hdf5(df2, file2)
+
+    # Expected result: all data in memory
+    expected = remove_ugly_instances(pd.concat([df1, df2], ignore_index=True))
+    assign_labels(expected, 'environmentScoreSlope')
+
+    for output_file in ('labeled.csv', 'labeled.h5'):
+        output_file = os.path.join(str(tmpdir), output_file)
+        assign_labels_streaming([file1, file2], output_file, chunk_size=64)
+        labeled = read_summary(output_file)
+        assert len(labeled) == len(expected)
+        assert np.allclose(labeled['environmentScoreSlope'], expected['environmentScoreSlope'])
+        assert (labeled['label_environmentScoreSlope'].astype(object).fillna('').values ==
+                expected['label_environmentScoreSlope'].fillna('').values).all()
+
+    # Other label thresholds
+    expected = expected.drop(columns='label_environmentScoreSlope')
+    col = expected['environmentScoreSlope']
+    assign_labels(expected, 'environmentScoreSlope', col.quantile(0.1), col.quantile(0.6))
+    output_file = os.path.join(str(tmpdir), 'labeled-0.1-0.6.h5')
+    thresholds = assign_labels_streaming([file1, file2], output_file, chunk_size=64,
+                                         quantiles=(0.1, 0.6))
+    assert np.allclose(thresholds['environmentScoreSlope'], (col.quantile(0.1), col.quantile(0.6)))
+    labeled = read_summary(output_file)
+    assert (labeled['label_environmentScoreSlope'].astype(object).fillna('').values ==
+            expected['label_environmentScoreSlope'].fillna('').values).all()
+    with pytest.raises(ValueError):
+        assign_labels_streaming([file1, file2], output_file, quantiles=(0.75, 0.25))
+
+
+def test_assign_labels_streaming_deterministic(tmpdir):
+    # More rows than the sketch capacity, so the sketch compacts
+    filename = os.path.join(str(tmpdir), 'features.h5')
+    write_summary_hdf5(make_features(2, 10000), filename)
+    output_file = os.path.join(str(tmpdir), 'labeled.h5')
+    thresholds = [assign_labels_streaming([filename], output_file, remove_ugly=False,
+                                          chunk_size=1000)
+                  for i in range(2)]
+    assert thresholds[0] == thresholds[1]
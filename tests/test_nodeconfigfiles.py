@@ -0,0 +1,43 @@
+import os
+import os.path
+
+import pytest
+
+from atntools.nodeconfigfiles import *
+
+
+def test_node_config_file(tmpdir):
+    filename = os.path.join(str(tmpdir), 'node-configs.txt')
+    node_configs = ['1,[{}],1.0,1.0,0,0'.format(i) for i in range(100)]
+    assert write_node_config_file(filename, node_configs) == 100
+    assert os.path.isfile(index_filename(filename))
+
+    with NodeConfigFile(filename) as f:
+        assert len(f) == 100
+        assert f.get(42) == node_configs[42]
+        assert f[-1] == node_configs[-1]
+        assert f[10:20:3] == node_configs[10:20:3]
+        assert list(f) == node_configs
+        with pytest.raises(IndexError):
+            f.get(100)
+
+
+def test_build_index(tmpdir, monkeypatch):
+    filename = os.path.join(str(tmpdir), 'node-configs.txt')
+    with open(filename, 'w') as f:
+        f.write('a\nbb\n\nccc')  # No newline at end
+
+    # Small chunks, so lines span chunk boundaries
+    monkeypatch.setattr('atntools.nodeconfigfiles.INDEX_CHUNK_SIZE', 3)
+    with NodeConfigFile(filename) as f:
+        assert list(f) == ['a', 'bb', '', 'ccc']
+
+    # A stale index is rebuilt
+    with open(filename, 'a') as f:
+        f.write('\ndddd\n')
+    with NodeConfigFile(filename) as f:
+        assert f[3:] == ['ccc', 'dddd']
+
+    open(filename, 'w').close()
+    with NodeConfigFile(filename) as f:
+        assert len(f) == 0
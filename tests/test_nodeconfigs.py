@@ -1,5 +1,12 @@
-import random
+import os.path
+import json
 
+import numpy as np
+import pandas as pd
+import h5py
+import pytest
+
+from atntools import foodwebs
 from atntools.nodeconfigs import *
 
 # Change from Convergence 5-species template: addition of R for the grass.
@@ -49,15 +56,12 @@ def test_node_config_to_string():
     assert node_config_to_string(test_nodes) == test_node_config
 
 
-def test_generate_trophic_level_scaling(monkeypatch):
-
-    # Make random.uniform() just return the high value
-    monkeypatch.setattr(random, 'uniform', lambda low, high: high)
+def test_generate_trophic_level_scaling():
 
     args = {
         "node_ids": [3, 4, 5, 7, 13, 30, 31, 42, 45, 49, 50, 51, 52, 53, 57, 65, 72, 74, 75, 85],
         "param_ranges": {
-            "initialBiomass": [100, 8000],
+            "initialBiomass": 8000,
             "X": [0, 1],
             "R": 1,
             "K": [100, 10000]
@@ -74,3 +78,299 @@ def test_generate_trophic_level_scaling(monkeypatch):
     max_chain_lengths = {13: 1, 30: 1, 31: 1, 42: 2, 45: 2, 49: 3, 50: 2, 51: 3, 52: 1, 53: 3, 57: 3, 65: 1, 72: 1, 74: 2, 75: 2, 85: 1}
     for node in node_config:
         assert node['initialBiomass'] == 8000 * 0.25 ** max_chain_lengths.get(node['nodeId'], 0)
+
+
+def test_parse_node_config_links():
+    node_config = '2,[5],2000.0,1.0,1,K=10000.0,2,[14],A=0.5,[31],E=0.25,[14],1751.0,20.0,1,X=0.201,0'
+    nodes = parse_node_config(node_config)
+    assert nodes[0]['links'] == [{'nodeId': 14, 'A': 0.5}, {'nodeId': 31, 'E': 0.25}]
+    assert nodes[1] == {'nodeId': 14, 'initialBiomass': 1751.0, 'perUnitBiomass': 20.0, 'X': 0.201}
+    assert node_config_to_string(nodes) == node_config
+
+
+def test_parse_node_configs():
+    other_node_config = test_node_config.replace('1751.0', '1000.0').replace('X=1.0', 'X=0.5')
+    configs = parse_node_configs([test_node_config, other_node_config + '\n', ''])
+    assert configs.shape == (2, 5)
+    assert list(configs['nodeId'][1]) == [5, 14, 31, 42, 70]
+    assert configs['initialBiomass'][1, 1] == 1000.0
+    assert configs['X'][1, 2] == 0.5
+    assert configs['K'][0, 0] == 10000.0
+    assert np.isnan(configs['K'][0, 1])
+    assert node_config_array_to_nodes(configs[0]) == test_nodes
+    assert list(node_config_array_to_strings(configs)) == [test_node_config, other_node_config]
+
+    # Different layouts (node 14 replaced by 15)
+    other_node_config = test_node_config.replace('[14]', '[15]')
+    configs = parse_node_configs([test_node_config, other_node_config])
+    assert list(configs['nodeId'][1]) == [5, 15, 31, 42, 70]
+    assert list(node_config_array_to_strings(configs)) == [test_node_config, other_node_config]
+
+
+def test_node_config_array_round_trip():
+    node_configs = [
+        '2,[5],0.5,1,3,K=10000.0,R=1.0,X=0.0,0,[14],500.0,20.0,1,X=0.201,0',
+        '2,[5],1751.0,12.5,1,K=10000.0,0,[14],1e+03,0.25,1,X=0.201,0',
+        '2,[5],1751.0,12.5,1,K=10000.0,0,[15],1e+03,0.25,0,0',
+    ]
+    strings = list(node_config_array_to_strings(parse_node_configs(node_configs)))
+    # Same strings as node_config_to_string() of the parsed node configs
+    assert strings == [node_config_to_string(parse_node_config(nc)) for nc in node_configs]
+    assert strings[0] == '2,[5],0.5,1.0,3,K=10000.0,R=1.0,X=0.0,0,[14],500.0,20.0,1,X=0.201,0'
+    # Same values
+    for string, node_config in zip(strings, node_configs):
+        assert parse_node_config(string) == parse_node_config(node_config)
+
+
+def test_generate_uniform_seed(tmpdir):
+    node_ids = [5, 14, 31, 42, 70]
+    param_ranges = {
+        'initialBiomass': [100, 5000],
+        'X': [0.5, 1.5],
+        'R': 1,
+        'K': [1000, 15000],
+    }
+    configs = list(generate_uniform_centered_on_default_x(node_ids, param_ranges, 20, seed=3))
+    assert configs == list(generate_uniform_centered_on_default_x(node_ids, param_ranges, 20, seed=3))
+    assert configs != list(generate_uniform_centered_on_default_x(node_ids, param_ranges, 20, seed=4))
+    assert param_ranges['R'] == 1
+
+    for node_config in configs:
+        assert [node['nodeId'] for node in node_config] == node_ids
+        assert node_config[0]['R'] == 1
+        assert 1000 <= node_config[0]['K'] <= 15000
+        assert 'X' not in node_config[0]
+        default_x = foodwebs.get_serengeti().node[14]['metabolism']
+        assert default_x * 0.5 <= node_config[1]['X'] <= default_x * 1.5
+        for node in node_config:
+            assert 100 <= node['initialBiomass'] <= 5000
+
+    metaparameter_file = os.path.join(str(tmpdir), 'metaparameters.json')
+    with open(metaparameter_file, 'w') as f:
+        json.dump({
+            'generator': 'uniform-centered-on-default-x',
+            'args': {'node_ids': node_ids, 'param_ranges': param_ranges, 'count': 3, 'seed': 3}
+        }, f)
+    strings = list(generate_node_configs_from_metaparameter_file(metaparameter_file))
+    assert strings == [node_config_to_string(nc) for nc in configs[:3]]
+
+    # Each batch of a set gets different node configs
+    batch_strings = list(generate_node_configs_from_metaparameter_file(metaparameter_file, batch_num=1))
+    assert len(batch_strings) == 3
+    assert not set(batch_strings) & set(strings)
+
+
+def test_generate_low_discrepancy(tmpdir):
+    node_ids = [5, 14, 31]
+    param_ranges = {'initialBiomass': [100, 5000], 'X': [0, 1], 'R': 1, 'K': [1000, 15000]}
+
+    configs = list(generate_latin_hypercube(node_ids, param_ranges, 50, seed=2 ** 62))
+    # Each of the 50 strata of each parameter value is sampled exactly once
+    strata = np.floor((np.array([nc[1]['initialBiomass'] for nc in configs]) - 100) / 4900 * 50)
+    assert sorted(strata) == list(range(50))
+    assert all(nc[0]['R'] == 1 for nc in configs)
+    assert configs != list(generate_latin_hypercube(node_ids, param_ranges, 50, seed=2 ** 62, skip=1))
+
+    configs = list(generate_sobol(node_ids, param_ranges, 16, seed=1))
+    assert configs == list(generate_sobol(node_ids, param_ranges, 16, seed=1))
+    # Skip-ahead continues the same sequence
+    first = list(generate_sobol(node_ids, param_ranges, 8, seed=1))
+    rest = list(generate_sobol(node_ids, param_ranges, 8, seed=1, skip=8))
+    assert first + rest == configs
+    # Later batches of a Sobol' set continue the sequence
+    metaparameter_file = os.path.join(str(tmpdir), 'metaparameters.json')
+    with open(metaparameter_file, 'w') as f:
+        json.dump({'generator': 'sobol',
+                   'args': {'node_ids': node_ids, 'param_ranges': param_ranges, 'count': 8, 'seed': 1}}, f)
+    assert (list(generate_node_configs_from_metaparameter_file(metaparameter_file, batch_num=1)) ==
+            [node_config_to_string(nc) for nc in rest])
+    xs = np.array([nc[2]['X'] for nc in configs])
+    assert np.histogram(xs, bins=4, range=(0, 1))[0].tolist() == [4, 4, 4, 4]
+
+
+def test_generate_node_config(tmpdir):
+    metaparameter_file = os.path.join(str(tmpdir), 'metaparameters.json')
+    for generator in ['uniform', 'sobol', 'trophic-level-scaling']:
+        args = {
+            'node_ids': [5, 14, 31, 42, 70],
+            'param_ranges': {'initialBiomass': [100, 5000], 'X': [0, 1], 'K': [1000, 15000]},
+            'count': 30,
+            'seed': 7,
+        }
+        if generator == 'trophic-level-scaling':
+            args['factor'] = 0.5
+        with open(metaparameter_file, 'w') as f:
+            json.dump({'generator': generator, 'args': args}, f)
+
+        all_configs = list(generate_node_configs_from_metaparameter_file(metaparameter_file))
+        assert len(all_configs) == 30
+        shards = [list(generate_node_configs_from_metaparameter_file(metaparameter_file, start=i, stop=i + 7))
+                  for i in range(0, 30, 7)]
+        assert sum(shards, []) == all_configs
+        assert generate_node_config(metaparameter_file, 23) == all_configs[23]
+        assert generate_node_config(metaparameter_file, 30) is None
+
+        # Each batch of a set gets different node configs
+        batch_configs = list(generate_node_configs_from_metaparameter_file(metaparameter_file, batch_num=1))
+        assert len(batch_configs) == 30
+        assert not set(batch_configs) & set(all_configs)
+        assert generate_node_config(metaparameter_file, 5, batch_num=1) == batch_configs[5]
+
+        # Without a seed, part of a set can't be regenerated
+        args['seed'] = None
+        with open(metaparameter_file, 'w') as f:
+            json.dump({'generator': generator, 'args': args}, f)
+        assert len(list(generate_node_configs_from_metaparameter_file(metaparameter_file))) == 30
+        with pytest.raises(ValueError):
+            generate_node_config(metaparameter_file, 5)
+        with pytest.raises(ValueError):
+            generate_node_configs_from_metaparameter_file(metaparameter_file, start=7, stop=14)
+
+
+def test_generate_filters_parallel(tmpdir):
+    node_config = '2,[5],1000.0,1.0,1,K=10000.0,0,[14],500.0,20.0,1,X=0.201,0'
+    for sim_number in range(12):
+        filename = os.path.join(
+            str(tmpdir), 'ATN.h5' if sim_number == 0 else 'ATN_{}.h5'.format(sim_number))
+        biomass = np.full((300, 2), (sim_number + 1) / 1000)
+        with h5py.File(filename, 'w') as f:
+            f['node_ids'] = np.array([5, 14])
+            f['node_config'] = node_config.encode()
+            f['stop_event'] = b'CONSTANT_BIOMASS_WITH_CONSUMERS' if sim_number % 3 else b'NONE'
+            f['extinction_timesteps'] = -np.ones(2, dtype=int)
+            f['final_biomass'] = biomass[-1]
+            f['timesteps_simulated'] = len(biomass)
+            f['biomass'] = biomass
+
+    for generator, kwargs in [
+            (generate_filter_steady_state_with_survivors, {}),
+            (generate_filter_sustaining, {}),
+            (generate_filter_convergence, {'min_range_ratio': 0})]:
+        serial = list(generator(input_dir=str(tmpdir), **kwargs))
+        assert serial == list(generator(input_dir=str(tmpdir), processes=2, **kwargs))
+        # Ordered by sim number; initial biomass is the final biomass of the input
+        assert [nodes[0]['initialBiomass'] for nodes in serial] == [
+            sim_number + 1 for sim_number in range(12) if sim_number % 3]
+
+
+def test_generate_multi_region():
+    regions = [
+        {'weight': 1, 'bounds': {'5': {'K': [0, 1], 'initialBiomass': [0, 1]},
+                                 '14': {'X': [0, 1], 'initialBiomass': [0, 1]}}},
+        # Three times the volume of the first region
+        {'weight': 1, 'bounds': {'5': {'K': [1, 4], 'initialBiomass': [0, 1]},
+                                 '14': {'X': [0, 1], 'initialBiomass': [0, 1]}}},
+    ]
+    assert multi_region_volume(regions) == 4
+
+    configs = list(generate_multi_region(regions, 4000, seed=0))
+    assert configs == list(generate_multi_region(regions, 4000, seed=0))
+    assert [node['nodeId'] for node in configs[0]] == [5, 14]
+    k = np.array([nc[0]['K'] for nc in configs])
+    assert ((k >= 0) & (k <= 4)).all()
+    # Samples are spread evenly over the union of the regions
+    assert abs((k < 1).mean() - 0.25) < 0.03
+
+    regions[0]['weight'] = 3
+    k = np.array([nc[0]['K'] for nc in generate_multi_region(regions, 4000, seed=0)])
+    assert abs((k < 1).mean() - 0.5) < 0.03
+
+    # A parameter fixed in one region but varied in another gives that region
+    # zero volume, consistently in the weights and the total volume
+    regions[0]['weight'] = 1
+    regions[0]['bounds']['14']['X'] = [0.5, 0.5]
+    assert multi_region_volume(regions) == 3
+    k = np.array([nc[0]['K'] for nc in generate_multi_region(regions, 100, seed=0)])
+    assert (k >= 1).all()
+
+    del regions[1]['bounds']['14']['X']
+    with pytest.raises(ValueError):
+        multi_region_volume(regions)
+    with pytest.raises(ValueError):
+        list(generate_multi_region(regions, 10, seed=0))
+
+    # initialBiomass must be bounded for every node
+    regions = [{'bounds': {'5': {'K': [0, 1]}, '14': {'X': [0, 1], 'initialBiomass': [0, 1]}}}]
+    with pytest.raises(ValueError):
+        list(generate_multi_region(regions, 10, seed=0))
+
+
+def test_generate_active_learning(tmpdir):
+    from sklearn.tree import DecisionTreeClassifier
+    from atntools.searchprocess import save_classifier
+
+    rng = np.random.RandomState(0)
+    summary = pd.DataFrame({
+        'initialBiomass5': rng.uniform(100, 200, 500),
+        'perUnitBiomass5': 1.0,
+        'K5': rng.uniform(1000, 9000, 500),
+        'initialBiomass14': 50.0,
+        'perUnitBiomass14': 20.0,
+        'X14': rng.uniform(0, 1, 500),
+    })
+    labels = (summary['K5'] > 5000).astype(int)
+    summary_file = os.path.join(str(tmpdir), 'summary.csv')
+    summary.to_csv(summary_file, index=False)
+    tree_file = os.path.join(str(tmpdir), 'classifier.pkl')
+    save_classifier(DecisionTreeClassifier(max_depth=1).fit(summary[['K5', 'X14']], labels),
+                    ['K5', 'X14'], tree_file)
+
+    configs = list(generate_active_learning(tree_file, summary_file, 2000, seed=0))
+    assert configs == list(generate_active_learning(tree_file, summary_file, 2000, seed=0))
+    k = np.array([nc[0]['K'] for nc in configs])
+    assert (k >= summary['K5'].min()).all() and (k <= summary['K5'].max()).all()
+    # Concentrated near the split at K5 = 5000, but covering the whole range
+    assert (abs(k - 5000) < 800).mean() > 0.4
+    assert (k < 2000).mean() > 0.03
+    assert all(nc[1]['initialBiomass'] == 50 for nc in configs)
+    assert all(100 <= nc[0]['initialBiomass'] <= 200 for nc in configs)
+
+    # Keyed on (seed, sim number), so it can be generated in shards
+    metaparameter_file = os.path.join(str(tmpdir), 'metaparameters.json')
+    with open(metaparameter_file, 'w') as f:
+        json.dump({'generator': 'active-learning',
+                   'args': {'tree_file': tree_file, 'summary_file': summary_file, 'count': 50, 'seed': 0}}, f)
+    all_configs = list(generate_node_configs_from_metaparameter_file(metaparameter_file))
+    assert all_configs == [node_config_to_string(nc) for nc in configs[:50]]
+    assert generate_node_config(metaparameter_file, 37) == all_configs[37]
+
+    save_classifier(DecisionTreeClassifier(max_depth=1).fit(summary[['K5', 'X14']], labels),
+                    ['K5', 'Y14'], tree_file)
+    with pytest.raises(ValueError):
+        list(generate_active_learning(tree_file, summary_file, 10, seed=0))
+
+
+def test_generate_cross_entropy(tmpdir):
+    rng = np.random.RandomState(0)
+    summary = pd.DataFrame({
+        'initialBiomass5': 100.0,
+        'perUnitBiomass5': 1.0,
+        'K5': rng.uniform(1000, 15000, 1000),
+        'initialBiomass14': 50.0,
+        'perUnitBiomass14': 20.0,
+        'X14': rng.uniform(0, 1, 1000),
+    })
+    # Fewest extinctions with low X14
+    summary['extinction_count'] = (summary['X14'] * 10).astype(int)
+    summary_file = os.path.join(str(tmpdir), 'summary.csv')
+    summary.to_csv(summary_file, index=False)
+
+    configs = list(generate_cross_entropy(summary_file, 500, elite_fraction=0.1, seed=0))
+    x = np.array([nc[1]['X'] for nc in configs])
+    k = np.array([nc[0]['K'] for nc in configs])
+    assert (x >= 0).all() and x.mean() < 0.1
+    assert 1000 <= k.min() and k.max() <= 15000 and k.std() > 2000
+    assert all(nc[0]['initialBiomass'] == 100 and nc[1]['perUnitBiomass'] == 20 for nc in configs)
+
+    configs = list(generate_cross_entropy(
+        summary_file, 500, objective='X14', minimize=False, seed=0))
+    assert np.mean([nc[1]['X'] for nc in configs]) > 0.9
+
+    # Fixed and node-specific ranges, as in the other generators' param_ranges
+    param_ranges = {'perUnitBiomass': 3.0, 'initialBiomass': {'5': 200.0, '14': [40, 60]},
+                    'K': [2000, 8000]}
+    configs = list(generate_cross_entropy(summary_file, 500, param_ranges=param_ranges, seed=0))
+    assert all(nc[0]['perUnitBiomass'] == 3 and nc[1]['perUnitBiomass'] == 3 for nc in configs)
+    assert all(nc[0]['initialBiomass'] == 200 and nc[1]['initialBiomass'] == 50 for nc in configs)
+    k = np.array([nc[0]['K'] for nc in configs])
+    assert 1000 <= k.min() and k.max() <= 15000
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from atntools.quantiles import *
+
+
+def test_exact_quantiles():
+    values = np.random.RandomState(0).rand(1000)
+    sketch = QuantileSketch(capacity=2048)
+    sketch.update(values[:500])
+    sketch.update(np.append(values[500:], np.nan))
+    assert sketch.count == 1000
+    for q in (0, 0.25, 0.5, 0.75, 1):
+        assert sketch.quantile(q) == pd.Series(values).quantile(q)
+
+
+def test_approximate_quantiles_and_merge():
+    rng = np.random.RandomState(0)
+    values = rng.rand(200000)
+    sketches = []
+    for chunk in np.split(values, 20):
+        sketch = QuantileSketch(capacity=256, seed=1)
+        sketch.update(chunk)
+        sketches.append(sketch)
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+    assert merged.count == len(values)
+    for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+        assert abs(merged.quantile(q) - np.percentile(values, 100 * q)) < 0.02
+
+
+def test_empty_sketch():
+    assert np.isnan(QuantileSketch().quantile(0.5))
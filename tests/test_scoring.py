@@ -0,0 +1,55 @@
+import os.path
+
+import numpy as np
+import pandas as pd
+import h5py
+
+from atntools.scoring import *
+from atntools.summarize import rmse
+from atntools.simulationdata import SimulationData
+
+
+def write_simulation(filename, node_ids, biomass):
+    with h5py.File(filename, 'w') as f:
+        f['node_ids'] = np.array(node_ids)
+        f['node_config'] = b''
+        f['stop_event'] = b'NONE'
+        f['extinction_timesteps'] = -np.ones(len(node_ids), dtype=int)
+        f['final_biomass'] = biomass[-1]
+        f['timesteps_simulated'] = len(biomass)
+        f['biomass'] = biomass
+
+
+def test_score_batch(tmpdir):
+    rng = np.random.RandomState(0)
+    target_file = os.path.join(str(tmpdir), 'target.h5')
+    write_simulation(target_file, [5, 14], rng.rand(50, 2))
+
+    biomass_files = []
+    for sim_number in range(7):
+        filename = os.path.join(
+            str(tmpdir), 'ATN.h5' if sim_number == 0 else 'ATN_{}.h5'.format(sim_number))
+        write_simulation(filename, [5, 14], rng.rand(50, 2))
+        biomass_files.append(filename)
+
+    df = score_batch(target_file, biomass_files, chunk_size=3)
+    assert len(df) == 7
+    assert list(df.columns) == ['score', 'rmse_5', 'rmse_14']
+    assert df['score'].is_monotonic_increasing
+
+    target = SimulationData(target_file).biomass
+    for sim_number, filename in enumerate(biomass_files):
+        expected = rmse(target, SimulationData(filename).biomass)
+        assert np.isclose(df.loc[sim_number, 'rmse_5'], expected[5])
+        assert np.isclose(df.loc[sim_number, 'rmse_14'], expected[14])
+        assert np.isclose(df.loc[sim_number, 'score'], expected.sum())
+
+    top = score_batch(target_file, biomass_files, top_k=3, chunk_size=2)
+    assert list(top.index) == list(df.index[:3])
+
+
+def test_aligned_biomass(tmpdir):
+    filename = os.path.join(str(tmpdir), 'ATN.h5')
+    write_simulation(filename, [14, 5], np.array([[1.0, 2.0], [3.0, 4.0]]))
+    biomass = aligned_biomass(filename, [5, 14, 31], 3)
+    assert (biomass == 1000 * np.array([[2, 1, 0], [4, 3, 0], [4, 3, 0]])).all()
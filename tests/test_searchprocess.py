@@ -0,0 +1,88 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from atntools import settings, util, simulation, nodeconfigs
+from atntools.searchprocess import *
+
+
+def test_merge_adjacent_boxes():
+    boxes = np.array([
+        [[0, 1], [0, 1]],
+        [[1, 2], [0, 1]],
+        [[0, 2], [1, 3]],
+        [[3, 4], [0, 1]],
+    ], dtype=float)
+    merged = merge_adjacent_boxes(boxes)
+    assert len(merged) == 2
+    assert (merged[0] == [[0, 2], [0, 3]]).all()
+    assert (merged[1] == boxes[3]).all()
+
+
+def test_make_region_list():
+    boxes = np.array([[[0, 1], [5, 6]], [[1, 2], [5, 6]]], dtype=float)
+    regions = make_region_list(['K5', 'X14'], boxes)
+    assert regions == [{'weight': 1, 'bounds': {5: {'K': (0, 2)}, 14: {'X': (5, 6)}}}]
+    assert len(make_region_list(['K5', 'X14'], boxes, merge=False)) == 2
+
+
+def test_prescreen_node_configs():
+    node_configs = [
+        '2,[5],{},1.0,1,K={},0,[14],500.0,20.0,1,X=0.5,0'.format(biomass, k)
+        for biomass, k in [(100.0, 1000.0), (900.0, 9000.0)] * 50]
+    # "Good" iff K5 is large
+    X = np.array([[1000.0, 100.0], [9000.0, 900.0]])
+    clf = DecisionTreeClassifier().fit(X, [0, 1])
+
+    kept, keep, weights = prescreen_node_configs(
+        node_configs, clf, ['K5', 'initialBiomass5'], exploration_fraction=0, seed=0)
+    assert kept == node_configs[1::2]
+    assert (weights == 1).all()
+
+    kept, keep, weights = prescreen_node_configs(
+        node_configs, clf, ['K5', 'initialBiomass5'], exploration_fraction=0.2, seed=0)
+    assert keep[1::2].all()
+    assert 0 < keep[::2].sum() < 25
+    # Explored "bad" node configs stand for the skipped ones
+    assert len(weights) == len(kept)
+    assert sorted(set(weights)) == [1, 5]
+    assert (weights == 5).sum() == keep[::2].sum()
+
+
+def test_weighted_median():
+    assert weighted_median([3, 1, 2], [1, 1, 1]) == 2
+    assert weighted_median([0, 1, 2], [1, 1, 10]) == 2
+    df = pd.DataFrame({'stop_event': 'CONSTANT_BIOMASS_WITH_CONSUMERS',
+                       'extinction_count': [0, 1, 2], 'sample_weight': [1, 1, 10]})
+    df, threshold = label_dataset(df)
+    assert threshold == 2
+    assert list(df['class_label']) == [1, 1, 0]
+
+
+def test_simulate_batch_filter(monkeypatch, tmpdir):
+    set_dir = os.path.join(str(tmpdir), '5-species', '1-2-3-4-5', 'set-0')
+    os.makedirs(set_dir)
+    metaparameter_file = os.path.join(set_dir, 'metaparameters.json')
+    with open(metaparameter_file, 'w') as f:
+        json.dump({'generator': 'uniform', 'args': {
+            'node_ids': [5, 14], 'param_ranges': {'initialBiomass': [100, 5000], 'X': [0, 1], 'K': 1000},
+            'count': 10, 'seed': 1}}, f)
+    monkeypatch.setattr(settings, 'DATA_HOME', str(tmpdir))
+    monkeypatch.setattr(simulation, 'atn_batch_simulator', lambda *args, **kwargs: None)
+
+    batch_num = simulation.simulate_batch(
+        0, 1000, node_config_filter=lambda node_configs: [i % 3 == 0 for i in range(len(node_configs))])
+    batch_dir = util.find_batch_dir(set_dir, batch_num)
+    sim_numbers = simulation.get_generated_sim_numbers(batch_dir)
+    assert list(sim_numbers) == [0, 3, 6, 9]
+    with open(os.path.join(batch_dir, 'node-configs.txt')) as f:
+        node_configs = f.read().splitlines()
+    # Each simulated node config can be regenerated from its generated sim number
+    for node_config, sim_number in zip(node_configs, sim_numbers):
+        assert node_config == nodeconfigs.generate_node_config(metaparameter_file, sim_number,
+                                                               batch_num=batch_num)
+
+    batch_num = simulation.simulate_batch(0, 1000)
+    assert simulation.get_generated_sim_numbers(util.find_batch_dir(set_dir, batch_num)) is None
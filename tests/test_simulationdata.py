@@ -0,0 +1,59 @@
+import os.path
+
+import numpy as np
+import pandas as pd
+import h5py
+import pytest
+
+from atntools.simulationdata import *
+from atntools.summarize import get_output_attributes, last_nonzero_timestep
+
+
+@pytest.fixture()
+def biomass():
+    biomass = np.ones((10, 3))
+    biomass[4:, 1] = 1e-13  # Species 14 goes extinct at timestep 4
+    biomass[7:, 2] = 0      # Species 31 goes extinct at timestep 7
+    biomass[9, :] = 0
+    return biomass
+
+
+def write_v1_file(filename, biomass):
+    with h5py.File(filename, 'w') as f:
+        f.attrs['node_config'] = np.string_('3,[5],1.0,1.0,0,0,[14],1.0,1.0,0,0,[31],1.0,1.0,0,0')
+        f['node_ids'] = np.array([5, 14, 31])
+        f['biomass'] = biomass
+
+
+def test_derive_output_attributes(biomass):
+    chunks = ((t, biomass[t:t + 3]) for t in range(0, len(biomass), 3))
+    derived = derive_output_attributes(chunks, 3)
+    assert list(derived['extinction_timesteps']) == [9, 4, 7]
+    assert list(derived['final_biomass']) == [0, 0, 0]
+    assert derived['timesteps_simulated'] == 10
+    assert derived['last_nonzero_timestep'] == 8
+
+
+def test_format_v1_output_attributes(tmpdir, biomass):
+    filename = os.path.join(str(tmpdir), 'ATN.h5')
+    biomass[9, 0] = 2.0
+    write_v1_file(filename, biomass)
+
+    simdata = SimulationData(filename)
+    assert simdata.format_version == 1
+    assert list(simdata.extinction_timesteps) == [-1, 4, 7]
+    assert simdata.extinction_count == 2
+    assert simdata.survivor_count == 1
+    assert simdata.final_biomass[5] == 2.0
+    assert simdata.timesteps_simulated == 10
+    assert simdata.last_nonzero_timestep == 9
+
+    out = get_output_attributes(simdata, None)
+    assert out['extinction_count'] == 2
+    assert out['extinction_14'] == 4
+
+
+def test_last_nonzero_timestep(biomass):
+    df = pd.DataFrame(biomass, columns=[5, 14, 31])
+    assert last_nonzero_timestep(df) == 8
+    assert last_nonzero_timestep(df * 0) == -1
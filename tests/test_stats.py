@@ -0,0 +1,32 @@
+import os.path
+
+import numpy as np
+import pandas as pd
+
+from atntools.stats import class_statistics
+
+
+def test_class_statistics(tmpdir):
+    rng = np.random.RandomState(0)
+    dfs = [pd.DataFrame({
+        'X14': rng.rand(n),
+        'K5': rng.rand(n) * 1000,
+        'extinction_count': rng.randint(0, 5, n),
+        'classification': rng.choice(['good', 'bad'], n),
+    }, columns=['X14', 'K5', 'extinction_count', 'classification']) for n in (300, 200)]
+    filenames = []
+    for i, df in enumerate(dfs):
+        filenames.append(os.path.join(str(tmpdir), 'features{}.csv'.format(i)))
+        df.to_csv(filenames[-1], index=False)
+
+    stats = class_statistics(filenames, chunk_size=64)
+    df = pd.concat(dfs, ignore_index=True)
+    assert list(stats.columns) == ['good', 'bad']
+    for cls in ('good', 'bad'):
+        rows = df[df['classification'] == cls]
+        for col in ('X14', 'K5'):
+            assert stats.loc[('len', col), cls] == len(rows)
+            assert np.isclose(stats.loc[('mean', col), cls], rows[col].mean())
+            assert np.isclose(stats.loc[('std', col), cls], rows[col].std())
+            assert np.isclose(stats.loc[('median', col), cls], rows[col].median())
+    assert ('mean', 'extinction_count') not in stats.index
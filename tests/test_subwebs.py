@@ -0,0 +1,94 @@
+import os.path
+import random
+import itertools
+
+import networkx as nx
+
+from atntools import foodwebs
+from atntools import subwebs
+
+
+def test_bitset_food_web():
+    graph = nx.DiGraph()
+    graph.add_edges_from([(1, 2), (2, 2), (2, 3), (4, 4), (4, 5)])
+    web = subwebs.BitsetFoodWeb(graph)
+    assert web.to_node_ids(web.sources) == [1, 4]
+    assert web.to_node_ids(web.plant_eaters) == [2, 5]
+    assert web.to_node_ids(web.predators[web.index[2]]) == [3]
+    assert web.is_connected(web.to_bits([1, 2, 3]))
+    assert not web.is_connected(web.to_bits([1, 3]))
+    assert not web.is_connected(web.to_bits([1, 2, 4, 5]))
+
+
+def test_predator_complete_sampler():
+    serengeti = foodwebs.get_serengeti()
+    plant_eaters = foodwebs.get_plant_eaters(serengeti)
+    seed_nodes = foodwebs.serengeti_seed_nodes(serengeti)
+    sampler = subwebs.PredatorCompleteSampler(serengeti, seed_nodes, rng=random.Random(1))
+    node_id_lists = list(sampler.sample_many(15, 50, seed_size=3))
+    assert len(node_id_lists) == 50
+    assert len(set(map(tuple, node_id_lists))) == 50
+    assert sampler.attempts - sampler.failures >= 50
+    for node_ids in node_id_lists:
+        assert len(node_ids) == 15
+        assert node_ids == sorted(node_ids)
+        subweb = serengeti.subgraph(node_ids)
+        assert nx.is_weakly_connected(subweb)
+        assert len(set(node_ids) & set(seed_nodes)) >= 3
+        # Plant eaters with predators have predators in the sub-web, unless
+        # the sub-web filled up first
+        lonely = [node for node in plant_eaters & set(node_ids)
+                  if set(serengeti.successors(node)) - {node}
+                  and not set(subweb.successors(node)) - {node}]
+        assert len(lonely) <= 1
+
+
+def test_enumerate_subwebs(tmpdir):
+    serengeti = foodwebs.get_serengeti()
+    graph = serengeti.subgraph(sorted(serengeti.nodes())[1:25])
+    basal_nodes = foodwebs.get_basal_species(graph)
+    web = subwebs.BitsetFoodWeb(graph)
+
+    expected = set()
+    for node_ids in itertools.combinations(web.node_ids, 5):
+        bits = web.to_bits(node_ids)
+        if (len(set(node_ids) & set(basal_nodes)) == 2 and web.is_connected(bits)
+                and subwebs.is_predator_complete(web, bits) and subwebs.has_prey(web, bits)):
+            expected.add(node_ids)
+    assert len(expected) > 0
+
+    node_id_lists = list(subwebs.enumerate_subwebs(graph, 5, basal_nodes, 2))
+    assert len(node_id_lists) == len(expected)
+    assert set(map(tuple, node_id_lists)) == expected
+
+    shards = [set(map(tuple, subwebs.enumerate_subwebs(graph, 5, basal_nodes, 2, shard=i,
+                                                       num_shards=3)))
+              for i in range(3)]
+    assert set.union(*shards) == expected
+    assert sum(map(len, shards)) == len(expected)
+
+    assert subwebs.count_subwebs(graph, 5, basal_nodes, 2) == len(expected)
+    filename = os.path.join(str(tmpdir), 'subwebs.txt')
+    count = subwebs.enumerate_subwebs_parallel(graph, 5, basal_nodes, 2, filename=filename,
+                                               num_shards=4, processes=2)
+    assert count == len(expected)
+    with open(filename) as f:
+        assert {tuple(map(int, line.split('-'))) for line in f} == expected
+    assert os.listdir(str(tmpdir)) == ['subwebs.txt']
+
+
+def test_enumerate_subwebs_without_decaying_material():
+    # As in atn-enumerate-food-webs.py: node 1 (Decaying Material) left out
+    serengeti = foodwebs.get_serengeti()
+    seed_nodes = foodwebs.serengeti_seed_nodes(serengeti)
+    graph = serengeti.subgraph([node for node in serengeti.nodes() if node != 1])
+    node_id_lists = list(subwebs.enumerate_subwebs(graph, 3, seed_nodes, 1, full_graph=serengeti))
+    assert len(node_id_lists) > 0
+    assert [12, 67, 76] not in node_id_lists
+    for node_ids in node_id_lists:
+        subweb = serengeti.subgraph(node_ids)
+        # Every member that is not basal in the full food web has prey
+        for node in node_ids:
+            if set(serengeti.predecessors(node)) - {node}:
+                assert set(subweb.predecessors(node)) - {node}
+    assert subwebs.count_subwebs(graph, 3, seed_nodes, 1, full_graph=serengeti) == len(node_id_lists)
@@ -1,4 +1,10 @@
+import os.path
+
+import numpy as np
+import h5py
+
 from atntools.summarize import *
+from atntools.simulationdata import BIOMASS_SCALE
 
 
 def test_get_sim_number():
@@ -9,3 +15,31 @@ def test_get_sim_number():
     assert get_sim_number('WoB_Data_1.csv') == 1
     assert get_sim_number('WoB_Data_123.csv') == 123
     assert get_sim_number('one.two.three_123.csv') == 123
+
+
+def test_oscillation_features(tmpdir):
+    filename = os.path.join(str(tmpdir), 'ATN.h5')
+    t = np.arange(4000)
+    # Numerically constant: floating-point noise only
+    noisy = 0.7 + np.random.RandomState(0).uniform(-1e-15, 1e-15, len(t))
+    biomass = np.stack([1 + np.sin(2 * np.pi * t / 100), np.full(len(t), 0.5), noisy], axis=1)
+    with h5py.File(filename, 'w') as f:
+        f['node_ids'] = np.array([5, 14, 31])
+        f['node_config'] = b''
+        f['stop_event'] = b'OSCILLATING_STEADY_STATE'
+        f['extinction_timesteps'] = np.array([-1, -1, -1])
+        f['final_biomass'] = biomass[-1]
+        f['timesteps_simulated'] = len(t)
+        f['biomass'] = biomass
+
+    simdata = SimulationData(filename)
+    features = oscillation_features(simdata, window=2000, chunk_size=300)
+    scaled = biomass * BIOMASS_SCALE
+    assert features['oscillation_period_5'] == 100
+    assert np.isnan(features['oscillation_period_14'])
+    assert np.isclose(features['oscillation_amplitude_5'], np.ptp(scaled[-2000:, 0]))
+    assert features['oscillation_amplitude_14'] == 0
+    assert np.isnan(features['oscillation_period_31'])
+    assert features['oscillation_amplitude_31'] == 0
+    assert np.isclose(features['biomass_mean_5'], scaled[:, 0].mean())
+    assert np.isclose(features['biomass_variance_5'], scaled[:, 0].var())
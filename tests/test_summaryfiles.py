@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atntools.summaryfiles import *
+
+
+def make_summary():
+    return pd.DataFrame({
+        'batch_number': [0, 0, 0],
+        'set_number': [3, 3, 3],
+        'sim_number': [0, 1, 2],
+        'K5': [1000.0, 2000.0, 3000.0],
+        'X14': [0.1, 0.2, 0.3],
+        'extinction_5': [-1, 50, -1],
+        'extinction_14': [-1, -1, 70],
+        'extinction_count': [0, 1, 1],
+        'stop_event': ['NONE', 'OSCILLATING_STEADY_STATE', 'NONE'],
+        'timesteps_simulated': [100000, 2000, 100000],
+    }, columns=['batch_number', 'set_number', 'sim_number', 'K5', 'X14',
+                'extinction_5', 'extinction_14', 'extinction_count',
+                'stop_event', 'timesteps_simulated'])
+
+
+def test_column_dtype():
+    assert column_dtype('sim_number') == np.int64
+    assert column_dtype('extinction_14') == np.int64
+    assert column_dtype('timesteps_simulated') == np.int64
+    assert column_dtype('X14') == np.float64
+    assert column_dtype('initialBiomass5') == np.float64
+    assert column_dtype('stop_event') == 'category'
+
+
+def test_hdf5_round_trip(tmpdir):
+    df = make_summary()
+    filename = os.path.join(str(tmpdir), 'summary.h5')
+    with SummaryWriter(filename) as writer:
+        writer.append(df[:2])
+        writer.append(df[2:])
+
+    df2 = read_summary(filename)
+    assert list(df2.columns) == list(df.columns)
+    assert df2['extinction_5'].dtype == np.int64
+    assert df2['K5'].dtype == np.float64
+    assert df2['stop_event'].dtype.name == 'category'
+    assert list(df2['stop_event']) == list(df['stop_event'])
+    assert (df2['X14'] == df['X14']).all()
+
+    df3 = read_summary(filename, columns=['sim_number', 'stop_event'])
+    assert list(df3.columns) == ['sim_number', 'stop_event']
+
+
+def test_hdf5_missing_int_values(tmpdir):
+    df = make_summary()
+    df['extinction_5'] = df['extinction_5'].astype(np.float64)
+    df.loc[0, 'extinction_5'] = np.nan
+    filename = os.path.join(str(tmpdir), 'summary.h5')
+    with SummaryWriter(filename) as writer:
+        writer.append(df)
+    df2 = read_summary(filename)
+    assert df2['extinction_5'].dtype == np.float64
+    assert np.isnan(df2['extinction_5'][0])
+    assert list(df2['extinction_5'][1:]) == [50, -1]
+
+    with SummaryWriter(filename) as writer:
+        writer.append(df[1:])
+        with pytest.raises(ValueError):
+            writer.append(df[:1])
+
+
+def test_read_summary_prefers_columnar(tmpdir):
+    df = make_summary()
+    csv_filename = os.path.join(str(tmpdir), SUMMARY_CSV)
+    df.to_csv(csv_filename, index=False)
+    assert preferred_summary_file(csv_filename) == csv_filename
+    assert read_batch_summary(str(tmpdir))['stop_event'].dtype.name == 'category'
+
+    write_summary_hdf5(df, columnar_filename(csv_filename))
+    assert preferred_summary_file(csv_filename) == os.path.join(str(tmpdir), SUMMARY_HDF5)
+    assert len(read_batch_summary(str(tmpdir))) == 3
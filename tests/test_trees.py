@@ -1,5 +1,6 @@
 import os.path
 
+import numpy as np
 import pytest
 
 from atntools.trees import *
@@ -16,3 +17,20 @@ def tree_lines():
 def test_parse_weka_j48_output(tree_lines):
     tree = parse_weka_j48_output(tree_lines)
     assert str(tree) == '\n'.join(tree_lines)
+
+
+def test_get_leaf_regions(tree_lines):
+    tree = parse_weka_j48_output(tree_lines)
+    feature_names = ['K2', 'X55', 'X8', 'X80', 'X9']
+    root_bounds = np.array([[0, 20000]] + [[0, 1]] * 4, dtype=float)
+    bounds, impurity = get_leaf_regions(tree, feature_names, root_bounds)
+    leaves = tree.get_leaves()
+    assert len(bounds) == len(leaves) == len(impurity)
+    assert impurity[0] == 1 / 5  # bad (5.0/1.0)
+    assert bounds[0, 1, 1] == 0.180557  # X55 <= 0.180557
+    assert bounds[0, 2, 1] == 0.00196   # X8 <= 0.00196
+    assert (bounds[:, :, 0] <= bounds[:, :, 1]).all()
+
+    splits = get_split_thresholds(tree, feature_names)
+    assert len(splits) == len(tree.get_internal_nodes())
+    assert splits[0] == (1, 0.486663)
@@ -41,6 +41,13 @@ def test_get_food_web_dir(fake_data_home):
         get_food_web_dir(1)
 
 
+def test_list_food_web_dirs(fake_data_home):
+    assert list(list_food_web_dirs()) == [
+        ('1-2-3-4-5', os.path.join(settings.DATA_HOME, '5-species/1-2-3-4-5')),
+        ('1-2-3-4-5-6', os.path.join(settings.DATA_HOME, '6-species/1-2-3-4-5-6')),
+    ]
+
+
 def test_list_set_dirs(fake_data_home):
     assert sorted(list_set_dirs()) == list(enumerate(os.path.join(settings.DATA_HOME, d)
                                                      for d in directories if 'batch' not in d))
@@ -0,0 +1,80 @@
+import os.path
+import shutil
+
+import numpy as np
+
+from atntools import foodwebs
+from atntools.wobdata import *
+
+
+def test_graph_matches_csv(tmpdir):
+    arrays = load_artefact(os.path.join(str(tmpdir), 'wob-data.pickle'))
+    graph = WobData(arrays).graph()
+    expected = foodwebs.read_serengeti_from_csv()
+    assert list(graph.nodes()) == list(expected.nodes())
+    assert list(graph.edges()) == list(expected.edges())
+    for node_id in expected:
+        assert graph.node[node_id] == expected.node[node_id]
+
+    wob_data = WobData(arrays)
+    assert sorted(wob_data.prey(14)) == sorted(expected.predecessors(14))
+    assert sorted(wob_data.predators(14)) == sorted(expected.successors(14))
+    assert wob_data.node_attributes(14) == expected.node[14]
+
+
+def test_artefact_holds_only_arrays(tmpdir):
+    arrays = load_artefact(os.path.join(str(tmpdir), 'wob-data.pickle'))
+    for name, value in arrays.items():
+        if name not in ('source_states', 'source_hash'):
+            assert isinstance(value, np.ndarray), name
+    rows = WobData(arrays).table_rows('species')
+    assert rows[0]['species_id'] == 1
+    assert rows[0]['name'] == 'Aardvark'
+    assert 'description' not in rows[0]
+
+
+def test_artefact_invalidated_by_source_change(tmpdir, monkeypatch):
+    source_files = {}
+    for table, filename in SOURCE_FILES.items():
+        source_files[table] = os.path.join(str(tmpdir), os.path.basename(filename))
+        shutil.copy(filename, source_files[table])
+    monkeypatch.setattr('atntools.wobdata.SOURCE_FILES', source_files)
+    artefact = os.path.join(str(tmpdir), 'cache', 'wob-data.pickle')
+
+    arrays = load_artefact(artefact)
+    assert os.path.isfile(artefact)
+    assert len(WobData(load_artefact(artefact)).table_rows('species_data')) == len(
+        WobData(arrays).table_rows('species_data'))
+
+    with open(source_files['species_data'], 'a') as f:
+        f.write('1000,Test species,2.5\n')
+    rows = WobData(load_artefact(artefact)).table_rows('species_data')
+    assert rows[-1] == {'nodeId': 1000, 'name': 'Test species', 'trophicLevel': 2.5}
+
+
+def test_artefact_not_rehashed_if_unchanged(tmpdir, monkeypatch):
+    source_files = {}
+    for table, filename in SOURCE_FILES.items():
+        source_files[table] = os.path.join(str(tmpdir), os.path.basename(filename))
+        shutil.copy(filename, source_files[table])
+    monkeypatch.setattr('atntools.wobdata.SOURCE_FILES', source_files)
+    artefact = os.path.join(str(tmpdir), 'cache', 'wob-data.pickle')
+    load_artefact(artefact)
+
+    def fail():
+        raise AssertionError("Source files hashed")
+    monkeypatch.setattr('atntools.wobdata.source_hash', fail)
+    load_artefact(artefact)
+
+    # Touched but unchanged: hashed once, then the new states are recorded
+    os.utime(source_files['consume'], ns=(0, 0))
+    monkeypatch.undo()
+    monkeypatch.setattr('atntools.wobdata.SOURCE_FILES', source_files)
+    load_artefact(artefact)
+    monkeypatch.setattr('atntools.wobdata.source_hash', fail)
+    load_artefact(artefact)
+
+
+def test_cache_dir_redirected():
+    # See conftest.py
+    assert not get_artefact_filename().startswith(os.path.expanduser('~/.atn-tools'))
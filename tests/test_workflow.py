@@ -0,0 +1,213 @@
+import os
+import json
+import time
+
+import numpy as np
+import h5py
+import pytest
+
+from atntools import settings
+from atntools import catalog
+from atntools import simulation
+from atntools import summaryfiles
+from atntools import workflow
+
+
+def write_value(output_file, value, input_file=None):
+    """ Write `value` (appended to the contents of `input_file`) and log the call. """
+    contents = str(value)
+    if input_file is not None:
+        with open(input_file) as f:
+            contents = f.read() + contents
+    with open(output_file, 'w') as f:
+        f.write(contents)
+    with open(output_file + '.calls', 'a') as f:
+        f.write('{}\n'.format(time.time()))
+    return [output_file]
+
+
+def sleep_and_write(output_file, seconds):
+    start = time.time()
+    time.sleep(seconds)
+    with open(output_file, 'w') as f:
+        json.dump([start, time.time()], f)
+    return [output_file]
+
+
+def call_count(output_file):
+    with open(output_file + '.calls') as f:
+        return len(f.readlines())
+
+
+def make_tasks(directory, second_value='b'):
+    a = os.path.join(directory, 'a.txt')
+    b = os.path.join(directory, 'b.txt')
+    return [
+        workflow.Task('b', 'b', directory, write_value, (b, second_value, a), deps=['a'],
+                      params={'value': second_value}),
+        workflow.Task('a', 'a', directory, write_value, (a, 'a'), params={'value': 'a'}),
+    ]
+
+
+def test_run(tmpdir):
+    directory = str(tmpdir)
+    log = lambda message: None
+    assert workflow.run(make_tasks(directory), log=log) == {'a': 'ran', 'b': 'ran'}
+    with open(os.path.join(directory, 'b.txt')) as f:
+        assert f.read() == 'ab'
+
+    # Up to date
+    assert workflow.run(make_tasks(directory), log=log) == {'a': 'skipped', 'b': 'skipped'}
+
+    # Changing a parameter of the last task only reruns it
+    assert workflow.run(make_tasks(directory, 'c'), log=log) == {'a': 'skipped', 'b': 'ran'}
+    with open(os.path.join(directory, 'b.txt')) as f:
+        assert f.read() == 'ac'
+    assert call_count(os.path.join(directory, 'a.txt')) == 1
+
+    # Changed output
+    with open(os.path.join(directory, 'a.txt'), 'w') as f:
+        f.write('x')
+    assert workflow.run(make_tasks(directory, 'c'), log=log) == {'a': 'ran', 'b': 'ran'}
+
+    assert workflow.run(make_tasks(directory, 'c'), force=True, log=log) == {'a': 'ran', 'b': 'ran'}
+
+
+def test_input_files(tmpdir):
+    directory = str(tmpdir)
+    input_file = os.path.join(directory, 'input.txt')
+    with open(input_file, 'w') as f:
+        f.write('1')
+    make = lambda: [workflow.Task('a', 'a', directory, write_value,
+                                  (os.path.join(directory, 'a.txt'), 'a', input_file),
+                                  input_files=[input_file])]
+    log = lambda message: None
+    assert workflow.run(make(), log=log) == {'a': 'ran'}
+    assert workflow.run(make(), log=log) == {'a': 'skipped'}
+    with open(input_file, 'w') as f:
+        f.write('2')
+    assert workflow.run(make(), log=log) == {'a': 'ran'}
+
+
+def test_concurrency(tmpdir):
+    directory = str(tmpdir)
+    tasks = [workflow.Task(str(i), str(i), directory, sleep_and_write,
+                           (os.path.join(directory, '{}.json'.format(i)), 0.5))
+             for i in range(2)]
+    workflow.run(tasks, max_workers=2, log=lambda message: None)
+    intervals = []
+    for i in range(2):
+        with open(os.path.join(directory, '{}.json'.format(i))) as f:
+            intervals.append(json.load(f))
+    # The tasks overlap
+    assert max(start for start, end in intervals) < min(end for start, end in intervals)
+
+
+def test_invalid_graph(tmpdir):
+    directory = str(tmpdir)
+    with pytest.raises(ValueError):
+        workflow.run([workflow.Task('a', 'a', directory, write_value, deps=['missing'])])
+    with pytest.raises(ValueError):
+        workflow.run([workflow.Task('a', 'a', directory, write_value, deps=['b']),
+                      workflow.Task('b', 'b', directory, write_value, deps=['a'])],
+                     log=lambda message: None)
+
+
+def test_dataset_tasks(monkeypatch, tmpdir):
+    set_dir = os.path.join(str(tmpdir), '5-species', '1-2-3-4-5', 'set-0')
+    os.makedirs(set_dir)
+    with open(os.path.join(set_dir, 'metaparameters.json'), 'w') as f:
+        f.write('{}')
+    monkeypatch.setattr(settings, 'DATA_HOME', str(tmpdir))
+
+    tasks = workflow.dataset_tasks(0, 2, 1000, label_kwargs={'remove_ugly': False})
+    keys = [task.key for task in tasks]
+    assert len(keys) == 7
+    assert keys[-1] == 'set-0/label'
+    assert tasks[-1].deps == ['set-0/batch-0/summarize', 'set-0/batch-1/summarize']
+    by_key = {task.key: task for task in tasks}
+    assert by_key['set-0/batch-1/simulate'].deps == ['set-0/batch-1/generate']
+    assert by_key['set-0/batch-1/summarize'].deps == ['set-0/batch-1/simulate']
+    for batch_num in range(2):
+        batch_dir = os.path.join(set_dir, 'batch-{}'.format(batch_num))
+        assert os.path.isdir(batch_dir)
+        with catalog.connect() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM batches WHERE set_num = 0 AND batch_num = ?',
+                                (batch_num,)).fetchone()[0] == 1
+
+
+def test_pack_biomass_files(tmpdir):
+    output_dir = tmpdir.mkdir('biomass-data')
+    output_dir.join('0.csv').write('a,b\n1,2\n')
+    output_dir.join('1.h5').write('')
+    outputs = workflow.pack_biomass_files(str(tmpdir))
+    assert [os.path.basename(f) for f in outputs] == ['0.csv.gz', '1.h5']
+    assert not output_dir.join('0.csv').check()
+
+
+def fake_batch_simulator(timesteps, node_config_file, output_dir, **kwargs):
+    """ Stand-in for simulation.atn_batch_simulator(): writes a simulation
+    file per node config, with decaying biomass, and a CSV file to pack. """
+    with open(node_config_file) as f:
+        node_configs = f.read().splitlines()
+    t = np.arange(timesteps)
+    for sim_number, node_config in enumerate(node_configs):
+        rates = np.array([0.001, 0.002, 0.003]) * (1 + sim_number)
+        biomass = np.exp(-np.outer(t, rates))
+        with h5py.File(os.path.join(output_dir, 'ATN_{}.h5'.format(sim_number)), 'w') as f:
+            f['node_ids'] = np.array([5, 14, 31])
+            f['node_config'] = node_config.encode('utf-8')
+            f['stop_event'] = b'NONE'
+            f['extinction_timesteps'] = np.array([-1, -1, -1])
+            f['final_biomass'] = biomass[-1]
+            f['timesteps_simulated'] = timesteps
+            f['biomass'] = biomass
+    with open(os.path.join(output_dir, 'log.csv'), 'w') as f:
+        f.write('sim_number\n' + ''.join('{}\n'.format(i) for i in range(len(node_configs))))
+    with open(node_config_file + '.calls', 'a') as f:
+        f.write('{}\n'.format(time.time()))
+
+
+def test_dataset_workflow(monkeypatch, tmpdir):
+    set_dir = os.path.join(str(tmpdir), '3-species', '5-14-31', 'set-0')
+    os.makedirs(set_dir)
+    with open(os.path.join(set_dir, 'metaparameters.json'), 'w') as f:
+        json.dump({'generator': 'uniform', 'args': {
+            'node_ids': [5, 14, 31],
+            'param_ranges': {'initialBiomass': [100, 5000], 'X': [0, 1], 'R': 1, 'K': [100, 10000]},
+            'count': 8,
+            'seed': 1,
+        }}, f)
+    monkeypatch.setattr(settings, 'DATA_HOME', str(tmpdir))
+    # Worker processes are forked, so they see the stub
+    monkeypatch.setattr(simulation, 'atn_batch_simulator', fake_batch_simulator)
+
+    def run(label_kwargs):
+        tasks = workflow.dataset_tasks(0, 2, 200, label_kwargs=label_kwargs)
+        return workflow.run(tasks, max_workers=2, log=lambda message: None)
+
+    label_kwargs = {'remove_ugly': False}
+    assert set(run(label_kwargs).values()) == {'ran'}
+    for batch_num in range(2):
+        batch_dir = os.path.join(set_dir, 'batch-{}'.format(batch_num))
+        assert os.path.isfile(os.path.join(batch_dir, 'biomass-data', 'log.csv.gz'))
+        assert not os.path.exists(os.path.join(batch_dir, 'biomass-data', 'log.csv'))
+        assert len(summaryfiles.read_summary(os.path.join(batch_dir, summaryfiles.SUMMARY_CSV))) == 8
+    labeled_file = os.path.join(set_dir, workflow.LABELED_SUMMARY_FILE)
+    labeled = summaryfiles.read_summary(labeled_file)
+    assert len(labeled) == 16
+    assert (labeled['label_environment_score_slope'] == 'good').sum() == 4
+
+    # Up to date, including the packed simulation output
+    assert set(run(label_kwargs).values()) == {'skipped'}
+
+    # Changing a labelling parameter only reruns the label stage
+    label_kwargs['quantiles'] = [0.5, 0.5]
+    results = run(label_kwargs)
+    assert results.pop('set-0/label') == 'ran'
+    assert set(results.values()) == {'skipped'}
+    labeled = summaryfiles.read_summary(labeled_file)
+    assert (labeled['label_environment_score_slope'] == 'good').sum() == 8
+    for batch_num in range(2):
+        node_config_file = os.path.join(set_dir, 'batch-{}'.format(batch_num), 'node-configs.txt')
+        assert call_count(node_config_file) == 1